@@ -1,18 +1,27 @@
 """
 Admin Dashboard API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import case, func
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
 from app.database import get_db
 from app.models.cart import Cart, CartStatus
 from app.models.transaction import Transaction
-from app.models.product import Product
-from app.models.alert import Alert
-from app.models.cart import CartItem
+from app.models.alert import Alert, AlertSeverity, AlertStatus
+from app.models.loading import cart_line_count
+from app.api.pagination import (
+    EXPORT_BATCH_SIZE, EXPORT_MEDIA_TYPES, NEXT_CURSOR_HEADER, paginate, stream_rows
+)
 from app.schemas.product import ProductResponse
+from app.services.alert_sink import alert_sink
+from app.services.analytics_service import analytics_rollups, sql_bucket_start
+from app.services.catalog_cache_service import catalog_cache
+from app.services.executor_service import executor_service
+from app.services.cooccurrence_service import cooccurrence_index
+from app.services.theft_detection_service import theft_detection_service
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -25,75 +34,110 @@ def get_analytics_overview(db: Session = Depends(get_db)):
     # Active carts
     active_carts = db.query(Cart).filter(Cart.status == CartStatus.ACTIVE).count()
     
-    # Total transactions today
-    today = datetime.utcnow().date()
-    transactions_today = db.query(Transaction).filter(
-        func.date(Transaction.created_at) == today
-    ).count()
-    
-    # Revenue today
-    revenue_today = db.query(func.sum(Transaction.amount)).filter(
-        func.date(Transaction.created_at) == today,
-        Transaction.status == "completed"
-    ).scalar() or 0.0
+    # Transactions, revenue and alerts today (one rollup row)
+    today = analytics_rollups.get_totals(db, "day")
     
     # Active alerts
     active_alerts = db.query(Alert).filter(Alert.is_active == True).count()
     
     # Popular products (last 7 days)
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    popular_products = db.query(
-        Product.id,
-        Product.name,
-        func.count(CartItem.id).label('purchase_count')
-    ).join(
-        CartItem, CartItem.product_id == Product.id
-    ).join(
-        Cart, Cart.id == CartItem.cart_id
-    ).filter(
-        Cart.created_at >= week_ago
-    ).group_by(
-        Product.id, Product.name
-    ).order_by(
-        desc('purchase_count')
-    ).limit(10).all()
+    popular_products = analytics_rollups.get_popular_products(db, days=7, limit=10)
     
     return {
         "active_carts": active_carts,
-        "transactions_today": transactions_today,
-        "revenue_today": round(revenue_today, 2),
+        "transactions_today": today["transaction_count"],
+        "revenue_today": today["revenue"],
+        "alerts_today": today["alert_count"],
         "active_alerts": active_alerts,
         "popular_products": [
-            {"product_id": p.id, "name": p.name, "purchase_count": p.purchase_count}
+            {"product_id": p["product_id"], "name": p["name"], "purchase_count": p["purchase_count"]}
             for p in popular_products
         ]
     }
 
 
+@router.get("/analytics/totals")
+def get_analytics_totals(
+    granularity: str = Query("day", pattern="^(hour|day|month)$"),
+    at: datetime = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Sales and alert totals for the hour, day or month containing `at` (default: now)
+    """
+    return analytics_rollups.get_totals(db, granularity, at)
+
+
+@router.post("/analytics/rebuild")
+def rebuild_analytics_rollups(db: Session = Depends(get_db)):
+    """
+    Recompute the analytics rollups from transaction and alert history
+    """
+    counts = analytics_rollups.rebuild(db)
+    return {"message": "Analytics rollups rebuilt", **counts}
+
+
+def _export_response(rows, serialize, fmt: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_rows(rows, serialize, fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'}
+    )
+
+
+def _active_carts_query(db: Session):
+    # Line counts come from a subquery instead of loading each cart's items
+    return db.query(Cart, cart_line_count().label("item_count")).filter(
+        Cart.status == CartStatus.ACTIVE
+    )
+
+
+def _cart_row(row) -> Dict[str, Any]:
+    cart, item_count = row
+    return {
+        "id": cart.id,
+        "session_id": cart.session_id,
+        "total_amount": cart.total_amount,
+        "final_amount": cart.final_amount,
+        "item_count": item_count,
+        "has_alert": cart.has_alert,
+        "created_at": cart.created_at.isoformat()
+    }
+
+
 @router.get("/carts/active")
 def get_active_carts(
+    response: Response,
     limit: int = Query(50, ge=1, le=1000),
+    cursor: str = Query(None, description="X-Next-Cursor of the previous page"),
     db: Session = Depends(get_db)
 ):
     """
-    Get all active carts
+    Get active carts, newest first; the next page's cursor is returned in
+    the X-Next-Cursor header
     """
-    carts = db.query(Cart).filter(
-        Cart.status == CartStatus.ACTIVE
-    ).order_by(Cart.created_at.desc()).limit(limit).all()
+    carts, next_cursor = paginate(
+        _active_carts_query(db), Cart.created_at, Cart.id, limit, cursor,
+        db.get_bind().dialect.name
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
-    return [
-        {
-            "id": cart.id,
-            "session_id": cart.session_id,
-            "total_amount": cart.total_amount,
-            "final_amount": cart.final_amount,
-            "item_count": len(cart.items),
-            "has_alert": cart.has_alert,
-            "created_at": cart.created_at.isoformat()
-        }
-        for cart in carts
-    ]
+    return [_cart_row(row) for row in carts]
+
+
+@router.get("/carts/active/export")
+def export_active_carts(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream every active cart as NDJSON or CSV
+    """
+    rows = _active_carts_query(db).order_by(
+        Cart.created_at.desc(), Cart.id.desc()
+    ).yield_per(EXPORT_BATCH_SIZE)
+    return _export_response(rows, _cart_row, format, "active-carts")
 
 
 @router.get("/products/popular")
@@ -103,96 +147,168 @@ def get_popular_products(
     db: Session = Depends(get_db)
 ):
     """
-    Get popular products by purchase count
+    Get popular products by purchase count over the last `days` days
     """
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    popular = db.query(
-        Product.id,
-        Product.name,
-        Product.category,
-        Product.price,
-        func.count(CartItem.id).label('purchase_count'),
-        func.sum(CartItem.quantity).label('total_quantity')
-    ).join(
-        CartItem, CartItem.product_id == Product.id
-    ).join(
-        Cart, Cart.id == CartItem.cart_id
-    ).filter(
-        Cart.created_at >= start_date
-    ).group_by(
-        Product.id, Product.name, Product.category, Product.price
-    ).order_by(
-        desc('purchase_count')
-    ).limit(limit).all()
-    
-    return [
-        {
-            "product_id": p.id,
-            "name": p.name,
-            "category": p.category,
-            "price": p.price,
-            "purchase_count": p.purchase_count,
-            "total_quantity": p.total_quantity
-        }
-        for p in popular
-    ]
+    return analytics_rollups.get_popular_products(db, days=days, limit=limit)
 
 
 @router.get("/alerts/summary")
 def get_alerts_summary(
     days: int = Query(7, ge=1, le=365),
+    bucket: str = Query(None, pattern="^(hour|day)$"),
     db: Session = Depends(get_db)
 ):
     """
-    Get alerts summary by type
+    Get alerts summary by type, optionally with per-hour or per-day counts
+    for charting
     """
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    alerts = db.query(Alert).filter(
+    # One row per alert type, counted in the database
+    rows = db.query(
+        Alert.alert_type,
+        func.count(Alert.id).label("count"),
+        func.sum(case((Alert.severity.in_([AlertSeverity.HIGH, AlertSeverity.CRITICAL]), 1), else_=0)).label("high_severity"),
+        func.sum(case((Alert.status == AlertStatus.RESOLVED, 1), else_=0)).label("resolved")
+    ).filter(
         Alert.created_at >= start_date
-    ).all()
+    ).group_by(Alert.alert_type).all()
+    
+    summary = {
+        row.alert_type.value: {
+            "count": row.count,
+            "high_severity": row.high_severity,
+            "resolved": row.resolved
+        }
+        for row in rows
+    }
     
-    summary = {}
-    for alert in alerts:
-        alert_type = alert.alert_type.value
-        if alert_type not in summary:
-            summary[alert_type] = {
-                "count": 0,
-                "high_severity": 0,
-                "resolved": 0
-            }
+    if bucket:
+        bucket_start = sql_bucket_start(Alert.created_at, bucket, db.get_bind().dialect.name).label("bucket_start")
+        buckets = db.query(
+            bucket_start, Alert.alert_type, func.count(Alert.id).label("count")
+        ).filter(
+            Alert.created_at >= start_date
+        ).group_by(bucket_start, Alert.alert_type).order_by(bucket_start).all()
         
-        summary[alert_type]["count"] += 1
-        if alert.severity.value == "high" or alert.severity.value == "critical":
-            summary[alert_type]["high_severity"] += 1
-        if alert.status.value == "resolved":
-            summary[alert_type]["resolved"] += 1
+        for stats in summary.values():
+            stats["buckets"] = []
+        for row in buckets:
+            stats = summary.get(row.alert_type.value)
+            if stats is not None:  # Skip types first seen after the summary query
+                stats["buckets"].append({
+                    "bucket_start": str(row.bucket_start).replace(" ", "T"),
+                    "count": row.count
+                })
     
     return summary
 
 
+def _transaction_row(t: Transaction) -> Dict[str, Any]:
+    return {
+        "transaction_id": t.transaction_id,
+        "cart_id": t.cart_id,
+        "amount": t.amount,
+        "payment_method": t.payment_method.value,
+        "status": t.status.value,
+        "created_at": t.created_at.isoformat(),
+        "completed_at": t.completed_at.isoformat() if t.completed_at else None
+    }
+
+
 @router.get("/transactions/recent")
 def get_recent_transactions(
+    response: Response,
     limit: int = Query(50, ge=1, le=1000),
+    cursor: str = Query(None, description="X-Next-Cursor of the previous page"),
     db: Session = Depends(get_db)
 ):
     """
-    Get recent transactions
+    Get recent transactions, newest first; the next page's cursor is
+    returned in the X-Next-Cursor header
     """
-    transactions = db.query(Transaction).order_by(
-        desc(Transaction.created_at)
-    ).limit(limit).all()
+    transactions, next_cursor = paginate(
+        db.query(Transaction), Transaction.created_at, Transaction.id, limit, cursor,
+        db.get_bind().dialect.name
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
-    return [
-        {
-            "transaction_id": t.transaction_id,
-            "cart_id": t.cart_id,
-            "amount": t.amount,
-            "payment_method": t.payment_method.value,
-            "status": t.status.value,
-            "created_at": t.created_at.isoformat(),
-            "completed_at": t.completed_at.isoformat() if t.completed_at else None
-        }
-        for t in transactions
-    ]
+    return [_transaction_row(t) for t in transactions]
+
+
+@router.get("/transactions/export")
+def export_transactions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: datetime = Query(None, description="Oldest created_at to include"),
+    until: datetime = Query(None, description="Exclusive upper bound on created_at"),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream transactions (newest first) as NDJSON or CSV, e.g. a day's worth
+    with since/until
+    """
+    query = db.query(Transaction)
+    if since:
+        query = query.filter(Transaction.created_at >= since)
+    if until:
+        query = query.filter(Transaction.created_at < until)
+    
+    rows = query.order_by(
+        Transaction.created_at.desc(), Transaction.id.desc()
+    ).yield_per(EXPORT_BATCH_SIZE)
+    return _export_response(rows, _transaction_row, format, "transactions")
+
+
+@router.get("/catalog/cache")
+def get_catalog_cache_stats():
+    """
+    Get product catalog cache hit/miss counters
+    """
+    return catalog_cache.get_stats()
+
+
+@router.post("/catalog/cache/invalidate")
+def invalidate_catalog_cache(product_id: int = Query(None)):
+    """
+    Drop one product (or the whole catalog) from the cache
+    """
+    catalog_cache.invalidate(product_id)
+    return {"message": "Catalog cache invalidated", "product_id": product_id}
+
+
+@router.get("/executors")
+def get_executor_stats():
+    """
+    Get CPU/IO executor configuration and per-task counts and latency
+    """
+    return executor_service.get_stats()
+
+
+@router.get("/theft-rules")
+def get_theft_rules_stats():
+    """
+    Get theft rules engine state: carts tracked, events, evaluations and alerts
+    """
+    return theft_detection_service.get_stats()
+
+
+@router.get("/alerts/sink")
+def get_alert_sink_stats():
+    """
+    Get write-behind alert sink buffer depth, batch sizes and flush latency
+    """
+    return alert_sink.get_stats()
+
+
+@router.post("/recommendations/rebuild")
+def rebuild_recommendation_index(db: Session = Depends(get_db)):
+    """
+    Rebuild the frequently-bought-together index from transaction history
+    """
+    cooccurrence_index.build(db)
+    return {
+        "message": "Recommendation index rebuilt",
+        "transactions": cooccurrence_index.transaction_count,
+        "products": len(cooccurrence_index.item_counts)
+    }
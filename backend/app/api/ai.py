@@ -1,38 +1,39 @@
 """
 AI Verification API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from multipart.multipart import MultipartParser, parse_options_header
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.database import get_db
 from app.models.cart import Cart, CartItem
-from app.models.product import Product
 from app.schemas.ai import AIVerificationRequest, AIVerificationResponse
 from app.services.ai_service import ai_service
 from app.services.theft_detection_service import theft_detection_service
 from app.services.iot_service import iot_service
+from app.services.catalog_cache_service import catalog_cache
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
+MULTIPART_OVERHEAD = 16 * 1024  # Boundaries and part headers allowed on top of MAX_UPLOAD_SIZE
 
-@router.post("/verify", response_model=AIVerificationResponse)
-def verify_product(
-    request: AIVerificationRequest,
-    db: Session = Depends(get_db)
-):
+
+def _run_verification(db: Session, cart_id: int, product_id: int, **inputs) -> AIVerificationResponse:
     """
-    Verify product using AI vision
+    Verify a product in a cart against an image or detections
     """
-    cart = db.query(Cart).filter(Cart.id == request.cart_id).first()
+    cart = db.query(Cart).filter(Cart.id == cart_id).first()
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found")
     
-    product = db.query(Product).filter(Product.id == request.product_id).first()
+    product = catalog_cache.get_by_id(db, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Find cart item
     cart_item = next(
-        (item for item in cart.items if item.product_id == request.product_id),
+        (item for item in cart.items if item.product_id == product_id),
         None
     )
     
@@ -40,29 +41,163 @@ def verify_product(
         raise HTTPException(status_code=404, detail="Product not in cart")
     
     # Run AI verification
-    verification = ai_service.verify_product(
-        product,
-        image_data=request.image_data,
-        detected_objects=request.detected_objects
-    )
+    try:
+        verification = ai_service.verify_product(product, **inputs)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
     # Update cart item
     cart_item.verified_by_ai = verification.verified
     cart_item.scan_verified = True
     db.commit()
     
-    # Publish IoT event
-    if verification.alert_triggered:
-        iot_service.publish_alert_event(
-            request.cart_id,
-            "ai_verification_failed",
-            verification.message,
-            "high"
-        )
+    # Publish IoT event; the theft rules raise the alert on failure
+    iot_service.publish_verification_event(
+        cart_id, product_id, verification.verified,
+        verification.message, verification.confidence, verification.match_score
+    )
     
     return verification
 
 
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Image exceeds {limit} bytes")
+
+
+async def _read_multipart_file(request: Request, limit: int) -> bytearray:
+    """
+    Stream a multipart body through the parser, keeping only the "file"
+    part and failing as soon as it (or the whole body) passes the limit.
+    Starlette's request.form() would spool the entire body first.
+    """
+    _, params = parse_options_header(request.headers["content-type"])
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Multipart body has no boundary")
+    
+    data = bytearray()
+    headers = {}
+    header = [b"", b""]  # Field and value being parsed
+    part = {"capturing": False, "found": False}
+    
+    def on_header_field(buffer, start, end):
+        header[0] += buffer[start:end]
+    
+    def on_header_value(buffer, start, end):
+        header[1] += buffer[start:end]
+    
+    def on_header_end():
+        headers[header[0].lower()] = header[1]
+        header[:] = [b"", b""]
+    
+    def on_headers_finished():
+        _, options = parse_options_header(headers.pop(b"content-disposition", b""))
+        headers.clear()
+        part["capturing"] = options.get(b"name") == b"file" and not part["found"]
+        part["found"] = part["found"] or part["capturing"]
+    
+    def on_part_data(buffer, start, end):
+        if part["capturing"]:
+            data.extend(buffer[start:end])
+            if len(data) > limit:
+                raise _too_large(limit)
+    
+    def on_part_end():
+        part["capturing"] = False
+    
+    parser = MultipartParser(boundary, {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end
+    })
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit + MULTIPART_OVERHEAD:
+            raise _too_large(limit)
+        parser.write(chunk)
+    parser.finalize()
+    
+    if not part["found"]:
+        raise HTTPException(status_code=400, detail="Multipart body must contain a 'file' field")
+    return data
+
+
+async def _read_upload(request: Request) -> bytearray:
+    """
+    Read the image from a raw body or a multipart "file" field, rejecting
+    anything over MAX_UPLOAD_SIZE without buffering the rest
+    """
+    limit = settings.MAX_UPLOAD_SIZE
+    multipart = request.headers.get("content-type", "").startswith("multipart/form-data")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit + (MULTIPART_OVERHEAD if multipart else 0):
+        raise _too_large(limit)
+    
+    if multipart:
+        data = await _read_multipart_file(request, limit)
+    else:
+        data = bytearray()
+        async for chunk in request.stream():
+            data += chunk
+            if len(data) > limit:
+                raise _too_large(limit)
+    
+    if not data:
+        raise HTTPException(status_code=400, detail="No image data provided")
+    return data
+
+
+@router.post("/verify", response_model=AIVerificationResponse)
+def verify_product(
+    request: AIVerificationRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Verify product using AI vision
+    """
+    return _run_verification(
+        db,
+        request.cart_id,
+        request.product_id,
+        image_data=request.image_data,
+        detected_objects=request.detected_objects
+    )
+
+
+@router.post("/verify/image", response_model=AIVerificationResponse)
+async def verify_product_image(
+    cart_id: int,
+    product_id: int,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Verify product using AI vision from a binary image upload, sent either as
+    the raw request body (e.g. Content-Type: image/jpeg) or as a multipart
+    "file" field. Avoids the size and decode overhead of base64 JSON.
+    """
+    image_bytes = await _read_upload(request)
+    return await run_in_threadpool(
+        _run_verification,
+        db,
+        cart_id,
+        product_id,
+        image_bytes=image_bytes
+    )
+
+
+@router.get("/metrics")
+def get_inference_metrics():
+    """
+    Get inference queue depth, batch sizes and per-stage latency
+    """
+    return ai_service.get_inference_stats()
+
+
 @router.post("/verify-item/{cart_item_id}", response_model=AIVerificationResponse)
 def verify_cart_item(
     cart_item_id: int,
@@ -78,15 +213,12 @@ def verify_cart_item(
     
     cart = db.query(Cart).filter(Cart.id == cart_item.cart_id).first()
     
-    # Use theft detection service for comprehensive verification
-    verified, alert = theft_detection_service.verify_item_with_ai(
-        db, cart, cart_item_id, image_data
-    )
-    
-    # Get verification details
-    verification = ai_service.verify_product(
-        cart_item.product,
-        image_data=image_data
-    )
+    try:
+        # Use theft detection service for comprehensive verification
+        verified, verification = theft_detection_service.verify_item_with_ai(
+            db, cart, cart_item_id, image_data
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
     return verification
@@ -1,11 +1,23 @@
 """
 Cart API endpoints
+Reads are async routes on the async database session. Item changes are
+plain (threadpool) routes on a sync session, since the billing logic
+they share with checkout (catalog cache, totals) is synchronous. They
+close the session before returning, so its connection goes back to the
+pool without waiting for a worker to run the dependency teardown.
 """
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from typing import Optional
+from app.database import get_async_db, get_db
 from app.models.cart import Cart, CartItem, CartStatus
-from app.schemas.cart import CartCreate, CartResponse, CartItemCreate, CartItemResponse, CartUpdate
+from app.models.loading import CART_WITH_PRODUCTS, CART_ITEM_WITH_PRODUCT
+from app.schemas.cart import (
+    CartCreate, CartResponse, CartItemCreate, CartItemResponse, CartUpdate,
+    CartBatchCreate, CartBatchResponse
+)
 from app.schemas.billing import BillingResponse
 from app.services.billing_service import BillingService
 from app.services.iot_service import iot_service
@@ -14,8 +26,29 @@ import uuid
 router = APIRouter(prefix="/cart", tags=["cart"])
 
 
+async def _load_cart(db: AsyncSession, *criteria, options=CART_WITH_PRODUCTS) -> Cart:
+    """
+    Fetch one cart, refreshing it if the session already holds it (objects
+    are not expired on commit)
+    """
+    result = await db.execute(
+        select(Cart).options(*options).where(*criteria).execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+
+def _active_cart(db: Session, cart_id: int) -> Cart:
+    cart = db.get(Cart, cart_id)
+    if not cart:
+        raise HTTPException(status_code=404, detail="Cart not found")
+    
+    if cart.status != CartStatus.ACTIVE:
+        raise HTTPException(status_code=400, detail="Cart is not active")
+    return cart
+
+
 @router.post("/", response_model=CartResponse)
-def create_cart(cart_data: CartCreate, db: Session = Depends(get_db)):
+async def create_cart(cart_data: CartCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Create a new cart session
     """
@@ -23,96 +56,128 @@ def create_cart(cart_data: CartCreate, db: Session = Depends(get_db)):
     session_id = cart_data.session_id or f"CART-{uuid.uuid4().hex[:8].upper()}"
     
     # Check if session already exists
-    existing_cart = db.query(Cart).filter(Cart.session_id == session_id).first()
+    existing_cart = await _load_cart(db, Cart.session_id == session_id)
     if existing_cart and existing_cart.status == CartStatus.ACTIVE:
         return existing_cart
     
     cart = Cart(session_id=session_id, status=CartStatus.ACTIVE)
     db.add(cart)
-    db.commit()
-    db.refresh(cart)
+    await db.commit()
     
-    return cart
+    # Reload for server-side defaults (created_at)
+    return await _load_cart(db, Cart.id == cart.id)
 
 
 @router.get("/{cart_id}", response_model=CartResponse)
-def get_cart(cart_id: int, db: Session = Depends(get_db)):
+async def get_cart(cart_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get cart by ID
     """
-    cart = db.query(Cart).filter(Cart.id == cart_id).first()
+    cart = await _load_cart(db, Cart.id == cart_id)
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found")
     return cart
 
 
 @router.get("/session/{session_id}", response_model=CartResponse)
-def get_cart_by_session(session_id: str, db: Session = Depends(get_db)):
+async def get_cart_by_session(session_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Get cart by session ID
     """
-    cart = db.query(Cart).filter(Cart.session_id == session_id).first()
+    cart = await _load_cart(db, Cart.session_id == session_id)
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found")
     return cart
 
 
 @router.post("/{cart_id}/items", response_model=CartItemResponse)
-def add_item_to_cart(
-    cart_id: int,
-    item: CartItemCreate,
-    db: Session = Depends(get_db)
-):
+def add_item_to_cart(cart_id: int, item: CartItemCreate, db: Session = Depends(get_db)):
     """
     Add item to cart
     """
-    cart = db.query(Cart).filter(Cart.id == cart_id).first()
-    if not cart:
-        raise HTTPException(status_code=404, detail="Cart not found")
-    
-    if cart.status != CartStatus.ACTIVE:
-        raise HTTPException(status_code=400, detail="Cart is not active")
-    
-    cart_item = BillingService.add_item_to_cart(
-        db, cart, item.product_id, item.quantity
-    )
-    
-    # Publish IoT event
-    iot_service.publish_scan_event(cart_id, item.product_id, "")
-    iot_service.publish_cart_update(cart_id, cart.final_amount, len(cart.items))
-    
-    return cart_item
+    with db:
+        cart = _active_cart(db, cart_id)
+        try:
+            cart_item = BillingService.add_item_to_cart(db, cart, item.product_id, item.quantity)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        
+        # Publish IoT event
+        iot_service.publish_scan_event(cart_id, item.product_id, "")
+        iot_service.publish_cart_update(cart_id, cart.final_amount, cart.item_count)
+        
+        # Reload the line with its product and server-side defaults (added_at)
+        return db.query(CartItem).options(*CART_ITEM_WITH_PRODUCT).filter(
+            CartItem.id == cart_item.id
+        ).populate_existing().one()
+
+
+@router.post("/{cart_id}/items/batch", response_model=CartBatchResponse)
+def add_items_to_cart(cart_id: int, batch: CartBatchCreate, db: Session = Depends(get_db)):
+    """
+    Add many items to cart in one request (RFID portals, bulk basket scans)
+    """
+    with db:
+        cart = _active_cart(db, cart_id)
+        try:
+            cart_items = BillingService.add_items_to_cart(
+                db, cart, [(line.product_id, line.barcode, line.quantity) for line in batch.items]
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        
+        # Publish one aggregated IoT event per batch
+        by_barcode = {item.product.barcode: item.product_id for item in cart_items}
+        iot_service.publish_scan_batch_event(
+            cart_id,
+            [
+                {
+                    "product_id": line.product_id if line.product_id is not None else by_barcode[line.barcode],
+                    "barcode": line.barcode or "",
+                    "quantity": line.quantity
+                }
+                for line in batch.items
+            ]
+        )
+        iot_service.publish_cart_update(cart_id, cart.final_amount, cart.item_count)
+        
+        return CartBatchResponse(
+            cart_id=cart_id,
+            items=cart_items,
+            item_count=cart.item_count,
+            final_amount=cart.final_amount
+        )
 
 
 @router.delete("/{cart_id}/items/{item_id}")
-def remove_item_from_cart(
-    cart_id: int,
-    item_id: int,
-    db: Session = Depends(get_db)
-):
+def remove_item_from_cart(cart_id: int, item_id: int, db: Session = Depends(get_db)):
     """
     Remove item from cart
     """
-    cart = db.query(Cart).filter(Cart.id == cart_id).first()
-    if not cart:
-        raise HTTPException(status_code=404, detail="Cart not found")
-    
-    success = BillingService.remove_item_from_cart(db, cart, item_id)
-    if not success:
-        raise HTTPException(status_code=404, detail="Cart item not found")
-    
-    # Publish IoT event
-    iot_service.publish_cart_update(cart_id, cart.final_amount, len(cart.items))
+    with db:
+        cart = db.get(Cart, cart_id)
+        if not cart:
+            raise HTTPException(status_code=404, detail="Cart not found")
+        
+        product_id: Optional[int] = db.scalar(
+            select(CartItem.product_id).where(CartItem.id == item_id, CartItem.cart_id == cart_id)
+        )
+        if not BillingService.remove_item_from_cart(db, cart, item_id):
+            raise HTTPException(status_code=404, detail="Cart item not found")
+        
+        # Publish IoT event
+        iot_service.publish_removal_event(cart_id, product_id)
+        iot_service.publish_cart_update(cart_id, cart.final_amount, cart.item_count)
     
     return {"message": "Item removed from cart"}
 
 
 @router.get("/{cart_id}/billing", response_model=BillingResponse)
-def get_cart_billing(cart_id: int, db: Session = Depends(get_db)):
+async def get_cart_billing(cart_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get cart billing details
     """
-    cart = db.query(Cart).filter(Cart.id == cart_id).first()
+    cart = await _load_cart(db, Cart.id == cart_id)
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found")
     
@@ -120,22 +185,22 @@ def get_cart_billing(cart_id: int, db: Session = Depends(get_db)):
 
 
 @router.put("/{cart_id}", response_model=CartResponse)
-def update_cart(
+async def update_cart(
     cart_id: int,
     cart_update: CartUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update cart status
     """
-    cart = db.query(Cart).filter(Cart.id == cart_id).first()
+    cart = await _load_cart(db, Cart.id == cart_id, options=())
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found")
     
     if cart_update.status:
         cart.status = CartStatus(cart_update.status)
     
-    db.commit()
-    db.refresh(cart)
+    await db.commit()
     
-    return cart
+    # Reload with lines and products (and onupdate columns) in two queries
+    return await _load_cart(db, Cart.id == cart_id)
@@ -1,23 +1,111 @@
 """
 IoT Events API endpoints
 """
-from fastapi import APIRouter, Query
-from typing import Optional
+import asyncio
+from fastapi import APIRouter, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from app.services.iot_service import iot_service
+from app.services.live_stream_service import live_stream_hub
 
 router = APIRouter(prefix="/iot", tags=["iot"])
 
 
+def _topic_filters(topics: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    An unescaped "+" in a query string arrives as a space; topics never
+    contain spaces, so map it back to the single-level wildcard
+    """
+    return [topic.replace(" ", "+") for topic in topics] if topics else None
+
+
 @router.get("/messages")
 def get_iot_messages(
-    topic: Optional[str] = Query(None),
-    limit: int = Query(100, ge=1, le=1000)
+    topic: Optional[str] = Query(None, description="Topic or wildcard filter, e.g. cart/+/scan"),
+    limit: int = Query(100, ge=1, le=1000),
+    since_seq: Optional[int] = Query(None, ge=0, description="Only messages after this sequence number")
 ):
     """
-    Get IoT message history (for debugging/monitoring)
+    Get IoT message history (for debugging/monitoring). Poll with
+    since_seq=last_seq to receive only new messages.
     """
-    messages = iot_service.get_message_history(topic=topic, limit=limit)
+    messages = iot_service.get_message_history(topic=topic, limit=limit, since_seq=since_seq)
     return {
         "count": len(messages),
+        "last_seq": messages[-1]["seq"] if messages else (since_seq or iot_service.messages.last_seq),
         "messages": messages
     }
+
+
+@router.get("/stats")
+def get_iot_stats():
+    """
+    Get subscriber queue depth, dropped messages and delivery lag
+    """
+    return {**iot_service.get_dispatch_stats(), "stream": live_stream_hub.get_stats()}
+
+
+@router.get("/stream")
+async def stream_iot_events(
+    topics: Optional[List[str]] = Query(None, description="Topic filters; defaults to cart update/scan/alert/payment"),
+    since_seq: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events stream of IoT messages. Event ids are sequence
+    numbers, so a reconnecting EventSource resumes via Last-Event-ID.
+    """
+    if since_seq is None and last_event_id and last_event_id.isdigit():
+        since_seq = int(last_event_id)
+    client = live_stream_hub.connect(_topic_filters(topics))
+    
+    async def events():
+        try:
+            async for frame in live_stream_hub.frames_for(client, since_seq):
+                yield frame.sse if frame else ": keep-alive\n\n"
+        finally:
+            live_stream_hub.disconnect(client)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def iot_events_websocket(
+    websocket: WebSocket,
+    topics: Optional[List[str]] = Query(None),
+    since_seq: Optional[int] = Query(None, ge=0)
+):
+    """
+    WebSocket stream of IoT messages as JSON text frames, each carrying its
+    seq; reconnect with since_seq to resume
+    """
+    await websocket.accept()
+    client = live_stream_hub.connect(_topic_filters(topics))
+    
+    async def watch_disconnect():
+        # Incoming frames are ignored; this only notices the client leaving
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            live_stream_hub.close(client)
+    
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        async for frame in live_stream_hub.frames_for(client, since_seq):
+            if frame:
+                await websocket.send_text(frame.json)
+            else:
+                await websocket.send_text('{"type":"heartbeat"}')
+        if client.overflowed:
+            # Close so the client reconnects with its last seq
+            await websocket.close(code=1013, reason="Stream fell behind; resume with since_seq")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watcher.cancel()
+        live_stream_hub.disconnect(client)
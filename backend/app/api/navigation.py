@@ -4,7 +4,9 @@ Navigation API endpoints
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.schemas.navigation import NavigationRequest, NavigationResponse
+from app.schemas.navigation import (
+    NavigationRequest, NavigationResponse, ShoppingRouteRequest, ShoppingRouteResponse
+)
 from app.services.navigation_service import navigation_service
 
 router = APIRouter(prefix="/navigation", tags=["navigation"])
@@ -30,6 +32,25 @@ def get_navigation_route(
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@router.post("/shopping-route", response_model=ShoppingRouteResponse)
+def get_shopping_route(
+    request: ShoppingRouteRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Get the shortest route visiting every product on a shopping list,
+    from the entrance to checkout
+    """
+    try:
+        return navigation_service.get_shopping_route(
+            db,
+            request.cart_id,
+            request.product_ids
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @router.get("/map")
 def get_store_map():
     """
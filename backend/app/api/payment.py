@@ -1,42 +1,60 @@
 """
 Payment API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from typing import Optional
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas.payment import PaymentRequest, PaymentResponse, QRCodeResponse
-from app.services.payment_service import payment_service
+from app.services.payment_service import CheckoutConflictError, payment_service
+from app.services.qr_service import payment_qr_service
 from app.services.iot_service import iot_service
 
 router = APIRouter(prefix="/payment", tags=["payment"])
 
 
 @router.post("/{cart_id}/qr", response_model=QRCodeResponse)
-def generate_payment_qr(cart_id: int, db: Session = Depends(get_db)):
+def generate_payment_qr(
+    cart_id: int,
+    format: str = Query("png", pattern="^(png|svg|matrix)$"),
+    db: Session = Depends(get_db)
+):
     """
     Generate payment QR code for cart
+    SVG and the raw module matrix are much cheaper to produce than PNG
     """
     try:
-        qr_response = payment_service.generate_payment_qr(db, cart_id)
+        qr_response = payment_service.generate_payment_qr(db, cart_id, format)
         return qr_response
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 
 @router.post("/process", response_model=PaymentResponse)
 def process_payment(
     request: PaymentRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=100),
     db: Session = Depends(get_db)
 ):
     """
     Process payment for cart (simulated)
+    Retries with the same Idempotency-Key header (or body field) return the
+    original transaction; a concurrent or repeated checkout, or a QR payment
+    token issued for another amount, gets 409
     """
     try:
+        payment_claims = None
+        if request.payment_token:
+            payment_claims = payment_qr_service.verify(request.payment_token, request.cart_id)
+        
         payment_response = payment_service.process_payment(
             db,
             request.cart_id,
             request.payment_method,
-            payment_reference=None
+            idempotency_key=idempotency_key or request.idempotency_key,
+            payment_claims=payment_claims
         )
         
         # Publish IoT event
@@ -48,5 +66,9 @@ def process_payment(
         )
         
         return payment_response
+    except CheckoutConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
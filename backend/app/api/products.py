@@ -2,12 +2,14 @@
 Product API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Callable, List, Optional
 from app.database import get_db
-from app.models.product import Product
 from app.schemas.product import ProductResponse, ProductSearch
 from app.schemas.cart import CartItemCreate
+from app.services.catalog_cache_service import ProductRecord, catalog_cache
+from app.services.search_service import product_search_index
 
 router = APIRouter(prefix="/products", tags=["products"])
 
@@ -20,37 +22,42 @@ def search_products(
 ):
     """
     Search products by name, barcode, SKU, or category
+    Exact barcode/SKU hits short-circuit; everything else is ranked by the
+    trigram search index (prefix and typo tolerant)
     """
-    search_term = f"%{query.lower()}%"
-    
-    products = db.query(Product).filter(
-        (Product.name.ilike(search_term)) |
-        (Product.barcode.ilike(search_term)) |
-        (Product.sku.ilike(search_term)) |
-        (Product.category.ilike(search_term)),
-        Product.is_active == True
-    ).limit(limit).all()
-    
-    return products
+    return product_search_index.search(db, query, limit)
+
+
+def _cached_product(lookup: Callable, db: Session, key) -> Optional[ProductRecord]:
+    """
+    A catalog cache lookup in the threadpool, so its lock, a cache miss or a
+    Redis round trip never blocks the event loop. The session only opens a
+    connection on a miss, and is closed before the worker is released.
+    """
+    try:
+        return lookup(db, key)
+    finally:
+        db.close()
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(product_id: int, db: Session = Depends(get_db)):
     """
     Get product by ID
+    Served from the catalog cache; only a cache miss touches the database
     """
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await run_in_threadpool(_cached_product, catalog_cache.get_by_id, db, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
 
 
 @router.get("/barcode/{barcode}", response_model=ProductResponse)
-def get_product_by_barcode(barcode: str, db: Session = Depends(get_db)):
+async def get_product_by_barcode(barcode: str, db: Session = Depends(get_db)):
     """
     Get product by barcode
     """
-    product = db.query(Product).filter(Product.barcode == barcode).first()
+    product = await run_in_threadpool(_cached_product, catalog_cache.get_by_barcode, db, barcode)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
@@ -2,12 +2,16 @@
 Application configuration settings
 """
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
     # Database (using SQLite for easier setup, can switch to PostgreSQL in production)
     DATABASE_URL: str = "sqlite:///./smart_retail_cart.db"
+    DATABASE_ASYNC_URL: Optional[str] = None  # Derived from DATABASE_URL (aiosqlite / asyncpg) when unset
+    DB_POOL_SIZE: int = 10  # Per engine; the sync and async engines each keep their own pool
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection
     
     # Redis
     REDIS_HOST: str = "localhost"
@@ -23,10 +27,88 @@ class Settings(BaseSettings):
     # AI Model
     AI_MODEL_PATH: Optional[str] = None  # Path to YOLOv8 weights, None for mock mode
     AI_CONFIDENCE_THRESHOLD: float = 0.5
+    AI_MODEL_INPUT_SIZE: int = 640  # Frames are decoded no larger than this on the long side
+    AI_STUB_MODEL: bool = False  # Use the CPU stub model (configurable latency) instead of YOLO
+    AI_STUB_LATENCY_MS: float = 20.0  # Stub forward-pass cost per batch
+    AI_INFERENCE_MAX_BATCH_SIZE: int = 8
+    AI_INFERENCE_MAX_WAIT_MS: float = 5.0  # Longest a frame waits for its batch to fill
+    AI_INFERENCE_QUEUE_SIZE: int = 256  # Frames queued beyond this are rejected
+    AI_INFERENCE_TIMEOUT_SECONDS: float = 10.0
+    AI_EMBEDDING_STORE_PATH: Optional[str] = None  # Directory written by build_embeddings.py; None keeps name matching
+    AI_EMBEDDING_MMAP: bool = True  # Map the store read-only so all workers share one copy
+    AI_EMBEDDING_DIM: int = 128
+    AI_EMBEDDING_TOP_K: int = 5  # Candidate products returned per crop
+    AI_EMBEDDING_MATCH_THRESHOLD: float = 0.7  # Cosine similarity a top-k candidate needs to verify
+    
+    # Startup
+    DB_CREATE_TABLES_ON_STARTUP: bool = True  # Run create_all when the app starts (not on import)
+    AI_MODEL_PRELOAD: bool = True  # Warm the AI model in the background at startup; else load on first use
+    
+    # Billing
+    BILLING_MODE: str = "incremental"  # "incremental" (O(1) per scan) or "full" (recompute every line)
+    BILLING_RECONCILE_INTERVAL: int = 50  # Full recompute every N incremental updates per cart
+    
+    # Product catalog cache
+    CATALOG_CACHE_BACKEND: str = "local"  # "local" or "redis"
+    CATALOG_CACHE_TTL_SECONDS: int = 300
+    
+    # Recommendations
+    RECOMMENDATION_TOP_K: int = 20  # Co-purchased neighbours kept per product
+    RECOMMENDATION_INDEX_REFRESH_SECONDS: float = 30.0  # Check for baskets from other workers this often; 0 = never
+    
+    # Analytics
+    ANALYTICS_CACHE_TTL_SECONDS: float = 30.0  # Rollup reads cached this long; local writes invalidate at once
+    
+    # Navigation
+    NAVIGATION_TOUR_TIME_BUDGET_MS: float = 3.0  # Heuristic search budget for shopping-list routes
+    NAVIGATION_EXACT_TOUR_LIMIT: int = 8  # Solve exactly (DP) up to this many aisles
+    NAVIGATION_LAYOUT_TTL_SECONDS: float = 60.0  # Re-read aisles this often to see other workers' layout changes; 0 = never
+    
+    # Executors
+    EXECUTOR_MODE: str = "process"  # "process" (CPU pool of processes), "thread" or "inline" (run on the caller, for tests)
+    EXECUTOR_CPU_WORKERS: int = 0  # 0 = one per core
+    EXECUTOR_IO_WORKERS: int = 32
+    EXECUTOR_START_METHOD: str = "spawn"  # Worker start method; fork is unsafe once service threads are running
+    EXECUTOR_TASK_TIMEOUT_SECONDS: float = 10.0
+    RECEIPT_OFFLOAD_MIN_LINES: int = 200  # Smaller receipts are cheaper to build than to ship to a worker
+    
+    # Theft detection
+    THEFT_RULES_MAX_CARTS: int = 10000  # Carts with rule state kept; the least recently active are dropped
+    ALERT_SINK_MODE: str = "buffered"  # "buffered" (background batched writes) or "sync" (write on submit, for tests)
+    ALERT_SINK_BATCH_SIZE: int = 100  # Alerts per INSERT; a full batch flushes at once
+    ALERT_SINK_FLUSH_INTERVAL_MS: float = 200.0  # Longest a partial batch waits
+    ALERT_SINK_MAX_BUFFER: int = 10000  # Alerts held while the database is unavailable; oldest dropped beyond this
+    
+    # Payment QR codes
+    PAYMENT_QR_TTL_SECONDS: int = 600
+    PAYMENT_QR_REFRESH_MARGIN_SECONDS: int = 60  # Issue a new code rather than reuse one expiring sooner
+    PAYMENT_QR_CACHE_SIZE: int = 1024  # Outstanding codes and renders kept
+    PAYMENT_QR_BOX_SIZE: int = 10  # PNG pixels per module
     
     # MQTT Simulation
+    IOT_MESSAGE_HISTORY_SIZE: int = 1000  # Messages kept across all topics
+    IOT_TOPIC_HISTORY_SIZE: int = 100  # Messages kept per topic
+    IOT_MAX_TOPICS: int = 10000  # Topics with their own history; the least recently published are evicted
+    IOT_TOPIC_RETENTION: Dict[str, int] = {}  # Per-topic overrides, e.g. {"cart/+/alert": 1000}
+    # The cart routes publish from the event loop, so the app refuses "sync"
+    # dispatch and the "block" policy (both would stall every request)
+    IOT_DISPATCH_MODE: str = "async"  # "async" (subscriber worker threads) or "sync" (inline callbacks; scripts/benchmarks)
+    IOT_SUBSCRIBER_QUEUE_SIZE: int = 1000  # Pending messages per subscriber
+    IOT_BACKPRESSURE_POLICY: str = "drop_oldest"  # "drop_oldest", "block" (scripts/benchmarks) or "error" (reject and count) when a queue is full
     MQTT_BROKER_HOST: str = "localhost"
     MQTT_BROKER_PORT: int = 1883
+    IOT_STREAM_QUEUE_SIZE: int = 1000  # Frames buffered per live stream client before it is dropped
+    IOT_STREAM_HEARTBEAT_SECONDS: float = 15.0
+    IOT_STREAM_BACKLOG_LIMIT: int = 1000  # Messages replayed per topic filter on resume
+    MQTT_TRANSPORT: str = "memory"  # "memory" (simulation), "mqtt" (paho client) or "loopback" (broker stand-in)
+    MQTT_CLIENT_ID: str = "smart-retail-cart-backend"
+    MQTT_KEEPALIVE: int = 60
+    MQTT_QOS: int = 0
+    MQTT_PAYLOAD_FORMAT: str = "json"  # "json", "msgpack" or "cbor"
+    MQTT_BATCH_SIZE: int = 1  # >1 packs messages into envelopes on MQTT_BATCH_TOPIC
+    MQTT_BATCH_INTERVAL_MS: float = 20.0  # Longest a partial batch waits
+    MQTT_BATCH_TOPIC: str = "carts/batch"
+    MQTT_OUTBOUND_BUFFER_SIZE: int = 10000  # Publishes held while disconnected
     
     # File Upload
     UPLOAD_DIR: str = "uploads"
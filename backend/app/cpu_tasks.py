@@ -0,0 +1,143 @@
+"""
+CPU-bound task functions
+Everything the executor's worker processes unpickle and run. This module
+sits outside app.services, whose package __init__ imports every service
+(and with them SQLAlchemy and the models), and imports only the standard
+library and NumPy at module level, so a spawned worker starts quickly.
+Heavier libraries (PIL, qrcode) are imported by the tasks that use them.
+"""
+import base64
+import io
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import numpy as np
+
+
+def timed_call(fn: Callable, args: tuple, kwargs: dict) -> Tuple[Any, float]:
+    """Runs in the worker: the result and how long fn itself took (ms)"""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000.0
+
+
+def decode_image_bytes(data: Union[bytes, bytearray], size: int) -> Optional[np.ndarray]:
+    """
+    Decode encoded image bytes into an RGB array no larger than size on
+    the long side. JPEGs are decoded at reduced scale via draft mode, so a
+    full-resolution bitmap is never materialized.
+    """
+    from PIL import Image
+    
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format == "JPEG":
+            image.draft("RGB", (size, size))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if max(image.size) > size:
+            image.thumbnail((size, size), Image.BILINEAR)
+        return np.asarray(image)
+    except Exception as e:
+        print(f"Error decoding image: {e}")
+        return None
+
+
+def decode_base64_image(image_data: str, size: int) -> Optional[np.ndarray]:
+    """
+    Decode base64 image data, with or without a data URL prefix
+    """
+    try:
+        if image_data.startswith('data:image'):
+            # Remove data URL prefix
+            image_data = image_data.split(',')[1]
+        
+        image_bytes = base64.b64decode(image_data)
+    except Exception as e:
+        print(f"Error decoding image: {e}")
+        return None
+    return decode_image_bytes(image_bytes, size)
+
+
+def build_receipt(header: Dict[str, Any], lines: List[Tuple[str, int, float, float, float]]) -> Tuple[dict, str]:
+    """
+    Receipt dict and its JSON from the header fields (its "items" entry is
+    filled in) and (product_name, quantity, unit_price, tax_rate, subtotal)
+    lines
+    """
+    receipt = dict(header)
+    receipt["items"] = [
+        {
+            "product_name": product_name,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "tax_rate": tax_rate,
+            "subtotal": subtotal
+        }
+        for product_name, quantity, unit_price, tax_rate, subtotal in lines
+    ]
+    return receipt, json.dumps(receipt)
+
+
+def qr_modules(data: str) -> List[List[bool]]:
+    """Module matrix (no quiet zone) at the smallest version that fits"""
+    import qrcode
+    
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, border=0)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.modules
+
+
+def render_png(data: str, box_size: int = 10, border: int = 4) -> str:
+    """Base64 PNG (qrcode pulls in PIL, so import it on first use)"""
+    import qrcode
+    
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def render_svg(modules: List[List[bool]], border: int = 4) -> str:
+    """SVG markup, one path with a rectangle per horizontal run of dark modules"""
+    size = len(modules) + 2 * border
+    runs = []
+    for y, row in enumerate(modules):
+        x = 0
+        while x < len(row):
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < len(row) and row[x]:
+                x += 1
+            runs.append(f"M{start + border} {y + border}h{x - start}v1h-{x - start}z")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<path fill="#fff" d="M0 0h{size}v{size}H0z"/><path d="{"".join(runs)}"/></svg>'
+    )
+
+
+def render_matrix(modules: List[List[bool]]) -> str:
+    """Rows of 0/1 separated by newlines, for clients that draw the code themselves"""
+    return "\n".join("".join("1" if module else "0" for module in row) for row in modules)
+
+
+def render_qr(data: str, fmt: str, box_size: int = 10) -> str:
+    """Render data as a QR code in "png", "svg" or "matrix" form"""
+    if fmt == "png":
+        return render_png(data, box_size)
+    if fmt == "svg":
+        return render_svg(qr_modules(data))
+    if fmt == "matrix":
+        return render_matrix(qr_modules(data))
+    raise ValueError(f"Unknown QR format: {fmt}")
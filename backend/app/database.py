@@ -1,26 +1,157 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
 
+# Async drivers for each sync backend
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
 # Create database engine
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT
 )
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine and sessions, created on first use so the driver is only
+# imported by processes that serve async routes
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+_async_lock = threading.Lock()
+
 # Base class for models
 Base = declarative_base()
 
 
+def init_db():
+    """
+    Create any missing tables; safe to call on every startup
+    """
+    import app.models  # noqa: F401 - register every model on Base.metadata
+    Base.metadata.create_all(bind=engine)
+    migrate_db(engine)
+
+
+def migrate_db(bind=engine) -> List[str]:
+    """
+    Add the columns and indexes create_all skips on tables that already
+    exist. Additive only, and a no-op once applied; returns the DDL run.
+    """
+    inspector = inspect(bind)
+    applied = []
+    with bind.begin() as conn:
+        compiler = conn.dialect.ddl_compiler(conn.dialect, None)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} without a server default")
+                ddl = f"ALTER TABLE {compiler.preparer.format_table(table)} ADD COLUMN {compiler.get_column_specification(column)}"
+                conn.exec_driver_sql(ddl)
+                applied.append(ddl)
+            
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    applied.append(f"CREATE INDEX {index.name}")
+    return applied
+
+
+class QueryCounter:
+    """SQL statements seen by count_queries()"""
+    
+    def __init__(self):
+        self.statements: List[str] = []
+    
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(bind=None):
+    """
+    Record every SQL statement executed on an engine (default: the app's
+    sync engine; async engines are accepted) inside the block, to pin the
+    number of queries an endpoint issues
+    """
+    target = getattr(bind, "sync_engine", bind) or engine
+    counter = QueryCounter()
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+    
+    event.listen(target, "before_cursor_execute", record)
+    try:
+        yield counter
+    finally:
+        event.remove(target, "before_cursor_execute", record)
+
+
+def async_database_url() -> URL:
+    """
+    DATABASE_ASYNC_URL, or DATABASE_URL with its driver swapped for the
+    backend's async driver (sqlite -> aiosqlite, postgresql -> asyncpg)
+    """
+    if settings.DATABASE_ASYNC_URL:
+        return make_url(settings.DATABASE_ASYNC_URL)
+    url = make_url(settings.DATABASE_URL)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver configured for {backend}; set DATABASE_ASYNC_URL")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        with _async_lock:
+            if _async_engine is None:
+                # A sized queue pool for every backend (aiosqlite would
+                # otherwise open a connection and thread per request)
+                _async_engine = create_async_engine(
+                    async_database_url(),
+                    poolclass=AsyncAdaptedQueuePool,
+                    pool_pre_ping=True,
+                    pool_size=settings.DB_POOL_SIZE,
+                    max_overflow=settings.DB_MAX_OVERFLOW,
+                    pool_timeout=settings.DB_POOL_TIMEOUT
+                )
+                # Objects stay loaded after commit: lazy refreshes can't run
+                # outside a greenlet
+                _async_session_factory = async_sessionmaker(
+                    _async_engine, autoflush=False, expire_on_commit=False
+                )
+    return _async_engine
+
+
+async def dispose_async_engine():
+    """Close pooled async connections (application shutdown)"""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _async_session_factory = None
+
+
 def get_db():
     """
     Dependency for getting database session
@@ -30,3 +161,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Dependency for getting an async database session
+    """
+    get_async_engine()
+    async with _async_session_factory() as db:
+        yield db
@@ -1,14 +1,47 @@
 """
 FastAPI Main Application
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.config import settings
-from app.database import engine, Base
+from app.database import init_db, dispose_async_engine
 from app.api import products, cart, ai, navigation, recommendations, payment, alerts, admin, iot
+from app.services.ai_service import ai_service
+from app.services.alert_sink import alert_sink
+from app.services.executor_service import executor_service
+from app.services.iot_service import iot_service
+from app.services.theft_detection_service import theft_detection_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup work runs here rather than at import time, so importing the app
+    (workers, scripts, tooling) stays cheap
+    """
+    # Async routes publish IoT events on the event loop thread
+    if settings.IOT_DISPATCH_MODE == "sync" or settings.IOT_BACKPRESSURE_POLICY == "block":
+        raise RuntimeError(
+            "IOT_DISPATCH_MODE=sync and IOT_BACKPRESSURE_POLICY=block would block the event loop; "
+            "use async dispatch with drop_oldest or error"
+        )
+    if settings.DB_CREATE_TABLES_ON_STARTUP:
+        init_db()
+    if settings.AI_MODEL_PRELOAD:
+        ai_service.warm_up()
+    theft_detection_service.start()
+    yield
+    ai_service.scheduler.stop(timeout=5)
+    # Let queued cart events reach the rules, then write the alerts they raised
+    iot_service.flush(timeout=5)
+    theft_detection_service.stop()
+    alert_sink.close()
+    iot_service.shutdown()
+    executor_service.shutdown()
+    await dispose_async_engine()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 # Create FastAPI app
 app = FastAPI(
@@ -16,7 +49,8 @@ app = FastAPI(
     description="API for AI-Powered Smart Retail Cart Platform",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -56,6 +90,16 @@ def root():
 @app.get("/health")
 def health_check():
     """
-    Health check endpoint
+    Health check endpoint (liveness). Also reports whether the AI model has
+    finished loading.
+    """
+    return {"status": "healthy", "ready": ai_service.ready, "ai_model": ai_service.model_state}
+
+
+@app.get("/health/ready")
+def readiness_check():
+    """
+    Readiness probe: 503 until the AI model is loaded (or mock mode is selected)
     """
-    return {"status": "healthy"}
+    body = {"ready": ai_service.ready, "ai_model": ai_service.model_state}
+    return JSONResponse(status_code=200 if ai_service.ready else 503, content=body)
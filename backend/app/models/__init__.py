@@ -7,6 +7,7 @@ from app.models.cart import Cart, CartItem
 from app.models.transaction import Transaction, TransactionItem
 from app.models.alert import Alert
 from app.models.recommendation import ProductRecommendation
+from app.models.analytics import SalesRollup, ProductSalesRollup
 
 __all__ = [
     "Product",
@@ -17,4 +18,6 @@ __all__ = [
     "TransactionItem",
     "Alert",
     "ProductRecommendation",
+    "SalesRollup",
+    "ProductSalesRollup",
 ]
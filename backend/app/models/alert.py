@@ -1,7 +1,7 @@
 """
 Alert model for theft detection and security events
 """
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text, Boolean, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -33,6 +33,11 @@ class AlertStatus(str, enum.Enum):
 
 class Alert(Base):
     __tablename__ = "alerts"
+    __table_args__ = (
+        # Covers the admin summary's GROUP BY (severity/status ride along)
+        Index("ix_alerts_created_type", "created_at", "alert_type", "severity", "status"),
+        Index("ix_alerts_active_created", "is_active", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cart_id = Column(Integer, ForeignKey("carts.id"), nullable=True)
@@ -40,7 +45,7 @@ class Alert(Base):
     severity = Column(Enum(AlertSeverity), default=AlertSeverity.MEDIUM)
     status = Column(Enum(AlertStatus), default=AlertStatus.PENDING)
     message = Column(Text, nullable=False)
-    details = Column(Text, nullable=True)  # JSON details
+    details = Column(JSON, nullable=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     reviewed_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,43 @@
+"""
+Analytics rollup models: pre-aggregated sales and alert counters
+"""
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, UniqueConstraint
+from app.database import Base
+
+
+class SalesRollup(Base):
+    """Store-wide totals for one hour, day or month"""
+    __tablename__ = "sales_rollups"
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", name="uq_sales_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(10), nullable=False)  # "hour", "day" or "month"
+    bucket_start = Column(DateTime, nullable=False)  # UTC, truncated to the granularity
+    transaction_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    items_sold = Column(Integer, nullable=False, default=0)
+    alert_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SalesRollup(granularity={self.granularity}, bucket_start={self.bucket_start}, revenue={self.revenue})>"
+
+
+class ProductSalesRollup(Base):
+    """Sales of one product in one day or month"""
+    __tablename__ = "product_sales_rollups"
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "product_id", name="uq_product_sales_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(10), nullable=False)  # "day" or "month"
+    bucket_start = Column(DateTime, nullable=False)  # UTC, truncated to the granularity
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    purchase_count = Column(Integer, nullable=False, default=0)  # Transactions containing the product
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<ProductSalesRollup(granularity={self.granularity}, bucket_start={self.bucket_start}, product_id={self.product_id}, quantity={self.quantity})>"
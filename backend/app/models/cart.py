@@ -1,7 +1,7 @@
 """
 Cart and CartItem models
 """
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Enum
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -17,6 +17,10 @@ class CartStatus(str, enum.Enum):
 
 class Cart(Base):
     __tablename__ = "carts"
+    __table_args__ = (
+        # Keyset pagination of carts by status, newest first
+        Index("ix_carts_status_created_id", "status", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(100), unique=True, nullable=False, index=True)
@@ -28,8 +32,11 @@ class Cart(Base):
     tax_amount = Column(Float, default=0.0)
     discount_amount = Column(Float, default=0.0)
     final_amount = Column(Float, default=0.0)
+    item_count = Column(Integer, default=0)  # Total quantity, maintained by BillingService
     has_alert = Column(Boolean, default=False)
     alert_reason = Column(String(500), nullable=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped on every billing change; checkout compares-and-sets it
+    updates_since_reconcile = Column(Integer, nullable=False, default=0, server_default="0")  # Incremental billing updates since the last full recompute
     
     # Relationships
     items = relationship("CartItem", back_populates="cart", cascade="all, delete-orphan")
@@ -41,6 +48,9 @@ class Cart(Base):
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        Index("ix_cart_items_cart_product", "cart_id", "product_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cart_id = Column(Integer, ForeignKey("carts.id"), nullable=False)
@@ -0,0 +1,24 @@
+"""
+Relationship loading strategies
+Query options per endpoint, so a response is built from a fixed number of
+SELECTs whatever the cart or page size
+"""
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload, selectinload
+from app.models.cart import Cart, CartItem
+
+# Cart responses: the cart, then one SELECT for its lines joined to their products
+CART_WITH_PRODUCTS = (selectinload(Cart.items).joinedload(CartItem.product),)
+
+# Billing totals and checkout: the cart, then one SELECT for its lines
+CART_WITH_ITEMS = (selectinload(Cart.items),)
+
+# A single line in a response
+CART_ITEM_WITH_PRODUCT = (joinedload(CartItem.product),)
+
+
+def cart_line_count():
+    """Correlated subquery counting a cart's lines, for listings"""
+    return select(func.count(CartItem.id)).where(
+        CartItem.cart_id == Cart.id
+    ).correlate(Cart).scalar_subquery()
@@ -1,8 +1,9 @@
 """
 Product model
 """
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, Boolean, DateTime
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 from app.database import Base
 
 
@@ -22,6 +23,7 @@ class Product(Base):
     image_url = Column(String(500), nullable=True)
     is_active = Column(Boolean, default=True)
     stock_quantity = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), default=func.now())  # Set on INSERT, so migrate_db can add it to SQLite tables
     
     # Relationships
     aisle = relationship("Aisle", back_populates="products")
@@ -1,7 +1,7 @@
 """
 Transaction models for payment and receipts
 """
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -24,6 +24,10 @@ class TransactionStatus(str, enum.Enum):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Keyset pagination and time-window exports, newest first
+        Index("ix_transactions_created_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cart_id = Column(Integer, ForeignKey("carts.id"), nullable=False)
@@ -36,6 +40,7 @@ class Transaction(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     receipt_data = Column(Text, nullable=True)  # JSON receipt data
+    idempotency_key = Column(String(100), unique=True, index=True, nullable=True)  # Client key; retries replay this transaction
     
     # Relationships
     cart = relationship("Cart", back_populates="transactions")
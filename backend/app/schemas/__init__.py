@@ -2,10 +2,16 @@
 Pydantic schemas for request/response validation
 """
 from app.schemas.product import ProductCreate, ProductResponse, ProductSearch
-from app.schemas.cart import CartCreate, CartResponse, CartItemCreate, CartItemResponse, CartUpdate
+from app.schemas.cart import (
+    CartCreate, CartResponse, CartItemCreate, CartItemResponse, CartUpdate,
+    CartBatchItem, CartBatchCreate, CartBatchResponse
+)
 from app.schemas.billing import BillingResponse, BillCalculation
 from app.schemas.ai import AIVerificationRequest, AIVerificationResponse
-from app.schemas.navigation import NavigationRequest, NavigationResponse, AisleResponse
+from app.schemas.navigation import (
+    NavigationRequest, NavigationResponse, AisleResponse,
+    ShoppingRouteRequest, ShoppingRouteResponse
+)
 from app.schemas.recommendation import RecommendationResponse
 from app.schemas.payment import PaymentRequest, PaymentResponse, QRCodeResponse
 from app.schemas.alert import AlertResponse
@@ -20,6 +26,9 @@ __all__ = [
     "CartItemCreate",
     "CartItemResponse",
     "CartUpdate",
+    "CartBatchItem",
+    "CartBatchCreate",
+    "CartBatchResponse",
     "BillingResponse",
     "BillCalculation",
     "AIVerificationRequest",
@@ -27,6 +36,8 @@ __all__ = [
     "NavigationRequest",
     "NavigationResponse",
     "AisleResponse",
+    "ShoppingRouteRequest",
+    "ShoppingRouteResponse",
     "RecommendationResponse",
     "PaymentRequest",
     "PaymentResponse",
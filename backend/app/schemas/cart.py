@@ -1,7 +1,7 @@
 """
 Cart schemas
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional
 from datetime import datetime
 from app.schemas.product import ProductResponse
@@ -12,6 +12,22 @@ class CartItemCreate(BaseModel):
     quantity: int = 1
 
 
+class CartBatchItem(BaseModel):
+    product_id: Optional[int] = None
+    barcode: Optional[str] = None
+    quantity: int = Field(1, ge=1)
+    
+    @model_validator(mode="after")
+    def check_identifier(self):
+        if self.product_id is None and not self.barcode:
+            raise ValueError("Either product_id or barcode must be provided")
+        return self
+
+
+class CartBatchCreate(BaseModel):
+    items: List[CartBatchItem] = Field(..., min_length=1, max_length=500)
+
+
 class CartItemResponse(BaseModel):
     id: int
     product_id: int
@@ -44,6 +60,7 @@ class CartResponse(BaseModel):
     tax_amount: float
     discount_amount: float
     final_amount: float
+    item_count: int = 0
     has_alert: bool
     alert_reason: Optional[str] = None
     items: List[CartItemResponse] = []
@@ -52,3 +69,10 @@ class CartResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class CartBatchResponse(BaseModel):
+    cart_id: int
+    items: List[CartItemResponse]
+    item_count: int
+    final_amount: float
@@ -1,7 +1,7 @@
 """
 Navigation schemas
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Tuple
 
 
@@ -26,7 +26,7 @@ class NavigationRequest(BaseModel):
 class NavigationStep(BaseModel):
     step_number: int
     instruction: str
-    aisle_id: int
+    aisle_id: Optional[int] = None  # None for corridor waypoints
     aisle_name: str
     coordinates: Tuple[float, float]
 
@@ -39,3 +39,25 @@ class NavigationResponse(BaseModel):
     route: List[NavigationStep]
     total_distance: float
     estimated_time_minutes: float
+
+
+class ShoppingRouteRequest(BaseModel):
+    cart_id: int
+    product_ids: List[int] = Field(..., min_length=1, max_length=200)
+
+
+class ShoppingStop(BaseModel):
+    stop_number: int
+    aisle: AisleResponse
+    product_ids: List[int]
+    distance_from_previous: float
+
+
+class ShoppingRouteResponse(BaseModel):
+    cart_id: int
+    stops: List[ShoppingStop]
+    route: List[NavigationStep]
+    total_distance: float
+    estimated_time_minutes: float
+    solver: str  # "trivial", "exact" or "heuristic"
+    unrouted_product_ids: List[int] = []
@@ -9,13 +9,17 @@ from datetime import datetime
 class PaymentRequest(BaseModel):
     cart_id: int
     payment_method: str  # "qr_code", "nfc", "card", "cash"
+    payment_token: Optional[str] = None  # Token scanned from the payment QR
+    idempotency_key: Optional[str] = None  # Same key on a retry returns the original transaction
 
 
 class QRCodeResponse(BaseModel):
-    qr_code_data: str  # Base64 encoded QR code image
+    qr_code_data: str  # Base64 PNG, SVG markup or 0/1 module rows, per format
     payment_reference: str
     amount: float
     expires_at: datetime
+    format: str = "png"
+    payment_token: Optional[str] = None  # Signed payload encoded in the QR
 
 
 class PaymentResponse(BaseModel):
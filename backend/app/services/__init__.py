@@ -8,6 +8,15 @@ from app.services.recommendation_service import RecommendationService
 from app.services.theft_detection_service import TheftDetectionService
 from app.services.payment_service import PaymentService
 from app.services.iot_service import IoTService
+from app.services.catalog_cache_service import CatalogCacheService
+from app.services.cooccurrence_service import CoOccurrenceIndex
+from app.services.search_service import ProductSearchIndex
+from app.services.inference_service import BatchInferenceScheduler
+from app.services.analytics_service import AnalyticsRollupService
+from app.services.qr_service import PaymentQRService
+from app.services.executor_service import ExecutorService
+from app.services.alert_sink import AlertSink
+from app.services.embedding_service import EmbeddingStore
 
 __all__ = [
     "BillingService",
@@ -17,4 +26,13 @@ __all__ = [
     "TheftDetectionService",
     "PaymentService",
     "IoTService",
+    "CatalogCacheService",
+    "CoOccurrenceIndex",
+    "ProductSearchIndex",
+    "BatchInferenceScheduler",
+    "AnalyticsRollupService",
+    "PaymentQRService",
+    "ExecutorService",
+    "AlertSink",
+    "EmbeddingStore",
 ]
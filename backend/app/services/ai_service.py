@@ -1,16 +1,23 @@
 """
 AI Vision Verification Service
-Handles product detection and verification using YOLOv8 or fallback methods
+Handles product detection and verification using YOLOv8 or fallback methods.
+With an embedding store configured, detection crops are verified by cosine
+similarity to per-product reference embeddings instead of by name.
+
+The model is loaded on first use (or warmed in the background at startup),
+and PIL/ultralytics are only imported when a frame is actually processed.
 """
 import os
-import base64
-import io
-from typing import Optional, Dict, Any, List
-from PIL import Image
+import threading
+from typing import Optional, Dict, Any, List, Union
 import numpy as np
 from app.config import settings
 from app.models.product import Product
 from app.schemas.ai import AIVerificationResponse
+from app.cpu_tasks import decode_base64_image, decode_image_bytes
+from app.services.embedding_service import EmbeddingStore, ProductMatcher, StubImageEncoder, crop_detections
+from app.services.executor_service import executor_service
+from app.services.inference_service import BatchInferenceScheduler, StubDetectionModel
 
 
 class AIService:
@@ -19,14 +26,52 @@ class AIService:
     def __init__(self):
         self.model = None
         self.model_loaded = False
-        self._load_model()
+        self.model_state = "not_loaded"  # not_loaded, loading, ready or mock
+        self.matcher: Optional[ProductMatcher] = None
+        self._model_lock = threading.Lock()
+        self.scheduler = BatchInferenceScheduler(
+            self._predict_batch,
+            max_batch_size=settings.AI_INFERENCE_MAX_BATCH_SIZE,
+            max_wait_ms=settings.AI_INFERENCE_MAX_WAIT_MS,
+            max_queue_size=settings.AI_INFERENCE_QUEUE_SIZE
+        )
+    
+    @property
+    def ready(self) -> bool:
+        """True once the model is loaded or mock mode has been selected"""
+        return self.model_state in ("ready", "mock")
+    
+    def ensure_model(self):
+        """
+        Load the model on first use; concurrent callers wait for one load
+        """
+        if self.model_state in ("ready", "mock"):
+            return
+        with self._model_lock:
+            if self.model_state == "not_loaded":
+                self.model_state = "loading"
+                self._load_model()
+                self._load_embeddings()
+                self.model_state = "ready" if self.model_loaded else "mock"
+    
+    def warm_up(self) -> threading.Thread:
+        """
+        Load the model on a background thread so startup is not blocked
+        """
+        thread = threading.Thread(target=self.ensure_model, name="ai-model-warmup", daemon=True)
+        thread.start()
+        return thread
     
     def _load_model(self):
         """
         Load YOLOv8 model or set up mock mode
         """
         try:
-            if settings.AI_MODEL_PATH and os.path.exists(settings.AI_MODEL_PATH):
+            if settings.AI_STUB_MODEL:
+                self.model = StubDetectionModel(batch_latency_ms=settings.AI_STUB_LATENCY_MS)
+                self.model_loaded = True
+                print(f"✅ AI stub model enabled ({settings.AI_STUB_LATENCY_MS} ms per batch)")
+            elif settings.AI_MODEL_PATH and os.path.exists(settings.AI_MODEL_PATH):
                 from ultralytics import YOLO
                 self.model = YOLO(settings.AI_MODEL_PATH)
                 self.model_loaded = True
@@ -38,21 +83,37 @@ class AIService:
             print(f"⚠️  Failed to load AI model: {e}. Using mock mode.")
             self.model_loaded = False
     
-    def _decode_image(self, image_data: str) -> Optional[Image.Image]:
+    def _load_embeddings(self):
         """
-        Decode base64 image data
+        Open the product embedding store, if one is configured
         """
+        path = settings.AI_EMBEDDING_STORE_PATH
+        if not path:
+            return
         try:
-            if image_data.startswith('data:image'):
-                # Remove data URL prefix
-                image_data = image_data.split(',')[1]
-            
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
-            return image.convert('RGB')
+            store = EmbeddingStore.load(path, mmap=settings.AI_EMBEDDING_MMAP)
+            self.matcher = ProductMatcher(store, StubImageEncoder(dim=settings.AI_EMBEDDING_DIM))
+            print(f"✅ Product embeddings loaded from {path} ({len(store)} products)")
         except Exception as e:
-            print(f"Error decoding image: {e}")
-            return None
+            print(f"⚠️  Failed to load product embeddings: {e}. Using name matching.")
+            self.matcher = None
+    
+    def decode_frame(self, data: Union[bytes, bytearray]) -> Optional[np.ndarray]:
+        """
+        Decode encoded image bytes into an RGB array no larger than the model
+        input size, in the CPU executor (the upload buffer is passed as is)
+        """
+        return executor_service.run_cpu(
+            decode_image_bytes, data, settings.AI_MODEL_INPUT_SIZE, name="image_decode"
+        )
+    
+    def _decode_image(self, image_data: str) -> Optional[np.ndarray]:
+        """
+        Decode base64 image data, in the CPU executor
+        """
+        return executor_service.run_cpu(
+            decode_base64_image, image_data, settings.AI_MODEL_INPUT_SIZE, name="image_decode"
+        )
     
     def _mock_detection(self, product: Product) -> Dict[str, Any]:
         """
@@ -74,44 +135,85 @@ class AIService:
             "class_id": product.category
         }
     
-    def detect_products(self, image: Image.Image) -> List[Dict[str, Any]]:
+    def _predict_batch(self, images: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
         """
-        Detect products in image using YOLOv8 or mock
+        Run one forward pass over a batch of RGB frames; called on the scheduler worker
+        """
+        if isinstance(self.model, StubDetectionModel):
+            return self.model.predict(images)
+        
+        # Run YOLOv8 inference; one result per input image. Ultralytics reads
+        # arrays as BGR, so pass a reversed-channel view rather than a copy.
+        results = self.model([image[..., ::-1] for image in images], conf=settings.AI_CONFIDENCE_THRESHOLD)
+        
+        batch_detections = []
+        for result in results:
+            detections = []
+            for box in result.boxes:
+                detections.append({
+                    "confidence": float(box.conf[0]),
+                    "bbox": box.xyxy[0].tolist(),
+                    "class_id": int(box.cls[0]),
+                    "class_name": result.names[int(box.cls[0])]
+                })
+            batch_detections.append(detections)
+        
+        return batch_detections
+    
+    def detect_products(self, image: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Detect products in image using YOLOv8 or mock. Frames from concurrent
+        requests are batched by the inference scheduler; raises RuntimeError
+        when the queue is full.
         """
         if not self.model_loaded:
             # Return mock detection
             return []
         
+        future = self.scheduler.submit(image)
         try:
-            # Run YOLOv8 inference
-            results = self.model(image, conf=settings.AI_CONFIDENCE_THRESHOLD)
-            
-            detections = []
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    detection = {
-                        "confidence": float(box.conf[0]),
-                        "bbox": box.xyxy[0].tolist(),
-                        "class_id": int(box.cls[0]),
-                        "class_name": result.names[int(box.cls[0])]
-                    }
-                    detections.append(detection)
-            
-            return detections
+            return future.result(timeout=settings.AI_INFERENCE_TIMEOUT_SECONDS)
         except Exception as e:
             print(f"Error in product detection: {e}")
             return []
     
+    def get_inference_stats(self) -> Dict[str, Any]:
+        """Get inference scheduler metrics"""
+        return {
+            "model_state": self.model_state,
+            "model_loaded": self.model_loaded,
+            "model": type(self.model).__name__ if self.model is not None else None,
+            "embeddings": self.matcher.store.get_stats() if self.matcher is not None else None,
+            **self.scheduler.get_stats()
+        }
+    
     def verify_product(
         self,
         product: Product,
         image_data: Optional[str] = None,
-        detected_objects: Optional[List[Dict[str, Any]]] = None
+        detected_objects: Optional[List[Dict[str, Any]]] = None,
+        image_bytes: Optional[Union[bytes, bytearray, memoryview]] = None
     ) -> AIVerificationResponse:
         """
-        Verify if detected product matches scanned product
+        Verify if detected product matches scanned product. The frame can be
+        given as base64 image_data or as raw encoded image_bytes.
         """
+        self.ensure_model()
+        
+        # Embedding verification needs a frame and a reference for the product;
+        # without a detector the whole frame is matched
+        if (image_data or image_bytes) and self.matcher is not None and product.id in self.matcher.store:
+            image = self.decode_frame(image_bytes) if image_bytes else self._decode_image(image_data)
+            if image is None:
+                return AIVerificationResponse(
+                    verified=False,
+                    confidence=0.0,
+                    match_score=0.0,
+                    alert_triggered=True,
+                    message="Failed to decode image"
+                )
+            return self._verify_by_embedding(product, image, self.detect_products(image))
+        
         # If no model loaded, use mock verification
         if not self.model_loaded:
             mock_result = self._mock_detection(product)
@@ -129,9 +231,9 @@ class AIService:
             )
         
         # Real AI verification
-        if image_data:
-            image = self._decode_image(image_data)
-            if not image:
+        if image_data or image_bytes:
+            image = self.decode_frame(image_bytes) if image_bytes else self._decode_image(image_data)
+            if image is None:
                 return AIVerificationResponse(
                     verified=False,
                     confidence=0.0,
@@ -152,13 +254,11 @@ class AIService:
                 message="No image data or detections provided"
             )
         
-        # Match detection with product
-        # This is simplified - in production, you'd match class names or use embeddings
+        # Match detection with product by name (no reference embedding for it)
         best_match = None
         best_confidence = 0.0
         
         for detection in detections:
-            # Simple matching logic - in production, use product embeddings
             class_name = detection.get("class_name", "").lower()
             product_name = product.name.lower()
             product_category = product.category.lower()
@@ -196,6 +296,55 @@ class AIService:
             }
         )
 
+    
+    def _verify_by_embedding(
+        self,
+        product: Product,
+        image: np.ndarray,
+        detections: List[Dict[str, Any]]
+    ) -> AIVerificationResponse:
+        """
+        Match every detection crop against the catalog in one batch; the
+        product is verified if it is a top-k candidate for some crop with
+        enough similarity
+        """
+        pairs = [(detection, crop) for detection in detections for crop in crop_detections(image, [detection])]
+        matched, crops = zip(*pairs) if pairs else ([{}], [image])
+        
+        candidate_ids, scores = self.matcher.match(crops, k=settings.AI_EMBEDDING_TOP_K)
+        crop_scores = np.where(candidate_ids == product.id, scores, -1.0).max(axis=1)
+        best = int(crop_scores.argmax())
+        match_score = max(float(crop_scores[best]), 0.0)
+        verified = match_score >= settings.AI_EMBEDDING_MATCH_THRESHOLD
+        
+        if verified:
+            confidence = float(matched[best].get("confidence", match_score))
+            message = f"Product verified with {match_score:.2%} similarity"
+        else:
+            confidence = float(scores[best, 0])
+            message = "Product mismatch detected - alert triggered"
+        
+        return AIVerificationResponse(
+            verified=verified,
+            confidence=confidence,
+            detected_product_id=product.id if verified else int(candidate_ids[best, 0]),
+            detected_product_name=product.name if verified else "Unknown",
+            match_score=match_score,
+            alert_triggered=not verified,
+            message=message,
+            details={
+                "method": "embedding",
+                "detections": detections,
+                "candidates": [
+                    [
+                        {"product_id": int(product_id), "score": round(float(score), 4)}
+                        for product_id, score in zip(crop_ids, crop_scores_k)
+                    ]
+                    for crop_ids, crop_scores_k in zip(candidate_ids, scores)
+                ]
+            }
+        )
+
 
 # Global AI service instance
 ai_service = AIService()
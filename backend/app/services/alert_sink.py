@@ -0,0 +1,272 @@
+"""
+Write-Behind Alert Sink
+Buffers alerts raised by the theft rules and writes them in batched INSERTs,
+flushed when batch_size alerts are waiting or after flush_interval_ms, so a
+burst of alerts costs one transaction rather than a commit each. Alert
+events are published only once their rows are committed.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import case, insert, update
+from sqlalchemy.exc import DisconnectionError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.alert import Alert, AlertStatus
+from app.models.cart import Cart
+from app.services.analytics_service import analytics_rollups
+from app.services.iot_service import iot_service
+from app.services.theft_rules import AlertSpec
+
+ALERT_SINK_MODES = ("buffered", "sync")
+
+# Errors of the database rather than of the rows: the batch is retried whole
+TRANSIENT_ERRORS = (OperationalError, DisconnectionError, PoolTimeoutError)
+
+
+def _publish_alerts(specs: List[AlertSpec]):
+    for spec in specs:
+        iot_service.publish_alert_event(spec.cart_id, spec.alert_type.value, spec.message, spec.severity.value)
+
+
+class AlertSink:
+    """
+    submit() never touches the database in buffered mode; a flusher thread
+    does. In sync mode (tests, scripts) submit() writes before returning.
+    A flush that fails because the database is unavailable puts its alerts
+    back at the head of the buffer for the next attempt; past max_buffer the
+    oldest alerts are dropped. A batch the database rejects for any other
+    reason is written again row by row, and rows that still fail are
+    dead-lettered (kept in dead_letters and counted) instead of blocking
+    every later alert.
+    """
+    
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        flush_interval_ms: Optional[float] = None,
+        max_buffer: Optional[int] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        publish: Callable[[List[AlertSpec]], None] = _publish_alerts,
+        latency_window: int = 1000,
+        dead_letter_size: int = 1000
+    ):
+        self.mode = mode or settings.ALERT_SINK_MODE
+        if self.mode not in ALERT_SINK_MODES:
+            raise ValueError(f"Unknown alert sink mode: {self.mode}")
+        self.batch_size = batch_size or settings.ALERT_SINK_BATCH_SIZE
+        self.flush_interval_ms = settings.ALERT_SINK_FLUSH_INTERVAL_MS if flush_interval_ms is None else flush_interval_ms
+        self.max_buffer = max_buffer or settings.ALERT_SINK_MAX_BUFFER
+        self.session_factory = session_factory
+        self.publish = publish
+        self._buffer: deque = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()  # One flush writes at a time
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+        
+        # Metrics
+        self.submitted = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+        self.dead_letters: deque = deque(maxlen=dead_letter_size)  # (alert, error) pairs
+        self.buffered_peak = 0
+        self.batch_sizes: deque = deque(maxlen=latency_window)
+        self.flush_ms: deque = deque(maxlen=latency_window)
+    
+    def _start(self):
+        """Start the flusher on first use so importing the app starts no threads"""
+        with self._condition:
+            if self._flusher is None and not self._closed:
+                self._flusher = threading.Thread(target=self._flush_periodically, name="alert-sink-flusher", daemon=True)
+                self._flusher.start()
+    
+    def submit(self, specs: List[AlertSpec]):
+        """
+        Queue alerts for writing (the theft rules engine's raise_alerts)
+        """
+        if not specs:
+            return
+        now = datetime.utcnow()
+        specs = [spec if spec.created_at else spec._replace(created_at=now) for spec in specs]
+        if self.mode == "sync" or self._closed:
+            with self._condition:
+                self.submitted += len(specs)
+                self._buffer.extend(specs)
+            self.flush()
+            return
+        
+        if self._flusher is None:
+            self._start()
+        with self._condition:
+            self.submitted += len(specs)
+            self._buffer.extend(specs)
+            self._trim()
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+    
+    def _trim(self):
+        overflow = len(self._buffer) - self.max_buffer
+        for _ in range(overflow):
+            self._buffer.popleft()
+        if overflow > 0:
+            self.dropped += overflow
+        self.buffered_peak = max(self.buffered_peak, len(self._buffer))
+    
+    def _flush_periodically(self):
+        retrying = False
+        while True:
+            with self._condition:
+                if (retrying or len(self._buffer) < self.batch_size) and not self._closed:
+                    self._condition.wait(self.flush_interval_ms / 1000.0)
+                if self._closed:
+                    return
+            failed = self.failed_flushes
+            self.flush()
+            # Back off for an interval after a failed write
+            retrying = self.failed_flushes != failed
+    
+    def flush(self) -> int:
+        """
+        Write everything buffered now, one batch_size INSERT at a time;
+        returns the number of alerts written
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._condition:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    return written
+                stored, retry = self._write_batch(batch)
+                if stored:
+                    written += len(stored)
+                    self.publish(stored)
+                if retry:
+                    with self._condition:
+                        self._buffer.extendleft(reversed(retry))
+                        self._trim()
+                    return written
+    
+    def _write_batch(self, batch: List[AlertSpec]) -> Tuple[List[AlertSpec], List[AlertSpec]]:
+        """
+        Write a batch, falling back to one row at a time when the database
+        rejects it; returns (alerts written, alerts to retry later)
+        """
+        error = self._write(batch)
+        if error is None:
+            return batch, []
+        if isinstance(error, TRANSIENT_ERRORS):
+            return [], batch
+        
+        stored = []
+        for index, spec in enumerate(batch):
+            error = self._write([spec]) if len(batch) > 1 else error
+            if error is None:
+                stored.append(spec)
+            elif isinstance(error, TRANSIENT_ERRORS):
+                return stored, batch[index:]
+            else:
+                self.dead_lettered += 1
+                self.dead_letters.append((spec, repr(error)))
+                print(f"Dead-lettered alert for cart {spec.cart_id}: {error}")
+        return stored, []
+    
+    def _write(self, batch: List[AlertSpec]) -> Optional[Exception]:
+        """
+        Insert one batch and flag its carts in a single transaction; returns
+        the error if it was rolled back
+        """
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            db.execute(insert(Alert), [
+                {
+                    "cart_id": spec.cart_id,
+                    "product_id": spec.product_id,
+                    "alert_type": spec.alert_type,
+                    "severity": spec.severity,
+                    "status": AlertStatus.PENDING,
+                    "message": spec.message,
+                    "details": spec.details,
+                    "created_at": spec.created_at
+                }
+                for spec in batch
+            ])
+            
+            # Update cart alert status
+            messages: Dict[int, List[str]] = {}
+            for spec in batch:
+                if spec.cart_id is not None:
+                    messages.setdefault(spec.cart_id, []).append(spec.message)
+            if messages:
+                reasons = {cart_id: "; ".join(cart_messages[:3]) for cart_id, cart_messages in messages.items()}
+                db.execute(
+                    update(Cart).where(Cart.id.in_(reasons.keys())).values(
+                        has_alert=True,
+                        alert_reason=case(reasons, value=Cart.id, else_=Cart.alert_reason)
+                    ).execution_options(synchronize_session=False)
+                )
+            
+            # Bulk inserts skip the per-row analytics hook
+            analytics_rollups.record_alerts(db.connection(), [spec.created_at for spec in batch])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.failed_flushes += 1
+            print(f"Error writing {len(batch)} alerts: {e}")
+            return e
+        finally:
+            db.close()
+        
+        analytics_rollups.invalidate()
+        self.flushes += 1
+        self.written += len(batch)
+        self.batch_sizes.append(len(batch))
+        self.flush_ms.append((time.perf_counter() - started) * 1000.0)
+        return None
+    
+    def close(self):
+        """Stop the flusher and write whatever is buffered (application shutdown)"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            flusher = self._flusher
+        if flusher is not None:
+            flusher.join()
+        self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Buffer depth, batch sizes and flush latency"""
+        latency = np.array(self.flush_ms)
+        return {
+            "mode": self.mode,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": self.flush_interval_ms,
+            "buffered": len(self._buffer),
+            "buffered_peak": self.buffered_peak,
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "dead_lettered": self.dead_lettered,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "mean_batch_size": round(float(np.mean(self.batch_sizes)), 1) if self.batch_sizes else 0.0,
+            "flush_latency_ms": {
+                "p50": round(float(np.percentile(latency, 50)), 3),
+                "p99": round(float(np.percentile(latency, 99)), 3),
+                "mean": round(float(latency.mean()), 3)
+            } if len(latency) else None
+        }
+
+
+# Global alert sink instance
+alert_sink = AlertSink()
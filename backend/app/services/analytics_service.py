@@ -0,0 +1,384 @@
+"""
+Analytics Rollup Service
+Hourly, daily and monthly sales totals, per-product sales by day and month
+and alert counts, updated incrementally as transactions complete and alerts are raised, so
+dashboard reads touch a few summary rows instead of the raw history.
+Rebuild from history with rebuild_analytics.py or POST /admin/analytics/rebuild.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import DateTime, Table, and_, delete, desc, event, func, insert, or_, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, object_session
+from app.config import settings
+from app.models.alert import Alert
+from app.models.analytics import SalesRollup, ProductSalesRollup
+from app.models.product import Product
+from app.models.transaction import Transaction, TransactionItem, TransactionStatus
+
+GRANULARITIES = ("hour", "day", "month")
+PRODUCT_GRANULARITIES = ("day", "month")
+SALES_KEYS = ("granularity", "bucket_start")
+PRODUCT_KEYS = ("granularity", "bucket_start", "product_id")
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Start of the hour, day or month containing a moment, as naive UTC"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if granularity == "month":
+        return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def sql_bucket_start(column, granularity: str, dialect_name: str):
+    """
+    SQL expression truncating a timestamp column to its hour, day or month,
+    for GROUP BY; a "YYYY-MM-DD HH:MM:SS" string on SQLite and MySQL
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown rollup granularity: {granularity}")
+    if dialect_name == "postgresql":
+        return func.date_trunc(granularity, column)
+    
+    pattern = {"hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d 00:00:00", "month": "%Y-%m-01 00:00:00"}[granularity]
+    if dialect_name == "mysql":
+        return func.date_format(column, pattern)
+    return func.strftime(pattern, column)
+
+
+def _next_month(start: datetime) -> datetime:
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _increment(conn: Connection, table: Table, keys: Tuple[str, ...], rows: List[Dict[str, Any]]):
+    """
+    Add each row's counters to its bucket, creating the bucket on first use.
+    SQLite and PostgreSQL do this in one INSERT ... ON CONFLICT; other
+    databases fall back to UPDATE, then INSERT when no row matched.
+    """
+    if not rows:
+        return
+    counters = [name for name in rows[0] if name not in keys]
+    
+    if conn.dialect.name in ("sqlite", "postgresql"):
+        if conn.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        stmt = upsert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: table.c[name] + stmt.excluded[name] for name in counters}
+        )
+        conn.execute(stmt, rows)
+        return
+    
+    for row in rows:
+        result = conn.execute(
+            update(table)
+            .where(*(table.c[key] == row[key] for key in keys))
+            .values({name: table.c[name] + row[name] for name in counters})
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(table).values(**row))
+
+
+class AnalyticsRollupService:
+    """
+    Writes go to the rollup tables inside the caller's database transaction.
+    Reads are cached in process for ANALYTICS_CACHE_TTL_SECONDS; writes made
+    by this process invalidate the cache at once, writes by other workers
+    show up when entries expire.
+    """
+    
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = settings.ANALYTICS_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._cache: Dict[tuple, Tuple[float, Any]] = {}  # key -> (expires_at, value)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded_transactions = 0
+        self.recorded_alerts = 0
+    
+    def invalidate(self):
+        with self._lock:
+            self._cache = {}
+            self._generation += 1
+    
+    def _cached(self, key: tuple, load: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        
+        value = load()
+        with self._lock:
+            # Don't cache a value read before a concurrent invalidation
+            if generation == self._generation:
+                self._cache[key] = (now + self.ttl_seconds, value)
+        return value
+    
+    def record_transaction(self, db: Session, transaction: Transaction):
+        """
+        Add a completed transaction to its sales and product rollups. Runs in
+        the caller's database transaction; call invalidate() once it commits.
+        """
+        completed_at = transaction.completed_at or datetime.utcnow()
+        
+        products: Dict[int, List] = {}
+        for item in transaction.items:
+            row = products.setdefault(item.product_id, [0, 0.0])
+            row[0] += item.quantity
+            row[1] += item.subtotal
+        items_sold = sum(quantity for quantity, _ in products.values())
+        
+        conn = db.connection()
+        _increment(conn, SalesRollup.__table__, SALES_KEYS, [
+            {
+                "granularity": granularity,
+                "bucket_start": bucket_start(completed_at, granularity),
+                "transaction_count": 1,
+                "revenue": transaction.amount,
+                "items_sold": items_sold
+            }
+            for granularity in GRANULARITIES
+        ])
+        _increment(conn, ProductSalesRollup.__table__, PRODUCT_KEYS, [
+            {
+                "granularity": granularity,
+                "bucket_start": bucket_start(completed_at, granularity),
+                "product_id": product_id,
+                "purchase_count": 1,
+                "quantity": quantity,
+                "revenue": revenue
+            }
+            for granularity in PRODUCT_GRANULARITIES
+            for product_id, (quantity, revenue) in sorted(products.items())
+        ])
+        self.recorded_transactions += 1
+    
+    def record_alert(self, conn: Connection, created_at: datetime):
+        """Count one alert in its hour, day and month rollups"""
+        self.record_alerts(conn, [created_at])
+    
+    def record_alerts(self, conn: Connection, created_ats: List[datetime]):
+        """
+        Count a batch of alerts, one increment per bucket they fall in. Runs
+        in the caller's database transaction; call invalidate() once it commits.
+        """
+        counts: Dict[Tuple[str, datetime], int] = defaultdict(int)
+        for created_at in created_ats:
+            for granularity in GRANULARITIES:
+                counts[granularity, bucket_start(created_at, granularity)] += 1
+        _increment(conn, SalesRollup.__table__, SALES_KEYS, [
+            {"granularity": granularity, "bucket_start": start, "alert_count": count}
+            for (granularity, start), count in sorted(counts.items())
+        ])
+        self.recorded_alerts += len(created_ats)
+    
+    def _load_totals(self, db: Session, granularity: str, start: datetime) -> Dict[str, Any]:
+        row = db.query(SalesRollup).filter(
+            SalesRollup.granularity == granularity,
+            SalesRollup.bucket_start == start
+        ).first()
+        return {
+            "bucket_start": start.isoformat(),
+            "transaction_count": row.transaction_count if row else 0,
+            "revenue": round(row.revenue, 2) if row else 0.0,
+            "items_sold": row.items_sold if row else 0,
+            "alert_count": row.alert_count if row else 0
+        }
+    
+    def get_totals(self, db: Session, granularity: str = "day", moment: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Totals for the hour, day or month containing moment (default: now);
+        one row
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown rollup granularity: {granularity}")
+        start = bucket_start(moment or datetime.utcnow(), granularity)
+        return self._cached(("totals", granularity, start), lambda: self._load_totals(db, granularity, start))
+    
+    def _load_popular(self, db: Session, since: datetime, limit: int) -> List[Dict[str, Any]]:
+        """
+        Sum product rollups from `since` to now: whole months from month rows,
+        the partial months at either end from day rows
+        """
+        rollup = ProductSalesRollup
+        first_month = since if since.day == 1 else _next_month(since)
+        current_month = bucket_start(datetime.utcnow(), "month")
+        if first_month < current_month:
+            buckets = or_(
+                and_(rollup.granularity == "day", rollup.bucket_start >= since, rollup.bucket_start < first_month),
+                and_(rollup.granularity == "month", rollup.bucket_start >= first_month, rollup.bucket_start < current_month),
+                and_(rollup.granularity == "day", rollup.bucket_start >= current_month)
+            )
+        else:
+            buckets = and_(rollup.granularity == "day", rollup.bucket_start >= since)
+        
+        purchase_count = func.sum(rollup.purchase_count).label("purchase_count")
+        top = db.query(
+            rollup.product_id,
+            purchase_count,
+            func.sum(rollup.quantity).label("total_quantity"),
+            func.sum(rollup.revenue).label("revenue")
+        ).filter(buckets).group_by(
+            rollup.product_id
+        ).order_by(
+            desc(purchase_count), rollup.product_id
+        ).limit(limit).subquery()
+        
+        popular = db.query(
+            Product.id,
+            Product.name,
+            Product.category,
+            Product.price,
+            top.c.purchase_count,
+            top.c.total_quantity,
+            top.c.revenue
+        ).join(
+            top, top.c.product_id == Product.id
+        ).order_by(
+            desc(top.c.purchase_count), Product.id
+        ).all()
+        
+        return [
+            {
+                "product_id": p.id,
+                "name": p.name,
+                "category": p.category,
+                "price": p.price,
+                "purchase_count": p.purchase_count,
+                "total_quantity": p.total_quantity,
+                "revenue": round(p.revenue, 2)
+            }
+            for p in popular
+        ]
+    
+    def get_popular_products(self, db: Session, days: int = 7, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Best sellers over the last `days` calendar days (UTC, including
+        today); reads at most ~2 months of day rows plus one row per
+        month per product, however much history there is
+        """
+        today = bucket_start(datetime.utcnow(), "day")
+        since = today - timedelta(days=days - 1)
+        return self._cached(("popular", since, limit), lambda: self._load_popular(db, since, limit))
+    
+    def rebuild(self, db: Session, batch_size: int = 10000) -> Dict[str, int]:
+        """
+        Recompute every rollup from completed transactions and alerts
+        """
+        totals: Dict[Tuple[str, datetime], Dict[str, Any]] = defaultdict(
+            lambda: {"transaction_count": 0, "revenue": 0.0, "items_sold": 0, "alert_count": 0}
+        )
+        products: Dict[Tuple[str, datetime, int], Dict[str, Any]] = defaultdict(
+            lambda: {"purchase_count": 0, "quantity": 0, "revenue": 0.0}
+        )
+        completed_at = func.coalesce(Transaction.completed_at, Transaction.created_at, type_=DateTime)
+        
+        transactions = db.query(completed_at, Transaction.amount).filter(
+            Transaction.status == TransactionStatus.COMPLETED
+        ).yield_per(batch_size)
+        for moment, amount in transactions:
+            for granularity in GRANULARITIES:
+                row = totals[granularity, bucket_start(moment, granularity)]
+                row["transaction_count"] += 1
+                row["revenue"] += amount
+        
+        lines = db.query(
+            completed_at, TransactionItem.transaction_id, TransactionItem.product_id,
+            TransactionItem.quantity, TransactionItem.subtotal
+        ).join(
+            Transaction, Transaction.id == TransactionItem.transaction_id
+        ).filter(
+            Transaction.status == TransactionStatus.COMPLETED
+        ).order_by(TransactionItem.transaction_id).yield_per(batch_size)
+        current_id, seen, starts = None, set(), {}
+        for moment, transaction_id, product_id, quantity, subtotal in lines:
+            if transaction_id != current_id:
+                current_id, seen = transaction_id, set()
+                starts = {granularity: bucket_start(moment, granularity) for granularity in GRANULARITIES}
+            first_line = product_id not in seen
+            seen.add(product_id)
+            for granularity, start in starts.items():
+                totals[granularity, start]["items_sold"] += quantity
+                if granularity in PRODUCT_GRANULARITIES:
+                    row = products[granularity, start, product_id]
+                    row["purchase_count"] += first_line
+                    row["quantity"] += quantity
+                    row["revenue"] += subtotal
+        
+        for (created_at,) in db.query(Alert.created_at).yield_per(batch_size):
+            if created_at is not None:
+                for granularity in GRANULARITIES:
+                    totals[granularity, bucket_start(created_at, granularity)]["alert_count"] += 1
+        
+        db.execute(delete(SalesRollup))
+        db.execute(delete(ProductSalesRollup))
+        sales_rows = [
+            {"granularity": granularity, "bucket_start": start, **counters}
+            for (granularity, start), counters in totals.items()
+        ]
+        product_rows = [
+            {"granularity": granularity, "bucket_start": start, "product_id": product_id, **counters}
+            for (granularity, start, product_id), counters in products.items()
+        ]
+        for table, rows in ((SalesRollup, sales_rows), (ProductSalesRollup, product_rows)):
+            for offset in range(0, len(rows), batch_size):
+                db.execute(insert(table), rows[offset:offset + batch_size])
+        db.commit()
+        self.invalidate()
+        
+        return {"sales_rollups": len(sales_rows), "product_sales_rollups": len(product_rows)}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "cached_entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded_transactions": self.recorded_transactions,
+            "recorded_alerts": self.recorded_alerts,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+# Global analytics rollup service instance
+analytics_rollups = AnalyticsRollupService()
+
+
+@event.listens_for(Alert, "before_insert")
+def _stamp_alert(mapper, connection, target):
+    """Set created_at in the INSERT, so the rollup buckets the time stored"""
+    if target.created_at is None:
+        target.created_at = datetime.utcnow()
+
+
+@event.listens_for(Alert, "after_insert")
+def _count_alert(mapper, connection, target):
+    """
+    Count alerts wherever they are created, in the inserting transaction;
+    the cache is invalidated once that transaction commits
+    """
+    analytics_rollups.record_alert(connection, target.created_at)
+    session = object_session(target)
+    if session is not None:
+        session.info["analytics_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("analytics_changed", False):
+        analytics_rollups.invalidate()
+
@@ -2,12 +2,23 @@
 Smart Billing Engine Service
 Handles cart calculations, tax, discounts, and bill generation
 """
-from sqlalchemy.orm import Session
+from sqlalchemy import Numeric, case, cast, func, update
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.config import settings
 from app.models.cart import Cart, CartItem
-from app.models.product import Product
 from app.schemas.billing import BillingResponse, BillCalculation
 from app.schemas.cart import CartItemResponse
-from typing import List
+from app.services.catalog_cache_service import catalog_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (unit_price, tax_rate, quantity_delta) of one changed cart line
+LineDelta = Tuple[float, float, int]
+
+
+def _round_amount(expression):
+    """Round a money expression to cents in SQL (on any backend)"""
+    return func.round(cast(expression, Numeric), 2)
 
 
 class BillingService:
@@ -55,12 +66,103 @@ class BillingService:
         cart.tax_amount = calculation.tax_amount
         cart.discount_amount = calculation.discount_amount
         cart.final_amount = calculation.final_amount
+        cart.item_count = calculation.item_count
+        cart.updates_since_reconcile = 0
+        BillingService.bump_version(cart)
         
         db.commit()
         db.refresh(cart)
         
         return cart
     
+    @staticmethod
+    def apply_item_delta(db: Session, cart: Cart, lines: Iterable[LineDelta]) -> int:
+        """
+        Apply line changes to the stored cart totals in O(1), as one UPDATE
+        that increments the row in SQL (so concurrent scans of the same cart
+        both count), and bump its version and reconcile counter. Returns the
+        number of incremental updates since the last full recompute.
+        Rounding drift is bounded and cleared by that periodic recompute.
+        """
+        line_subtotal = 0.0
+        line_tax = 0.0
+        quantity_delta = 0
+        for unit_price, tax_rate, quantity in lines:
+            line_subtotal += unit_price * quantity
+            line_tax += unit_price * quantity * (tax_rate / 100.0)
+            quantity_delta += quantity
+        
+        # SET expressions all read the row as it was before the UPDATE
+        final_amount = (
+            func.coalesce(Cart.total_amount, 0.0) + line_subtotal +
+            func.coalesce(Cart.tax_amount, 0.0) + line_tax -
+            func.coalesce(Cart.discount_amount, 0.0)
+        )
+        row = db.execute(
+            update(Cart).where(Cart.id == cart.id).values(
+                total_amount=_round_amount(func.coalesce(Cart.total_amount, 0.0) + line_subtotal),
+                tax_amount=_round_amount(func.coalesce(Cart.tax_amount, 0.0) + line_tax),
+                final_amount=_round_amount(case((final_amount < 0, 0.0), else_=final_amount)),
+                item_count=func.coalesce(Cart.item_count, 0) + quantity_delta,
+                version=Cart.version + 1,
+                updates_since_reconcile=Cart.updates_since_reconcile + 1
+            ).returning(
+                Cart.total_amount, Cart.tax_amount, Cart.final_amount, Cart.item_count,
+                Cart.version, Cart.updates_since_reconcile
+            ).execution_options(synchronize_session=False)
+        ).one()
+        
+        # The instance takes the row as written, without another SELECT
+        for key, value in row._mapping.items():
+            set_committed_value(cart, key, value)
+        return cart.updates_since_reconcile
+    
+    @staticmethod
+    def _increment_item(db: Session, cart_item: CartItem, quantity: int):
+        """
+        Add to a cart line's quantity in SQL, so concurrent scans of the same
+        product both count, and load the new quantity and subtotal onto the
+        instance
+        """
+        row = db.execute(
+            update(CartItem).where(CartItem.id == cart_item.id).values(
+                quantity=CartItem.quantity + quantity,
+                subtotal=CartItem.unit_price * (CartItem.quantity + quantity)
+            ).returning(CartItem.quantity, CartItem.subtotal)
+            .execution_options(synchronize_session=False)
+        ).one()
+        
+        for key, value in row._mapping.items():
+            set_committed_value(cart_item, key, value)
+    
+    @staticmethod
+    def bump_version(cart: Cart):
+        """
+        Mark the cart's billing as changed, so a checkout priced from an
+        older read loses its compare-and-set (incremented in SQL, not read
+        and rewritten)
+        """
+        cart.version = Cart.version + 1
+    
+    @staticmethod
+    def _commit_billing(db: Session, cart: Cart, lines: Iterable[LineDelta]) -> Cart:
+        """
+        Persist pending item changes together with the new cart totals.
+        Falls back to a full recompute in "full" mode or when the cart is
+        due for its periodic consistency check (counted on the cart row, so
+        every worker process sees the same count). Carts from before
+        item_count was tracked have no count to increment and are recomputed.
+        """
+        if (settings.BILLING_MODE != "incremental" or cart.item_count is None or
+                BillingService.apply_item_delta(db, cart, lines) >= settings.BILLING_RECONCILE_INTERVAL):
+            db.flush()
+            db.expire(cart, ["items"])
+            return BillingService.update_cart_billing(db, cart)
+        
+        db.commit()
+        
+        return cart
+    
     @staticmethod
     def add_item_to_cart(
         db: Session,
@@ -72,7 +174,7 @@ class BillingService:
         Add item to cart and update billing
         """
         # Get product
-        product = db.query(Product).filter(Product.id == product_id).first()
+        product = catalog_cache.get_by_id(db, product_id)
         if not product:
             raise ValueError(f"Product {product_id} not found")
         
@@ -83,9 +185,8 @@ class BillingService:
         ).first()
         
         if existing_item:
-            # Update quantity
-            existing_item.quantity += quantity
-            existing_item.subtotal = existing_item.unit_price * existing_item.quantity
+            # Update quantity (incremented in SQL, like the cart totals)
+            BillingService._increment_item(db, existing_item, quantity)
         else:
             # Create new cart item
             existing_item = CartItem(
@@ -98,14 +199,72 @@ class BillingService:
             )
             db.add(existing_item)
         
-        db.commit()
-        db.refresh(existing_item)
-        
-        # Update cart totals
-        BillingService.update_cart_billing(db, cart)
+        # Update cart totals in the same transaction as the item change
+        BillingService._commit_billing(
+            db, cart, [(existing_item.unit_price, existing_item.tax_rate, quantity)]
+        )
         
         return existing_item
     
+    @staticmethod
+    def add_items_to_cart(
+        db: Session,
+        cart: Cart,
+        lines: List[Tuple[Optional[int], Optional[str], int]]
+    ) -> List[CartItem]:
+        """
+        Add many (product_id, barcode, quantity) lines to a cart at once.
+        Products come from the catalog cache, existing cart items are resolved
+        with one IN query and totals are committed once for the whole batch.
+        """
+        # Merge duplicate lines per product, keeping first-seen order
+        by_id = {}
+        quantities: Dict[int, int] = {}
+        for product_id, barcode, quantity in lines:
+            if product_id is not None:
+                product = catalog_cache.get_by_id(db, product_id)
+            else:
+                product = catalog_cache.get_by_barcode(db, barcode)
+            if not product:
+                raise ValueError(f"Product {product_id if product_id is not None else barcode} not found")
+            by_id[product.id] = product
+            quantities[product.id] = quantities.get(product.id, 0) + quantity
+        
+        existing_items = {
+            item.product_id: item
+            for item in db.query(CartItem).filter(
+                CartItem.cart_id == cart.id,
+                CartItem.product_id.in_(quantities.keys())
+            ).all()
+        }
+        
+        deltas: List[LineDelta] = []
+        for product_id, quantity in quantities.items():
+            cart_item = existing_items.get(product_id)
+            if cart_item:
+                BillingService._increment_item(db, cart_item, quantity)
+            else:
+                product = by_id[product_id]
+                cart_item = CartItem(
+                    cart_id=cart.id,
+                    product_id=product_id,
+                    quantity=quantity,
+                    unit_price=product.price,
+                    tax_rate=product.tax_rate,
+                    subtotal=product.price * quantity
+                )
+                db.add(cart_item)
+            
+            deltas.append((cart_item.unit_price, cart_item.tax_rate, quantity))
+        
+        BillingService._commit_billing(db, cart, deltas)
+        
+        # Reload the touched lines with their products in a single query
+        return db.query(CartItem).options(joinedload(CartItem.product)).filter(
+            CartItem.cart_id == cart.id,
+            CartItem.product_id.in_(quantities.keys())
+        ).all()
+    
     @staticmethod
     def remove_item_from_cart(
         db: Session,
@@ -123,11 +282,11 @@ class BillingService:
         if not cart_item:
             return False
         
+        delta = (cart_item.unit_price, cart_item.tax_rate, -cart_item.quantity)
         db.delete(cart_item)
-        db.commit()
         
         # Update cart totals
-        BillingService.update_cart_billing(db, cart)
+        BillingService._commit_billing(db, cart, [delta])
         
         return True
     
@@ -153,14 +312,12 @@ class BillingService:
         if not cart_item:
             raise ValueError(f"Cart item {cart_item_id} not found")
         
+        delta = (cart_item.unit_price, cart_item.tax_rate, quantity - cart_item.quantity)
         cart_item.quantity = quantity
         cart_item.subtotal = cart_item.unit_price * quantity
         
-        db.commit()
-        db.refresh(cart_item)
-        
         # Update cart totals
-        BillingService.update_cart_billing(db, cart)
+        BillingService._commit_billing(db, cart, [delta])
         
         return cart_item
     
@@ -0,0 +1,308 @@
+"""
+Product Catalog Cache Service
+Keeps the product catalog in process memory with id, barcode, SKU and RFID
+indexes so scan paths do not hit the products table in steady state
+"""
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from app.config import settings
+from app.models.product import Product
+
+
+class ProductRecord(NamedTuple):
+    """Compact, immutable snapshot of a product row"""
+    id: int
+    sku: str
+    barcode: str
+    name: str
+    description: Optional[str]
+    price: float
+    tax_rate: float
+    category: Optional[str]
+    aisle_id: Optional[int]
+    rfid_tag_id: Optional[str]
+    image_url: Optional[str]
+    is_active: bool
+    stock_quantity: int
+    created_at: Optional[datetime] = None
+    
+    @classmethod
+    def from_product(cls, product: Product) -> "ProductRecord":
+        return cls(
+            id=product.id,
+            sku=product.sku,
+            barcode=product.barcode,
+            name=product.name,
+            description=product.description,
+            price=product.price,
+            tax_rate=product.tax_rate or 0.0,
+            category=product.category,
+            aisle_id=product.aisle_id,
+            rfid_tag_id=product.rfid_tag_id,
+            image_url=product.image_url,
+            is_active=product.is_active if product.is_active is not None else True,
+            stock_quantity=product.stock_quantity or 0,
+            created_at=product.created_at
+        )
+    
+    def to_json(self) -> str:
+        created_at = self.created_at.isoformat() if self.created_at else None
+        return json.dumps(self._replace(created_at=created_at))
+    
+    @classmethod
+    def from_json(cls, data) -> "ProductRecord":
+        record = cls(*json.loads(data))
+        if record.created_at:
+            record = record._replace(created_at=datetime.fromisoformat(record.created_at))
+        return record
+
+
+class LocalCatalogStore:
+    """
+    In-process store, used by default and as the stand-in for Redis in tests
+    """
+    shared = False
+    
+    def __init__(self):
+        self._records: Dict[int, ProductRecord] = {}
+        self._version = 0
+    
+    def load_all(self) -> List[ProductRecord]:
+        return list(self._records.values())
+    
+    def store_all(self, records: Iterable[ProductRecord]):
+        self._records = {record.id: record for record in records}
+    
+    def delete(self, product_id: Optional[int] = None):
+        if product_id is None:
+            self._records = {}
+        else:
+            self._records.pop(product_id, None)
+        self._version += 1
+    
+    def version(self) -> int:
+        return self._version
+
+
+class RedisCatalogStore(LocalCatalogStore):
+    """
+    Redis-backed shared store so all workers warm from and invalidate one copy
+    """
+    shared = True
+    RECORDS_KEY = "catalog:products"
+    VERSION_KEY = "catalog:version"
+    
+    def __init__(self):
+        import redis
+        self.client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB
+        )
+        self.client.ping()
+    
+    def load_all(self) -> List[ProductRecord]:
+        return [ProductRecord.from_json(data) for data in self.client.hvals(self.RECORDS_KEY)]
+    
+    def store_all(self, records: Iterable[ProductRecord]):
+        mapping = {record.id: record.to_json() for record in records}
+        pipe = self.client.pipeline()
+        pipe.delete(self.RECORDS_KEY)
+        if mapping:
+            pipe.hset(self.RECORDS_KEY, mapping=mapping)
+        pipe.execute()
+    
+    def delete(self, product_id: Optional[int] = None):
+        pipe = self.client.pipeline()
+        if product_id is None:
+            pipe.delete(self.RECORDS_KEY)
+        else:
+            pipe.hdel(self.RECORDS_KEY, product_id)
+        pipe.incr(self.VERSION_KEY)
+        pipe.execute()
+    
+    def version(self) -> int:
+        return int(self.client.get(self.VERSION_KEY) or 0)
+
+
+class CatalogCacheService:
+    """
+    Service for cached product lookups by id, barcode, SKU and RFID tag.
+    The indexes are read and swapped under one lock, so a lookup never sees
+    a half-rebuilt catalog and two expired lookups reload it only once.
+    Every invalidation bumps a generation counter; a miss only caches the
+    row it read if no invalidation happened while it was reading.
+    """
+    
+    def __init__(self, store: Optional[LocalCatalogStore] = None, ttl_seconds: Optional[float] = None):
+        self.store = store or self._create_store()
+        self.ttl_seconds = settings.CATALOG_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._lock = threading.RLock()
+        self._by_id: Dict[int, ProductRecord] = {}
+        self._by_barcode: Dict[str, int] = {}
+        self._by_sku: Dict[str, int] = {}
+        self._by_rfid: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._store_version = 0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+    
+    def _create_store(self) -> LocalCatalogStore:
+        """
+        Use Redis when configured, falling back to the local store
+        """
+        if settings.CATALOG_CACHE_BACKEND == "redis":
+            try:
+                return RedisCatalogStore()
+            except Exception as e:
+                print(f"⚠️  Redis catalog store unavailable: {e}. Using local store.")
+        return LocalCatalogStore()
+    
+    def _index(self, record: ProductRecord):
+        self._by_id[record.id] = record
+        self._by_barcode[record.barcode] = record.id
+        self._by_sku[record.sku] = record.id
+        if record.rfid_tag_id:
+            self._by_rfid[record.rfid_tag_id] = record.id
+    
+    def _unindex(self, product_id: int):
+        record = self._by_id.pop(product_id, None)
+        if record:
+            self._by_barcode.pop(record.barcode, None)
+            self._by_sku.pop(record.sku, None)
+            if record.rfid_tag_id:
+                self._by_rfid.pop(record.rfid_tag_id, None)
+    
+    def load(self, db: Session):
+        """
+        (Re)build all indexes, warming from the shared store when it has data
+        """
+        with self._lock:
+            records = self.store.load_all()
+            if not records:
+                records = [ProductRecord.from_product(p) for p in db.query(Product).all()]
+                self.store.store_all(records)
+            
+            self._by_id, self._by_barcode, self._by_sku, self._by_rfid = {}, {}, {}, {}
+            for record in records:
+                self._index(record)
+            
+            self._loaded_at = time.monotonic()
+            self._store_version = self.store.version()
+            self.reloads += 1
+    
+    def _ensure_loaded(self, db: Session):
+        """Load or refresh the indexes when due; the caller holds the lock"""
+        if self._loaded_at is None:
+            self.load(db)
+        elif self.ttl_seconds and time.monotonic() - self._loaded_at > self.ttl_seconds:
+            if not self.store.shared:
+                # Local store: re-read the catalog from the database
+                self.invalidate()
+                self.load(db)
+            elif self.store.version() != self._store_version:
+                # Another worker invalidated the shared store
+                self.invalidate(local_only=True)
+                self.load(db)
+            else:
+                self._loaded_at = time.monotonic()
+    
+    def _lookup(self, db: Session, index_name: str, key, column) -> Optional[ProductRecord]:
+        with self._lock:
+            self._ensure_loaded(db)
+            
+            product_id = key if index_name == "_by_id" else getattr(self, index_name).get(key)
+            record = self._by_id.get(product_id) if product_id is not None else None
+            if record:
+                self.hits += 1
+                return record
+            self.misses += 1
+            generation = self._generation
+        
+        # Miss: fall back to the database (outside the lock) and remember the row if it exists
+        product = db.query(Product).filter(column == key).first()
+        if not product:
+            return None
+        
+        record = ProductRecord.from_product(product)
+        with self._lock:
+            # A product write committed during the read may have made it stale
+            if generation == self._generation:
+                self._index(record)
+        return record
+    
+    def get_by_id(self, db: Session, product_id: int) -> Optional[ProductRecord]:
+        return self._lookup(db, "_by_id", product_id, Product.id)
+    
+    def get_by_barcode(self, db: Session, barcode: str) -> Optional[ProductRecord]:
+        return self._lookup(db, "_by_barcode", barcode, Product.barcode)
+    
+    def get_by_sku(self, db: Session, sku: str) -> Optional[ProductRecord]:
+        return self._lookup(db, "_by_sku", sku, Product.sku)
+    
+    def get_by_rfid(self, db: Session, rfid_tag_id: str) -> Optional[ProductRecord]:
+        return self._lookup(db, "_by_rfid", rfid_tag_id, Product.rfid_tag_id)
+    
+    def invalidate(self, product_id: Optional[int] = None, local_only: bool = False):
+        """
+        Drop one product (or the whole catalog) from the cache
+        """
+        with self._lock:
+            self._generation += 1
+            if product_id is None:
+                self._by_id, self._by_barcode, self._by_sku, self._by_rfid = {}, {}, {}, {}
+                self._loaded_at = None
+            else:
+                self._unindex(product_id)
+            if not local_only:
+                self.store.delete(product_id)
+                self._store_version = self.store.version()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._by_id),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "reloads": self.reloads,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+# Global catalog cache instance
+catalog_cache = CatalogCacheService()
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+@event.listens_for(Product, "after_delete")
+def _collect_product(mapper, connection, target):
+    """
+    Note products written through the ORM; they are invalidated once the
+    transaction commits, so a concurrent miss cannot re-cache the old row
+    """
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("catalog_changed", set()).add(target.id)
+    else:
+        catalog_cache.invalidate(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for product_id in session.info.pop("catalog_changed", ()):
+        catalog_cache.invalidate(product_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("catalog_changed", None)
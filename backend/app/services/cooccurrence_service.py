@@ -0,0 +1,214 @@
+"""
+Product Co-occurrence Index
+Market basket statistics (support, confidence, lift) kept in memory and
+updated incrementally as transactions complete
+"""
+import heapq
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.transaction import Transaction, TransactionItem
+
+
+class CoOccurrenceIndex:
+    """
+    Sparse product x product co-occurrence counts with cached per-product
+    top-K neighbour lists, held as NumPy arrays for vectorized scoring.
+    Baskets committed by other workers are picked up by comparing the
+    highest transaction id seen with the database's, at most every
+    refresh_seconds.
+    """
+    
+    def __init__(self, top_k: Optional[int] = None, refresh_seconds: Optional[float] = None):
+        self.top_k = top_k or settings.RECOMMENDATION_TOP_K
+        self.refresh_seconds = (
+            settings.RECOMMENDATION_INDEX_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        )
+        self.transaction_count = 0
+        self.item_counts: Dict[int, int] = {}  # product -> baskets containing it
+        self.pair_counts: Dict[int, Dict[int, int]] = {}  # product -> co-product -> baskets with both
+        self._neighbours: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}  # product -> top-K (ids, pair counts)
+        self._dirty: set = set()
+        self._popular: Optional[List[Tuple[int, int]]] = None
+        self._lock = threading.RLock()
+        self.last_transaction_id = 0  # Every basket up to this id has been read from the database
+        self._recorded: Set[int] = set()  # Ids above it already added by record_transaction
+        self._checked_at: Optional[float] = None
+        self.built = False
+    
+    def add_basket(self, product_ids: Iterable[int]):
+        """
+        Count one completed basket; O(k^2) in the number of distinct products
+        """
+        basket = set(product_ids)
+        if not basket:
+            return
+        
+        with self._lock:
+            self.transaction_count += 1
+            for product_id in basket:
+                self.item_counts[product_id] = self.item_counts.get(product_id, 0) + 1
+                row = self.pair_counts.setdefault(product_id, {})
+                for other_id in basket:
+                    if other_id != product_id:
+                        row[other_id] = row.get(other_id, 0) + 1
+            self._dirty.update(basket)
+            self._popular = None
+    
+    def record_transaction(self, transaction_id: int, product_ids: Iterable[int]):
+        """
+        Incremental update from the payment path; skipped until the index is
+        built, since the initial build reads every completed basket anyway
+        """
+        with self._lock:
+            if not self.built or transaction_id <= self.last_transaction_id or transaction_id in self._recorded:
+                return
+            self._recorded.add(transaction_id)
+            self.add_basket(product_ids)
+    
+    def _read_baskets(self, db: Session, after_id: int, batch_size: int) -> int:
+        """
+        Add every basket with a transaction id above after_id, streaming
+        transaction_items grouped by transaction; returns the last id read
+        """
+        rows = db.query(TransactionItem.transaction_id, TransactionItem.product_id).filter(
+            TransactionItem.transaction_id > after_id
+        ).order_by(
+            TransactionItem.transaction_id
+        ).yield_per(batch_size)
+        
+        current_id = after_id
+        basket: List[int] = []
+        for transaction_id, product_id in rows:
+            if transaction_id != current_id:
+                if current_id not in self._recorded:
+                    self.add_basket(basket)
+                current_id = transaction_id
+                basket = []
+            basket.append(product_id)
+        if current_id not in self._recorded:
+            self.add_basket(basket)
+        return current_id
+    
+    def build(self, db: Session, batch_size: int = 10000):
+        """
+        Rebuild the index from every transaction in the database
+        """
+        with self._lock:
+            self.transaction_count = 0
+            self.item_counts = {}
+            self.pair_counts = {}
+            self._neighbours = {}
+            self._dirty = set()
+            self._popular = None
+            self._recorded = set()
+            
+            self.last_transaction_id = self._read_baskets(db, 0, batch_size)
+            self._checked_at = time.monotonic()
+            self.built = True
+    
+    def refresh(self, db: Session, batch_size: int = 10000):
+        """
+        Catch up with baskets committed by other workers, if the database
+        has transactions newer than the last one read
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            latest = db.query(func.max(Transaction.id)).scalar() or 0
+            if latest <= self.last_transaction_id:
+                return
+            last_read = self._read_baskets(db, self.last_transaction_id, batch_size)
+            self.last_transaction_id = max(latest, last_read)
+            self._recorded = {i for i in self._recorded if i > self.last_transaction_id}
+    
+    def ensure_built(self, db: Session):
+        with self._lock:
+            if not self.built:
+                self.build(db)
+            elif self.refresh_seconds and time.monotonic() - self._checked_at > self.refresh_seconds:
+                self.refresh(db)
+    
+    def neighbours(self, product_id: int) -> Tuple[np.ndarray, ...]:
+        """
+        Top-K co-purchased products as (ids, support, confidence, lift) arrays.
+        The top-K list only changes when this product is bought, but the
+        measures depend on every basket, so they are computed from the
+        current totals on each call.
+        """
+        with self._lock:
+            if product_id in self._neighbours and product_id not in self._dirty:
+                ids, pair = self._neighbours[product_id]
+            else:
+                row = self.pair_counts.get(product_id, {})
+                ids = np.fromiter(row.keys(), dtype=np.int64, count=len(row))
+                pair = np.fromiter(row.values(), dtype=np.float64, count=len(row))
+                
+                if len(ids) > self.top_k:
+                    keep = np.argpartition(-pair, self.top_k - 1)[:self.top_k]
+                    ids, pair = ids[keep], pair[keep]
+                order = np.argsort(-pair, kind="stable")
+                ids, pair = ids[order], pair[order]
+                
+                self._neighbours[product_id] = (ids, pair)
+                self._dirty.discard(product_id)
+            
+            transactions = max(self.transaction_count, 1)
+            other = np.fromiter((self.item_counts[i] for i in ids), dtype=np.float64, count=len(ids))
+            support = pair / transactions
+            confidence = pair / self.item_counts.get(product_id, 1)
+            lift = confidence / (other / transactions)
+            return ids, support, confidence, lift
+    
+    def popular(self, limit: int) -> List[Tuple[int, int]]:
+        """
+        Most purchased products as (product_id, baskets containing it), best
+        first; the ranking is kept until the next basket is added
+        """
+        with self._lock:
+            if self._popular is None or len(self._popular) < min(limit, len(self.item_counts)):
+                self._popular = heapq.nlargest(
+                    max(limit, self.top_k), self.item_counts.items(), key=lambda item: (item[1], -item[0])
+                )
+            return self._popular[:limit]
+    
+    def recommend(self, product_ids: List[int], limit: int) -> List[Dict[str, float]]:
+        """
+        Score candidates against every cart product at once: confidences are
+        summed per candidate with bincount and products in the cart removed
+        """
+        parts = [self.neighbours(product_id) for product_id in set(product_ids)]
+        parts = [part for part in parts if len(part[0])]
+        if not parts:
+            return []
+        
+        ids, support, confidence, lift = (np.concatenate(arrays) for arrays in zip(*parts))
+        
+        candidates, inverse = np.unique(ids, return_inverse=True)
+        score = np.bincount(inverse, weights=confidence, minlength=len(candidates))
+        best = {}
+        for name, values in (("support", support), ("confidence", confidence), ("lift", lift)):
+            best[name] = np.zeros(len(candidates))
+            np.maximum.at(best[name], inverse, values)
+        
+        score[np.isin(candidates, product_ids)] = -1.0
+        order = np.argsort(-score, kind="stable")[:limit]
+        
+        return [
+            {
+                "product_id": int(candidates[i]),
+                "score": float(score[i]),
+                "support": float(best["support"][i]),
+                "confidence": float(best["confidence"][i]),
+                "lift": float(best["lift"][i])
+            }
+            for i in order
+            if score[i] > 0
+        ]
+
+
+# Global co-occurrence index instance
+cooccurrence_index = CoOccurrenceIndex()
@@ -0,0 +1,236 @@
+"""
+Product Embedding Store
+Reference embeddings for catalog products, one L2-normalized row per
+product, matched against detection crops with a single matrix product.
+The store is saved as plain .npy files and loaded memory-mapped, so every
+worker process on a host shares one copy through the page cache. Each save
+writes a new version directory and then swaps the CURRENT pointer file, so
+a reader sees either the old store or the new one, never a mix.
+
+Build it with build_embeddings.py. StubImageEncoder runs on CPU with no
+model weights; any encoder with the same encode() contract can replace it.
+"""
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+Frame = np.ndarray
+STORE_FORMAT = 1
+CURRENT_FILE = "CURRENT"  # Names the live directory under versions/
+
+
+class StubImageEncoder:
+    """
+    Deterministic CPU image encoder: a coarse colour layout plus a colour
+    histogram, passed through a fixed random projection. Tolerates the
+    crop offsets, noise and lighting changes of a cart camera well enough
+    to tell catalog products apart; not a learned model.
+    """
+    name = "stub-v1"
+    
+    def __init__(self, dim: int = 128, grid: int = 8, bins: int = 4, seed: int = 0):
+        self.dim = dim
+        self.grid = grid
+        self.bins = bins
+        self.size = grid * 4  # Crops are resampled to size x size first
+        features = grid * grid * 3 + bins ** 3
+        rng = np.random.default_rng(seed)
+        self.projection = (rng.standard_normal((features, dim)) / np.sqrt(dim)).astype(np.float32)
+    
+    def _features(self, image: Frame) -> np.ndarray:
+        height, width = image.shape[:2]
+        rows = np.linspace(0, height - 1, self.size).astype(np.intp)
+        cols = np.linspace(0, width - 1, self.size).astype(np.intp)
+        pixels = image[rows][:, cols, :3].astype(np.float32) / 255.0
+        
+        # Colour layout: block means, centred so overall brightness matters less
+        cell = self.size // self.grid
+        layout = pixels.reshape(self.grid, cell, self.grid, cell, 3).mean(axis=(1, 3))
+        layout -= layout.mean(axis=(0, 1))
+        
+        # Colour histogram, normalized to a distribution
+        quantized = np.minimum((pixels * self.bins).astype(np.intp), self.bins - 1)
+        codes = (quantized[..., 0] * self.bins + quantized[..., 1]) * self.bins + quantized[..., 2]
+        histogram = np.bincount(codes.ravel(), minlength=self.bins ** 3).astype(np.float32)
+        histogram /= histogram.sum()
+        
+        return np.concatenate([layout.ravel() * 2.0, histogram])
+    
+    def encode(self, images: Sequence[Frame]) -> np.ndarray:
+        """(len(images), dim) float32 embeddings with unit L2 norm"""
+        if not images:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        vectors = np.stack([self._features(image) for image in images]) @ self.projection
+        return normalize(vectors)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def crop_detections(image: Frame, detections: List[Dict[str, Any]], min_size: int = 8) -> List[Frame]:
+    """Views of the image inside each detection's [x1, y1, x2, y2] bbox"""
+    height, width = image.shape[:2]
+    crops = []
+    for detection in detections:
+        bbox = detection.get("bbox")
+        if not bbox or len(bbox) != 4:
+            continue
+        x1, y1, x2, y2 = (int(round(value)) for value in bbox)
+        x1, x2 = max(0, x1), min(width, x2)
+        y1, y2 = max(0, y1), min(height, y2)
+        if x2 - x1 >= min_size and y2 - y1 >= min_size:
+            crops.append(image[y1:y2, x1:x2])
+    return crops
+
+
+def synthetic_product_image(product_id: int, size: int = 96) -> Frame:
+    """
+    A deterministic stand-in packshot for a product without a catalog
+    image: a tinted background with a few coloured blocks
+    """
+    rng = np.random.default_rng(product_id)
+    image = np.empty((size, size, 3), dtype=np.float32)
+    image[:] = rng.uniform(40, 215, 3)
+    for _ in range(3):
+        x1, y1 = rng.integers(0, size - size // 4, 2)
+        x2, y2 = x1 + rng.integers(size // 4, size // 2 + 1), y1 + rng.integers(size // 4, size // 2 + 1)
+        image[y1:y2, x1:x2] = rng.uniform(0, 255, 3)
+    return image.astype(np.uint8)
+
+
+class EmbeddingStore:
+    """
+    Product ids (sorted) and their reference embeddings. search() scores
+    every query against every product in one matmul and returns the top k.
+    """
+    
+    def __init__(self, product_ids: np.ndarray, vectors: np.ndarray, encoder: str = StubImageEncoder.name):
+        order = np.argsort(product_ids, kind="stable")
+        if not np.all(order == np.arange(len(order))):
+            product_ids, vectors = product_ids[order], vectors[order]
+        self.product_ids = product_ids
+        self.vectors = vectors
+        self.encoder = encoder
+        self.mmapped = isinstance(vectors, np.memmap)
+    
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+    
+    def __len__(self) -> int:
+        return len(self.product_ids)
+    
+    def __contains__(self, product_id: int) -> bool:
+        row = int(np.searchsorted(self.product_ids, product_id))
+        return row < len(self.product_ids) and self.product_ids[row] == product_id
+    
+    def search(self, queries: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (product_ids, scores), each (len(queries), k) and best first, by
+        cosine similarity of normalized queries to every reference
+        """
+        k = min(k, len(self))
+        if k == 0 or len(queries) == 0:
+            return np.zeros((len(queries), 0), dtype=np.int64), np.zeros((len(queries), 0), dtype=np.float32)
+        scores = queries @ self.vectors.T
+        if k < scores.shape[1]:
+            top = np.argpartition(scores, -k, axis=1)[:, -k:]
+        else:
+            top = np.broadcast_to(np.arange(k), (len(queries), k))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        rows = np.take_along_axis(top, order, axis=1)
+        return self.product_ids[rows], np.take_along_axis(top_scores, order, axis=1)
+    
+    def save(self, path: str, keep: int = 2):
+        """
+        Write the store as a new version under directory `path` and make it
+        current with one atomic replace of the pointer file. Workers that
+        mapped an older version keep reading it until they reload; the
+        `keep` newest versions are kept, older ones removed.
+        """
+        versions = os.path.join(path, "versions")
+        os.makedirs(versions, exist_ok=True)
+        version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        
+        # Build the version in a hidden directory and publish it whole
+        staging = os.path.join(versions, f".{version}.tmp")
+        os.makedirs(staging)
+        np.save(os.path.join(staging, "product_ids.npy"), np.ascontiguousarray(self.product_ids, dtype=np.int64))
+        np.save(os.path.join(staging, "vectors.npy"), np.ascontiguousarray(self.vectors, dtype=np.float32))
+        meta = {"format": STORE_FORMAT, "encoder": self.encoder, "dim": self.dim, "products": len(self)}
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        os.rename(staging, os.path.join(versions, version))
+        
+        temporary = os.path.join(path, f".{CURRENT_FILE}.tmp")
+        with open(temporary, "w") as f:
+            f.write(version)
+        os.replace(temporary, os.path.join(path, CURRENT_FILE))
+        
+        for old in sorted(name for name in os.listdir(versions) if not name.startswith("."))[:-keep]:
+            shutil.rmtree(os.path.join(versions, old), ignore_errors=True)
+    
+    @staticmethod
+    def current_path(path: str) -> str:
+        """The directory holding the current version of the store at `path`"""
+        try:
+            with open(os.path.join(path, CURRENT_FILE)) as f:
+                return os.path.join(path, "versions", f.read().strip())
+        except FileNotFoundError:
+            return path  # Written before stores were versioned
+    
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "EmbeddingStore":
+        """Open the current version of a saved store, memory-mapped (read-only) by default"""
+        path = cls.current_path(path)
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != STORE_FORMAT:
+            raise ValueError(f"Unsupported embedding store format: {meta.get('format')}")
+        mode = "r" if mmap else None
+        product_ids = np.load(os.path.join(path, "product_ids.npy"), mmap_mode=mode)
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode=mode)
+        if (product_ids.ndim != 1 or vectors.ndim != 2 or
+                not len(product_ids) == len(vectors) == meta["products"] or vectors.shape[1] != meta["dim"]):
+            raise ValueError(
+                f"Embedding store at {path} is inconsistent: {product_ids.shape} ids, "
+                f"{vectors.shape} vectors, meta says {meta['products']} x {meta['dim']}"
+            )
+        return cls(product_ids, vectors, encoder=meta["encoder"])
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "products": len(self),
+            "dim": self.dim,
+            "encoder": self.encoder,
+            "mmapped": self.mmapped,
+            "bytes": int(self.vectors.nbytes)
+        }
+
+
+def build_store(encoder: StubImageEncoder, product_ids: List[int], images: List[Frame], batch_size: int = 256) -> EmbeddingStore:
+    """Encode reference images in batches into a store"""
+    vectors = np.zeros((len(images), encoder.dim), dtype=np.float32)
+    for start in range(0, len(images), batch_size):
+        vectors[start:start + batch_size] = encoder.encode(images[start:start + batch_size])
+    return EmbeddingStore(np.asarray(product_ids, dtype=np.int64), vectors, encoder=encoder.name)
+
+
+class ProductMatcher:
+    """An encoder and the store built with it"""
+    
+    def __init__(self, store: EmbeddingStore, encoder: Optional[StubImageEncoder] = None):
+        self.encoder = encoder or StubImageEncoder(dim=store.dim)
+        if self.encoder.name != store.encoder or self.encoder.dim != store.dim:
+            raise ValueError(f"Store was built with {store.encoder} ({store.dim}), not {self.encoder.name} ({self.encoder.dim})")
+        self.store = store
+    
+    def match(self, crops: Sequence[Frame], k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (product_ids, scores) per crop, encoded as one batch"""
+        return self.store.search(self.encoder.encode(crops), k)
@@ -0,0 +1,152 @@
+"""
+IoT Event Dispatcher
+Delivers published messages to subscriber callbacks off the publishing
+thread. Each subscription has its own bounded queue and worker, so a slow
+subscriber only delays itself.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+import numpy as np
+
+BACKPRESSURE_POLICIES = ("drop_oldest", "block", "error")
+
+
+class Subscription:
+    """
+    One callback on one topic filter. In async mode, messages are queued and
+    delivered in order on a dedicated worker thread; when the queue is full
+    the backpressure policy decides whether to drop the oldest message,
+    block the publisher or reject the new one. Rejections are counted and
+    never raised: the publisher has usually committed already, and the
+    other subscribers must still get the message.
+    """
+    
+    def __init__(
+        self,
+        topic: str,
+        callback: Callable,
+        mode: str = "async",
+        max_queue_size: int = 1000,
+        policy: str = "drop_oldest",
+        lag_window: int = 1000
+    ):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.topic = topic
+        self.callback = callback
+        self.mode = mode
+        self.max_queue_size = max_queue_size
+        self.policy = policy
+        self._queue: deque = deque()
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+        self._busy = False
+        
+        # Metrics
+        self.delivered = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.errors = 0
+        self.max_depth = 0
+        self._lag_ms: deque = deque(maxlen=lag_window)
+    
+    def _invoke(self, topic: str, payload: Dict[str, Any]):
+        try:
+            self.callback(topic, payload)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error in subscriber callback: {e}")
+        self.delivered += 1
+    
+    def deliver(self, topic: str, payload: Dict[str, Any]):
+        """
+        Hand one message to the subscriber; returns without waiting for the
+        callback in async mode
+        """
+        if self.mode == "sync":
+            self._invoke(topic, payload)
+            return
+        
+        with self._condition:
+            if self._closed:
+                return
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name=f"iot-subscriber-{self.topic}", daemon=True
+                )
+                self._worker.start()
+            
+            if len(self._queue) >= self.max_queue_size:
+                if self.policy == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                elif self.policy == "error":
+                    self.rejected += 1
+                    return
+                else:
+                    while len(self._queue) >= self.max_queue_size and not self._closed:
+                        self._condition.wait()
+            
+            self._queue.append((topic, payload, time.perf_counter()))
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._condition.notify_all()
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                topic, payload, published_at = self._queue.popleft()
+                self._busy = True
+                self._condition.notify_all()
+            
+            self._lag_ms.append((time.perf_counter() - published_at) * 1000.0)
+            self._invoke(topic, payload)
+            
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued message has been delivered
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._queue or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+    
+    def close(self):
+        """Stop the worker once the queue drains"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lag = np.array(self._lag_ms)
+        return {
+            "topic": self.topic,
+            "callback": getattr(self.callback, "__qualname__", repr(self.callback)),
+            "mode": self.mode,
+            "policy": self.policy,
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self.max_depth,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "lag_ms": {
+                "p50": round(float(np.percentile(lag, 50)), 3),
+                "p99": round(float(np.percentile(lag, 99)), 3),
+                "max": round(float(lag.max()), 3)
+            } if len(lag) else None
+        }
@@ -0,0 +1,188 @@
+"""
+Shared Executor Service
+A process pool for CPU-bound work (QR rendering, image decoding, large
+receipts), so concurrent carts are not serialized on one core by the GIL,
+and a thread pool for blocking I/O. Pools start on first use; every task is
+run with a timeout and counted per task name.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+import numpy as np
+from app.config import settings
+from app.cpu_tasks import timed_call
+
+EXECUTOR_MODES = ("process", "thread", "inline")
+
+
+class TaskTimeoutError(RuntimeError):
+    """A task did not finish within its timeout"""
+
+
+class _TaskStats:
+    __slots__ = ("submitted", "completed", "failed", "timed_out", "run_ms", "wait_ms")
+    
+    def __init__(self, window: int):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.run_ms: deque = deque(maxlen=window)
+        self.wait_ms: deque = deque(maxlen=window)
+
+
+class ExecutorService:
+    """
+    run_cpu() and run_io() block the calling thread (a request worker) until
+    the task is done, without holding the GIL while they wait. A timed-out
+    task is cancelled if it has not started; one already running in a worker
+    finishes in the background.
+    """
+    
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        cpu_workers: Optional[int] = None,
+        io_workers: Optional[int] = None,
+        latency_window: int = 1000
+    ):
+        self.mode = mode or settings.EXECUTOR_MODE
+        if self.mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode: {self.mode}")
+        self.cpu_workers = cpu_workers or settings.EXECUTOR_CPU_WORKERS or os.cpu_count() or 1
+        self.io_workers = io_workers or settings.EXECUTOR_IO_WORKERS
+        self.latency_window = latency_window
+        self._cpu_pool: Optional[Executor] = None
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _TaskStats] = {}
+    
+    def _get_cpu_pool(self) -> Executor:
+        if self._cpu_pool is None:
+            with self._lock:
+                if self._cpu_pool is None:
+                    if self.mode == "process":
+                        # Workers unpickle timed_call and the tasks from app.cpu_tasks,
+                        # which imports neither app.services nor SQLAlchemy
+                        self._cpu_pool = ProcessPoolExecutor(
+                            max_workers=self.cpu_workers,
+                            mp_context=multiprocessing.get_context(settings.EXECUTOR_START_METHOD)
+                        )
+                    else:
+                        self._cpu_pool = ThreadPoolExecutor(
+                            max_workers=self.cpu_workers, thread_name_prefix="cpu-task"
+                        )
+        return self._cpu_pool
+    
+    def _get_io_pool(self) -> ThreadPoolExecutor:
+        if self._io_pool is None:
+            with self._lock:
+                if self._io_pool is None:
+                    self._io_pool = ThreadPoolExecutor(
+                        max_workers=self.io_workers, thread_name_prefix="io-task"
+                    )
+        return self._io_pool
+    
+    def _task_stats(self, name: str) -> _TaskStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(name, _TaskStats(self.latency_window))
+        return stats
+    
+    def _run(self, pool: Optional[Executor], name: str, fn: Callable, args, kwargs, timeout: Optional[float]):
+        stats = self._task_stats(name)
+        stats.submitted += 1
+        started = time.perf_counter()
+        try:
+            if pool is None:
+                result, run_ms = timed_call(fn, args, kwargs)
+            else:
+                future: Future = pool.submit(timed_call, fn, args, kwargs)
+                try:
+                    result, run_ms = future.result(
+                        timeout=settings.EXECUTOR_TASK_TIMEOUT_SECONDS if timeout is None else timeout
+                    )
+                except FutureTimeoutError:
+                    future.cancel()
+                    stats.timed_out += 1
+                    raise TaskTimeoutError(f"Task {name} timed out")
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool on the next task
+            stats.failed += 1
+            with self._lock:
+                if self._cpu_pool is pool:
+                    self._cpu_pool = None
+            pool.shutdown(wait=False)
+            raise RuntimeError(f"Task {name} failed: worker process died")
+        except TaskTimeoutError:
+            raise
+        except Exception:
+            stats.failed += 1
+            raise
+        
+        total_ms = (time.perf_counter() - started) * 1000.0
+        stats.completed += 1
+        stats.run_ms.append(run_ms)
+        stats.wait_ms.append(max(0.0, total_ms - run_ms))
+        return result
+    
+    def run_cpu(self, fn: Callable, *args, name: Optional[str] = None, timeout: Optional[float] = None, **kwargs):
+        """
+        Run CPU-bound fn(*args, **kwargs) in the process pool. fn, its
+        arguments and its result must be picklable (a module-level function).
+        """
+        pool = None if self.mode == "inline" else self._get_cpu_pool()
+        return self._run(pool, name or fn.__name__, fn, args, kwargs, timeout)
+    
+    def run_io(self, fn: Callable, *args, name: Optional[str] = None, timeout: Optional[float] = None, **kwargs):
+        """Run blocking fn(*args, **kwargs) in the I/O thread pool"""
+        pool = None if self.mode == "inline" else self._get_io_pool()
+        return self._run(pool, name or fn.__name__, fn, args, kwargs, timeout)
+    
+    def shutdown(self, wait: bool = True):
+        """Stop both pools (application shutdown); they restart on next use"""
+        with self._lock:
+            pools, self._cpu_pool, self._io_pool = (self._cpu_pool, self._io_pool), None, None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool configuration and per-task counts and latency percentiles"""
+        tasks = {}
+        for name, stats in sorted(self._stats.items()):
+            latency = {}
+            for stage, samples in (("run", stats.run_ms), ("wait", stats.wait_ms)):
+                values = np.array(samples)
+                latency[stage] = {
+                    "p50": round(float(np.percentile(values, 50)), 3),
+                    "p99": round(float(np.percentile(values, 99)), 3),
+                    "mean": round(float(values.mean()), 3)
+                } if len(values) else None
+            tasks[name] = {
+                "submitted": stats.submitted,
+                "completed": stats.completed,
+                "failed": stats.failed,
+                "timed_out": stats.timed_out,
+                "latency_ms": latency
+            }
+        
+        return {
+            "mode": self.mode,
+            "cpu_workers": self.cpu_workers,
+            "io_workers": self.io_workers,
+            "cpu_pool_started": self._cpu_pool is not None,
+            "io_pool_started": self._io_pool is not None,
+            "tasks": tasks
+        }
+
+
+# Global executor service instance
+executor_service = ExecutorService()
@@ -0,0 +1,223 @@
+"""
+Batched Inference Scheduler
+Collects frames from concurrent verification requests into micro-batches and
+runs each batch in a single forward pass on a dedicated worker thread
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
+import numpy as np
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Decoded frames are RGB arrays (H x W x 3); PIL images are also accepted
+Frame = Union[np.ndarray, "Image.Image"]
+
+# One list of detection dicts per input image
+BatchPredictor = Callable[[List[Frame]], List[List[Dict[str, Any]]]]
+
+
+def frame_size(image: Frame) -> tuple:
+    """(width, height) of a frame"""
+    if isinstance(image, np.ndarray):
+        return image.shape[1], image.shape[0]
+    return image.size
+
+
+class StubDetectionModel:
+    """
+    CPU stand-in for the YOLO model with configurable latency, for load
+    testing the scheduler without weights or a GPU
+    """
+    
+    def __init__(
+        self,
+        batch_latency_ms: float = 20.0,
+        per_image_latency_ms: float = 2.0,
+        class_name: str = "product"
+    ):
+        self.batch_latency_ms = batch_latency_ms
+        self.per_image_latency_ms = per_image_latency_ms
+        self.class_name = class_name
+        self.calls = 0
+    
+    def predict(self, images: List[Frame]) -> List[List[Dict[str, Any]]]:
+        """
+        Sleep like a forward pass (fixed cost plus a per-image cost) and
+        return one full-frame detection per image
+        """
+        self.calls += 1
+        time.sleep((self.batch_latency_ms + self.per_image_latency_ms * len(images)) / 1000.0)
+        return [
+            [{
+                "confidence": 0.9,
+                "bbox": [0.0, 0.0, *map(float, frame_size(image))],
+                "class_id": 0,
+                "class_name": self.class_name
+            }]
+            for image in images
+        ]
+
+
+class _InferenceRequest:
+    __slots__ = ("image", "future", "enqueued_at")
+    
+    def __init__(self, image: Frame):
+        self.image = image
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchInferenceScheduler:
+    """
+    Micro-batching queue in front of a model. A batch is dispatched once it
+    reaches max_batch_size or its oldest frame has waited max_wait_ms.
+    """
+    
+    def __init__(
+        self,
+        predict_batch: BatchPredictor,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 256,
+        latency_window: int = 1000
+    ):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.Queue[_InferenceRequest]" = queue.Queue(maxsize=max_queue_size)
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._running = False
+        
+        # Metrics
+        self.requests = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batches = 0
+        self.batch_sizes: Dict[int, int] = {}
+        self._latencies = {
+            "queue_wait": deque(maxlen=latency_window),
+            "inference": deque(maxlen=latency_window),
+            "total": deque(maxlen=latency_window)
+        }
+    
+    def start(self):
+        """Start the worker thread if it is not already running"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+            self._worker.start()
+    
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the worker after the batch in flight; queued frames are failed
+        """
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+        self._queue.put(None)
+        if self._worker:
+            self._worker.join(timeout)
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request.future.set_exception(RuntimeError("Inference scheduler stopped"))
+    
+    def submit(self, image: Frame) -> Future:
+        """
+        Queue one frame; the future resolves to its list of detections
+        """
+        self.start()
+        request = _InferenceRequest(image)
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            self.rejected += 1
+            raise RuntimeError("Inference queue is full")
+        self.requests += 1
+        return request.future
+    
+    def infer(self, image: Frame, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Submit a frame and block until its detections are ready"""
+        return self.submit(image).result(timeout)
+    
+    def _collect(self, first: _InferenceRequest) -> List[_InferenceRequest]:
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # Stop sentinel: finish this batch, then exit
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+    
+    def _run(self):
+        while self._running:
+            first = self._queue.get()
+            if first is None:
+                continue
+            batch = self._collect(first)
+            
+            started = time.perf_counter()
+            try:
+                outputs = self.predict_batch([request.image for request in batch])
+                if len(outputs) != len(batch):
+                    raise RuntimeError(f"Model returned {len(outputs)} results for {len(batch)} images")
+            except Exception as e:
+                self.failed += len(batch)
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+            
+            self.batches += 1
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            for request, detections in zip(batch, outputs):
+                self._latencies["queue_wait"].append((started - request.enqueued_at) * 1000.0)
+                self._latencies["inference"].append((finished - started) * 1000.0)
+                self._latencies["total"].append((finished - request.enqueued_at) * 1000.0)
+                request.future.set_result(detections)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, batch size distribution and per-stage latency percentiles"""
+        latency = {}
+        for stage, samples in self._latencies.items():
+            values = np.array(samples)
+            latency[stage] = {
+                "p50": round(float(np.percentile(values, 50)), 3),
+                "p95": round(float(np.percentile(values, 95)), 3),
+                "p99": round(float(np.percentile(values, 99)), 3),
+                "mean": round(float(values.mean()), 3)
+            } if len(values) else None
+        
+        return {
+            "running": self._running,
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "batches": self.batches,
+            "mean_batch_size": round(sum(size * n for size, n in self.batch_sizes.items()) / self.batches, 3)
+            if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "latency_ms": latency
+        }
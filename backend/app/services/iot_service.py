@@ -3,66 +3,125 @@ IoT Messaging Simulation Service
 Simulates MQTT-style event messaging for cart events
 """
 import json
-import asyncio
-from typing import Dict, Any, Callable, Optional
+from typing import Dict, Any, Callable, Optional, Tuple
 from datetime import datetime
 from app.config import settings
+from app.services.event_dispatcher import Subscription
+from app.services.message_store import MessageStore, TopicTrie
+from app.services.mqtt_transport import create_transport
 
 
 class IoTService:
     """
     IoT Messaging Service - Simulates MQTT pub/sub for cart events
-    In production, this would connect to a real MQTT broker
+    Messages are also forwarded to a broker when MQTT_TRANSPORT is "mqtt"
     """
     
     def __init__(self):
-        self.subscribers: Dict[str, list] = {}  # topic -> list of callbacks
-        self.message_history: list = []  # Store recent messages for debugging
+        self.transport = create_transport()
+        self.subscribers = TopicTrie()  # topic filter -> subscriptions
+        self._subscriptions: Dict[Tuple[str, Callable], Subscription] = {}
+        self.messages = MessageStore(
+            capacity=settings.IOT_MESSAGE_HISTORY_SIZE,
+            topic_capacity=settings.IOT_TOPIC_HISTORY_SIZE,
+            topic_limits=settings.IOT_TOPIC_RETENTION,
+            max_topics=settings.IOT_MAX_TOPICS
+        )
+    
+    @property
+    def message_history(self) -> list:
+        """Recent messages across all topics, oldest first"""
+        return self.messages.read(limit=self.messages.capacity)
     
     def publish(self, topic: str, payload: Dict[str, Any]) -> bool:
         """
         Publish message to topic (simulated MQTT publish)
         """
-        message = {
+        self.messages.append({
             "topic": topic,
             "payload": payload,
             "timestamp": datetime.utcnow().isoformat()
-        }
+        })
+        # Forward to the broker (no-op for the in-memory simulation)
+        try:
+            self.transport.send(topic, payload)
+        except Exception as e:
+            print(f"Error forwarding message to transport: {e}")
         
-        self.message_history.append(message)
-        # Keep only last 1000 messages
-        if len(self.message_history) > 1000:
-            self.message_history.pop(0)
-        
-        # Notify subscribers
-        if topic in self.subscribers:
-            for callback in self.subscribers[topic]:
-                try:
-                    callback(topic, payload)
-                except Exception as e:
-                    print(f"Error in subscriber callback: {e}")
+        # Notify subscribers, including wildcard filters. In async mode this
+        # only enqueues; callbacks run on each subscription's worker.
+        for subscription in self.subscribers.match(topic):
+            subscription.deliver(topic, payload)
         
         return True
     
-    def subscribe(self, topic: str, callback: Callable) -> bool:
+    def subscribe(
+        self,
+        topic: str,
+        callback: Callable,
+        mode: Optional[str] = None,
+        policy: Optional[str] = None,
+        max_queue_size: Optional[int] = None
+    ) -> bool:
         """
-        Subscribe to topic (simulated MQTT subscribe)
+        Subscribe to topic (simulated MQTT subscribe). Filters may use "+"
+        for one level and a trailing "#" for the rest, e.g. "cart/+/scan".
+        Dispatch mode and backpressure policy default to the settings.
         """
-        if topic not in self.subscribers:
-            self.subscribers[topic] = []
+        if (topic, callback) in self._subscriptions:
+            return False
         
-        self.subscribers[topic].append(callback)
+        subscription = Subscription(
+            topic,
+            callback,
+            mode=mode or settings.IOT_DISPATCH_MODE,
+            max_queue_size=max_queue_size or settings.IOT_SUBSCRIBER_QUEUE_SIZE,
+            policy=policy or settings.IOT_BACKPRESSURE_POLICY
+        )
+        self._subscriptions[(topic, callback)] = subscription
+        self.subscribers.insert(topic, subscription)
         return True
     
     def unsubscribe(self, topic: str, callback: Callable) -> bool:
         """
         Unsubscribe from topic
         """
-        if topic in self.subscribers:
-            if callback in self.subscribers[topic]:
-                self.subscribers[topic].remove(callback)
-                return True
-        return False
+        subscription = self._subscriptions.pop((topic, callback), None)
+        if subscription is None:
+            return False
+        self.subscribers.remove(topic, subscription)
+        subscription.close()
+        return True
+    
+    def add_message_listener(self, listener: Callable):
+        """
+        Call listener(message) with every stored message, including its seq,
+        on the publishing thread and in seq order. Listeners must not block.
+        """
+        self.messages.add_listener(listener)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for every subscriber queue to drain
+        """
+        return all(subscription.flush(timeout) for subscription in list(self._subscriptions.values()))
+    
+    def shutdown(self):
+        """Stop subscriber workers once their queues drain and close the transport"""
+        for subscription in list(self._subscriptions.values()):
+            subscription.close()
+        self.transport.close()
+    
+    def get_dispatch_stats(self) -> Dict[str, Any]:
+        """Per-subscriber queue depth, drops, errors and delivery lag"""
+        subscriptions = [subscription.get_stats() for subscription in list(self._subscriptions.values())]
+        return {
+            "mode": settings.IOT_DISPATCH_MODE,
+            "policy": settings.IOT_BACKPRESSURE_POLICY,
+            "last_seq": self.messages.last_seq,
+            "transport": self.transport.get_stats(),
+            "subscriptions": subscriptions
+        }
     
     # Convenience methods for cart events
     
@@ -78,6 +137,29 @@ class IoTService:
             }
         )
     
+    def publish_scan_batch_event(self, cart_id: int, items: list):
+        """Publish a single event for a batch of scanned items"""
+        self.publish(
+            f"cart/{cart_id}/scan",
+            {
+                "event_type": "items_scanned",
+                "cart_id": cart_id,
+                "items": items,
+                "item_count": len(items)
+            }
+        )
+    
+    def publish_removal_event(self, cart_id: int, product_id: int):
+        """Publish item removal event"""
+        self.publish(
+            f"cart/{cart_id}/scan",
+            {
+                "event_type": "item_removed",
+                "cart_id": cart_id,
+                "product_id": product_id
+            }
+        )
+    
     def publish_camera_event(self, cart_id: int, detected_objects: list):
         """Publish camera detection event"""
         self.publish(
@@ -90,6 +172,29 @@ class IoTService:
             }
         )
     
+    def publish_verification_event(
+        self,
+        cart_id: int,
+        product_id: int,
+        verified: bool,
+        message: Optional[str] = None,
+        confidence: Optional[float] = None,
+        match_score: Optional[float] = None
+    ):
+        """Publish AI verification result event"""
+        self.publish(
+            f"cart/{cart_id}/verification",
+            {
+                "event_type": "item_verified",
+                "cart_id": cart_id,
+                "product_id": product_id,
+                "verified": verified,
+                "message": message,
+                "confidence": confidence,
+                "match_score": match_score
+            }
+        )
+    
     def publish_alert_event(self, cart_id: int, alert_type: str, message: str, severity: str):
         """Publish alert event"""
         self.publish(
@@ -128,12 +233,17 @@ class IoTService:
             }
         )
     
-    def get_message_history(self, topic: Optional[str] = None, limit: int = 100) -> list:
-        """Get message history for debugging"""
-        messages = self.message_history
-        if topic:
-            messages = [m for m in messages if m["topic"] == topic]
-        return messages[-limit:]
+    def get_message_history(
+        self,
+        topic: Optional[str] = None,
+        limit: int = 100,
+        since_seq: Optional[int] = None
+    ) -> list:
+        """
+        Get message history for debugging. topic may be a wildcard filter;
+        since_seq returns only messages published after that sequence number.
+        """
+        return self.messages.read(topic=topic or None, since_seq=since_seq, limit=limit)
 
 
 # Global IoT service instance
@@ -0,0 +1,171 @@
+"""
+Live Event Stream Service
+Pushes IoT messages to WebSocket and Server-Sent Events clients from the
+server's event loop. Each message is encoded once and the same frame object
+is queued to every matching client; clients resume after a reconnect from
+the last sequence number they saw.
+"""
+import asyncio
+import json
+import threading
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Set
+from app.config import settings
+from app.services.iot_service import iot_service
+from app.services.message_store import TopicTrie
+
+DEFAULT_TOPICS = ["cart/+/update", "cart/+/scan", "cart/+/alert", "cart/+/payment"]
+
+
+class StreamFrame:
+    """One message, serialized lazily and at most once per wire format"""
+    
+    def __init__(self, message: Dict[str, Any]):
+        self.seq = message["seq"]
+        self.topic = message["topic"]
+        self.message = message
+    
+    @cached_property
+    def json(self) -> str:
+        return json.dumps(self.message, separators=(",", ":"))
+    
+    @cached_property
+    def sse(self) -> str:
+        event = self.topic.rsplit("/", 1)[-1]
+        return f"id: {self.seq}\nevent: {event}\ndata: {self.json}\n\n"
+
+
+class StreamClient:
+    """A connected dashboard or cart app and its bounded outbound queue"""
+    
+    def __init__(self, topics: List[str], max_queue_size: int):
+        self.loop = asyncio.get_running_loop()
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.last_seq = 0
+        self.overflowed = False
+
+
+class LiveStreamHub:
+    """
+    Fan-out of IoT messages to stream clients. Publishing threads hand each
+    message to the clients' event loop with call_soon_threadsafe, in seq
+    order (the store calls listeners under its lock); the loop matches
+    topic filters with a trie and enqueues the shared frame per client. A
+    client whose queue fills up is disconnected and expected to resume.
+    """
+    
+    def __init__(self):
+        self._loops: Dict[asyncio.AbstractEventLoop, int] = {}  # loop -> connected clients
+        self._clients: Set[StreamClient] = set()
+        self._filters = TopicTrie()  # topic filter -> clients
+        self._lock = threading.Lock()  # Guards the maps above; publishers read them from other threads
+        self.frames = 0
+        self.overflows = 0
+        iot_service.add_message_listener(self._on_message)
+    
+    def _on_message(self, message: Dict[str, Any]):
+        """Called on the publishing thread; must stay cheap"""
+        with self._lock:
+            loops = list(self._loops)
+        if not loops:
+            return
+        frame = StreamFrame(message)
+        for loop in loops:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._broadcast, frame, loop)
+    
+    def _broadcast(self, frame: StreamFrame, loop: asyncio.AbstractEventLoop):
+        self.frames += 1
+        with self._lock:
+            clients = set(self._filters.match(frame.topic))
+        for client in clients:
+            if client.loop is not loop or client.overflowed:
+                continue
+            try:
+                client.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                client.overflowed = True
+                self.overflows += 1
+                self.close(client)
+    
+    def close(self, client: StreamClient):
+        """
+        End a client's stream; must be called on the client's event loop
+        """
+        if client.queue.full():
+            client.queue.get_nowait()
+        client.queue.put_nowait(None)
+    
+    def connect(self, topics: Optional[List[str]] = None) -> StreamClient:
+        """
+        Register a client on the running event loop
+        """
+        client = StreamClient(topics or DEFAULT_TOPICS, settings.IOT_STREAM_QUEUE_SIZE)
+        with self._lock:
+            self._clients.add(client)
+            self._loops[client.loop] = self._loops.get(client.loop, 0) + 1
+            for topic in client.topics:
+                self._filters.insert(topic, client)
+        return client
+    
+    def disconnect(self, client: StreamClient):
+        with self._lock:
+            if client in self._clients:
+                self._clients.discard(client)
+                self._loops[client.loop] -= 1
+                if not self._loops[client.loop]:
+                    del self._loops[client.loop]
+                for topic in client.topics:
+                    self._filters.remove(topic, client)
+    
+    def backlog(self, client: StreamClient, since_seq: int) -> List[StreamFrame]:
+        """
+        Retained messages after since_seq on the client's topics, for resume
+        """
+        messages = []
+        for topic in client.topics:
+            messages.extend(iot_service.get_message_history(
+                topic=topic, since_seq=since_seq, limit=settings.IOT_STREAM_BACKLOG_LIMIT
+            ))
+        unique = {message["seq"]: message for message in messages}
+        return [StreamFrame(unique[seq]) for seq in sorted(unique)]
+    
+    async def frames_for(self, client: StreamClient, since_seq: Optional[int] = None):
+        """
+        Backlog after since_seq (if given), then live frames in seq order;
+        ends when the client overflows its queue
+        """
+        if since_seq is not None:
+            for frame in self.backlog(client, since_seq):
+                client.last_seq = frame.seq
+                yield frame
+        
+        while True:
+            if client.queue.empty():
+                try:
+                    frame = await asyncio.wait_for(client.queue.get(), settings.IOT_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None  # Heartbeat
+                    continue
+            else:
+                # Fast path: skip wait_for's timer and task when frames are queued
+                frame = client.queue.get_nowait()
+            if frame is None:
+                return
+            if frame.seq <= client.last_seq:
+                continue  # Already sent from the backlog
+            client.last_seq = frame.seq
+            yield frame
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._clients),
+            "frames": self.frames,
+            "overflows": self.overflows,
+            "queued": sum(client.queue.qsize() for client in list(self._clients))
+        }
+
+
+# Global live stream hub instance
+live_stream_hub = LiveStreamHub()
@@ -0,0 +1,259 @@
+"""
+IoT Message Store
+Bounded message history: a fixed-capacity ring buffer of every message plus
+per-topic deques, with sequence numbers for cursor reads and an MQTT-style
+topic trie for wildcard matching ("cart/+/scan", "cart/#")
+"""
+import heapq
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def is_wildcard(topic: str) -> bool:
+    return "+" in topic or "#" in topic
+
+
+class TopicTrie:
+    """
+    Topic levels ("cart", "12", "scan") as trie edges. Keys may be concrete
+    topics or MQTT filters where "+" matches one level and a trailing "#"
+    matches the rest of the topic.
+    
+    match() results are cached per topic (at most cache_size, oldest first
+    out) and stamped with the trie generation, which every change bumps
+    after it is made; a result computed against an older trie is never
+    served.
+    """
+    
+    def __init__(self, cache_size: int = 10000):
+        self.root = ({}, [])  # (children, values)
+        self.cache_size = cache_size
+        self._generation = 0
+        self._match_cache: Dict[str, Tuple[int, List[Any]]] = {}  # concrete topic -> (generation, matches)
+    
+    def _changed(self):
+        self._generation += 1
+        self._match_cache = {}
+    
+    def insert(self, key: str, value: Any):
+        node = self.root
+        for level in key.split("/"):
+            node = node[0].setdefault(level, ({}, []))
+        node[1].append(value)
+        self._changed()
+    
+    def remove(self, key: str, value: Any) -> bool:
+        path = [self.root]
+        for level in key.split("/"):
+            child = path[-1][0].get(level)
+            if child is None:
+                return False
+            path.append(child)
+        if value not in path[-1][1]:
+            return False
+        path[-1][1].remove(value)
+        
+        # Prune branches left empty
+        for level, node in zip(reversed(key.split("/")), reversed(path[:-1])):
+            child = node[0][level]
+            if child[0] or child[1]:
+                break
+            del node[0][level]
+        self._changed()
+        return True
+    
+    def match(self, topic: str) -> List[Any]:
+        """
+        Values stored under filters that match a concrete topic; cached per
+        topic until the trie changes
+        """
+        generation = self._generation
+        cache = self._match_cache
+        cached = cache.get(topic)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        
+        levels = topic.split("/")
+        matches = []
+        stack = [(self.root, 0)]
+        while stack:
+            (children, values), depth = stack.pop()
+            if "#" in children:
+                matches.extend(children["#"][1])
+            if depth == len(levels):
+                matches.extend(values)
+                continue
+            for key in (levels[depth], "+"):
+                child = children.get(key)
+                if child is not None:
+                    stack.append((child, depth + 1))
+        if len(cache) >= self.cache_size:
+            cache.pop(next(iter(cache)), None)
+        cache[topic] = (generation, matches)
+        return matches
+    
+    def filter(self, pattern: str) -> Iterator[str]:
+        """
+        Concrete keys matched by a filter; assumes keys were inserted as
+        concrete topics
+        """
+        levels = pattern.split("/")
+        stack = [(self.root, 0, [])]
+        while stack:
+            node, depth, prefix = stack.pop()
+            if depth == len(levels):
+                if node[1]:
+                    yield "/".join(prefix)
+                continue
+            level = levels[depth]
+            if level == "#":
+                # "#" also matches the parent level itself
+                subtree = [(node, prefix)]
+                while subtree:
+                    current, current_prefix = subtree.pop()
+                    if current[1] and current_prefix:
+                        yield "/".join(current_prefix)
+                    for key, child in current[0].items():
+                        subtree.append((child, current_prefix + [key]))
+            elif level == "+":
+                for key, child in node[0].items():
+                    stack.append((child, depth + 1, prefix + [key]))
+            elif level in node[0]:
+                stack.append((node[0][level], depth + 1, prefix + [level]))
+
+
+class MessageStore:
+    """
+    Append-only message history with bounded memory. Every message gets a
+    monotonically increasing seq; reads are "latest N" or "since seq" and
+    cost O(k) in the number of messages returned. Per-topic history is kept
+    for at most max_topics topics; the least recently published is evicted
+    (its messages stay in the global ring until overwritten).
+    """
+    
+    def __init__(
+        self,
+        capacity: int = 1000,
+        topic_capacity: int = 100,
+        topic_limits: Optional[Dict[str, int]] = None,
+        max_topics: int = 10000
+    ):
+        self.capacity = capacity
+        self.topic_capacity = topic_capacity
+        self.max_topics = max_topics
+        self._ring: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._last_seq = 0
+        self._topics: "OrderedDict[str, deque]" = OrderedDict()  # least recently published first
+        self.evicted_topics = 0
+        self._topic_index = TopicTrie()  # concrete topics, for wildcard reads
+        self._limits = TopicTrie()  # retention filter -> limit
+        for pattern, limit in (topic_limits or {}).items():
+            self._limits.insert(pattern, limit)
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+    
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+    
+    @property
+    def first_seq(self) -> int:
+        """Oldest seq still held in the global ring"""
+        return max(1, self._last_seq - self.capacity + 1)
+    
+    def _topic_limit(self, topic: str) -> int:
+        limits = self._limits.match(topic)
+        return max(limits) if limits else self.topic_capacity
+    
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """
+        Call listener(message) with every appended message. Listeners run
+        under the store lock, so they see messages in seq order even with
+        concurrent publishers; they must not block.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+    
+    def append(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Assign the next seq to a message (with a "topic" key) and store it
+        """
+        topic = message["topic"]
+        with self._lock:
+            self._last_seq += 1
+            message["seq"] = self._last_seq
+            self._ring[self._last_seq % self.capacity] = message
+            
+            messages = self._topics.get(topic)
+            if messages is None:
+                messages = self._topics[topic] = deque(maxlen=self._topic_limit(topic))
+                self._topic_index.insert(topic, True)
+                if len(self._topics) > self.max_topics:
+                    idle, _ = self._topics.popitem(last=False)
+                    self._topic_index.remove(idle, True)
+                    self.evicted_topics += 1
+            else:
+                self._topics.move_to_end(topic)
+            messages.append(message)
+            for listener in self._listeners:
+                listener(message)
+        return message
+    
+    def _ring_range(self, start_seq: int, end_seq: int) -> List[Dict[str, Any]]:
+        ring, capacity = self._ring, self.capacity
+        return [ring[seq % capacity] for seq in range(start_seq, end_seq + 1)]
+    
+    @staticmethod
+    def _topic_tail(messages: Iterable[Dict[str, Any]], since_seq: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        """
+        Newest-first walk of one topic, stopping at the cursor or the limit
+        """
+        tail = []
+        for message in messages:
+            if since_seq is not None and message["seq"] <= since_seq:
+                break
+            tail.append(message)
+            if since_seq is None and len(tail) == limit:
+                break
+        tail.reverse()
+        return tail
+    
+    def read(
+        self,
+        topic: Optional[str] = None,
+        since_seq: Optional[int] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Messages in seq order. Without since_seq, the latest `limit` messages;
+        with it, up to `limit` messages after that seq (oldest first).
+        topic may be a concrete topic or a wildcard filter.
+        """
+        with self._lock:
+            if topic is None:
+                if since_seq is None:
+                    start = max(self.first_seq, self._last_seq - limit + 1)
+                    return self._ring_range(start, self._last_seq)
+                start = max(self.first_seq, since_seq + 1)
+                return self._ring_range(start, min(self._last_seq, start + limit - 1))
+            
+            topics = list(self._topic_index.filter(topic)) if is_wildcard(topic) else [topic]
+            tails = [
+                self._topic_tail(reversed(self._topics[name]), since_seq, limit)
+                for name in topics
+                if name in self._topics
+            ]
+        
+        if len(tails) == 1:
+            messages = tails[0]
+        else:
+            messages = list(heapq.merge(*tails, key=lambda message: message["seq"]))
+        return messages[:limit] if since_seq is not None else messages[-limit:]
+    
+    def topics(self) -> List[str]:
+        with self._lock:
+            return list(self._topics)
+    
+    def __len__(self) -> int:
+        return min(self._last_seq, self.capacity)
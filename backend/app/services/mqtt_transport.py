@@ -0,0 +1,314 @@
+"""
+IoT Transports
+Outbound leg of IoTService: the in-memory simulation (default) or a
+persistent MQTT client with reconnect buffering, batching and JSON,
+MessagePack or CBOR payloads
+"""
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.config import settings
+
+# paho-mqtt publish return codes
+MQTT_ERR_SUCCESS = 0
+MQTT_ERR_NO_CONN = 4
+
+
+def get_codec(payload_format: str) -> Callable[[Any], bytes]:
+    """
+    Encoder for a payload format; msgpack and cbor2 are imported on first use
+    """
+    if payload_format == "json":
+        return lambda payload: json.dumps(payload, separators=(",", ":")).encode()
+    if payload_format == "msgpack":
+        import msgpack
+        return lambda payload: msgpack.packb(payload, use_bin_type=True)
+    if payload_format == "cbor":
+        import cbor2
+        return cbor2.dumps
+    raise ValueError(f"Unknown payload format: {payload_format}")
+
+
+class InMemoryTransport:
+    """
+    Simulation transport: messages only live in IoTService's history and
+    local subscribers, nothing leaves the process
+    """
+    name = "memory"
+    
+    def send(self, topic: str, payload: Dict[str, Any]):
+        pass
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        pass
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {"transport": self.name}
+
+
+class LoopbackMQTTClient:
+    """
+    Broker stand-in implementing the parts of the paho-mqtt Client API the
+    transport uses. Publishes are counted (and optionally kept) instead of
+    sent; disconnects can be simulated to exercise reconnect buffering.
+    Like paho, QoS 1/2 publishes made while disconnected are queued by the
+    client and sent on reconnect; QoS 0 ones are refused.
+    """
+    
+    class _Info:
+        def __init__(self, rc: int):
+            self.rc = rc
+    
+    def __init__(self, keep_messages: bool = False):
+        self.on_connect: Optional[Callable] = None
+        self.on_disconnect: Optional[Callable] = None
+        self.connected = False
+        self.keep_messages = keep_messages
+        self.messages: List[Tuple[str, bytes, int]] = []
+        self.queued: List[Tuple[str, bytes, int]] = []
+        self.publishes = 0
+        self.bytes = 0
+    
+    def reconnect_delay_set(self, min_delay: int = 1, max_delay: int = 120):
+        pass
+    
+    def connect_async(self, host: str, port: int = 1883, keepalive: int = 60):
+        pass
+    
+    def loop_start(self):
+        self.simulate_reconnect()
+    
+    def loop_stop(self):
+        pass
+    
+    def disconnect(self):
+        self.simulate_disconnect(rc=0)
+    
+    def publish(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False):
+        if not self.connected:
+            if qos > 0:
+                self.queued.append((topic, payload, qos))
+            return self._Info(MQTT_ERR_NO_CONN)
+        self.publishes += 1
+        self.bytes += len(payload)
+        if self.keep_messages:
+            self.messages.append((topic, payload, qos))
+        return self._Info(MQTT_ERR_SUCCESS)
+    
+    def simulate_disconnect(self, rc: int = 1):
+        self.connected = False
+        if self.on_disconnect:
+            self.on_disconnect(self, None, rc)
+    
+    def simulate_reconnect(self):
+        self.connected = True
+        queued, self.queued = self.queued, []
+        for topic, payload, qos in queued:
+            self.publish(topic, payload, qos)
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0)
+
+
+class MQTTTransport:
+    """
+    One long-lived MQTT connection per process. Messages are encoded with
+    the configured codec and, when batch_size > 1, packed into envelopes of
+    [topic, payload] pairs on batch_topic, flushed when full or after
+    batch_interval_ms. While disconnected, QoS 0 publishes wait in a bounded
+    outbound buffer (oldest dropped first) and are replayed on reconnect;
+    QoS 1/2 publishes go straight to paho, which queues them itself.
+    """
+    name = "mqtt"
+    
+    def __init__(
+        self,
+        client: Optional[Any] = None,
+        payload_format: str = "json",
+        qos: int = 0,
+        batch_size: int = 1,
+        batch_interval_ms: float = 20.0,
+        batch_topic: str = "carts/batch",
+        buffer_size: int = 10000
+    ):
+        self.client = client
+        self.encode = get_codec(payload_format)
+        self.payload_format = payload_format
+        self.qos = qos
+        self.batch_size = batch_size
+        self.batch_interval_ms = batch_interval_ms
+        self.batch_topic = batch_topic
+        self._batch: List[List[Any]] = []
+        self._outbound: deque = deque(maxlen=buffer_size)
+        self._lock = threading.RLock()
+        self._flusher: Optional[threading.Thread] = None
+        self._started = False
+        self._closed = False
+        self.connected = False
+        self._ever_connected = False
+        
+        # Metrics
+        self.messages = 0
+        self.publishes = 0
+        self.bytes = 0
+        self.buffered_peak = 0
+        self.dropped = 0
+        self.errors = 0
+        self.reconnects = 0
+    
+    def _create_client(self):
+        import paho.mqtt.client as mqtt
+        
+        if hasattr(mqtt, "CallbackAPIVersion"):
+            # paho-mqtt 2.x; keep the 1.x callback signatures
+            return mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=settings.MQTT_CLIENT_ID)
+        return mqtt.Client(client_id=settings.MQTT_CLIENT_ID)
+    
+    def _start(self):
+        """Connect on first use so importing the app never opens a socket"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            if self.client is None:
+                self.client = self._create_client()
+            self.client.on_connect = self._on_connect
+            self.client.on_disconnect = self._on_disconnect
+            self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+            if hasattr(self.client, "max_queued_messages_set"):
+                # Bound paho's own queue (QoS 1/2 while offline) like the QoS 0 buffer
+                self.client.max_queued_messages_set(self._outbound.maxlen)
+            self.client.connect_async(settings.MQTT_BROKER_HOST, settings.MQTT_BROKER_PORT, settings.MQTT_KEEPALIVE)
+            self.client.loop_start()
+            
+            if self.batch_size > 1:
+                self._flusher = threading.Thread(target=self._flush_periodically, name="mqtt-batch-flusher", daemon=True)
+                self._flusher.start()
+    
+    def _on_connect(self, client, userdata, flags, rc, *args):
+        if rc != 0:
+            print(f"⚠️  MQTT connection refused: {rc}")
+            return
+        with self._lock:
+            if self._ever_connected:
+                self.reconnects += 1
+            self.connected = self._ever_connected = True
+            # Replay publishes buffered while offline
+            while self._outbound and self.connected:
+                topic, data = self._outbound.popleft()
+                self._publish(topic, data)
+    
+    def _on_disconnect(self, client, userdata, rc, *args):
+        self.connected = False
+        if rc != 0:
+            print(f"⚠️  MQTT connection lost ({rc}); buffering outbound messages")
+    
+    def _publish(self, topic: str, data: bytes):
+        if self.connected or self.qos > 0:
+            info = self.client.publish(topic, data, qos=self.qos)
+            if info.rc == MQTT_ERR_SUCCESS or (info.rc == MQTT_ERR_NO_CONN and self.qos > 0):
+                # Sent, or held in paho's queue until it reconnects
+                self.publishes += 1
+                self.bytes += len(data)
+                if info.rc == MQTT_ERR_NO_CONN:
+                    self.connected = False
+                return
+            if info.rc != MQTT_ERR_NO_CONN:
+                # Refused for this message (queue full, payload too large), not a lost connection
+                self.errors += 1
+                print(f"⚠️  MQTT publish to {topic} failed ({info.rc})")
+                return
+            self.connected = False
+        
+        if len(self._outbound) == self._outbound.maxlen:
+            self.dropped += 1
+        self._outbound.append((topic, data))
+        self.buffered_peak = max(self.buffered_peak, len(self._outbound))
+    
+    def send(self, topic: str, payload: Dict[str, Any]):
+        """
+        Queue one message for the broker; never blocks on the network
+        """
+        if not self._started:
+            self._start()
+        
+        with self._lock:
+            self.messages += 1
+            if self.batch_size <= 1:
+                self._publish(topic, self.encode(payload))
+                return
+            self._batch.append([topic, payload])
+            if len(self._batch) >= self.batch_size:
+                self._flush_batch()
+    
+    def _flush_batch(self):
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self._publish(self.batch_topic, self.encode(batch))
+    
+    def _flush_periodically(self):
+        while not self._closed:
+            time.sleep(self.batch_interval_ms / 1000.0)
+            with self._lock:
+                self._flush_batch()
+    
+    def flush(self):
+        """Publish any partially filled batch now"""
+        with self._lock:
+            self._flush_batch()
+    
+    def close(self):
+        """Flush pending batches and close the connection"""
+        if not self._started or self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self.client.disconnect()
+        self.client.loop_stop()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "transport": self.name,
+            "connected": self.connected,
+            "payload_format": self.payload_format,
+            "qos": self.qos,
+            "batch_size": self.batch_size,
+            "messages": self.messages,
+            "publishes": self.publishes,
+            "bytes": self.bytes,
+            "bytes_per_message": round(self.bytes / self.messages, 1) if self.messages else 0.0,
+            "buffered": len(self._outbound),
+            "buffered_peak": self.buffered_peak,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "reconnects": self.reconnects
+        }
+
+
+def create_transport(name: Optional[str] = None):
+    """
+    Build the transport named by MQTT_TRANSPORT: "memory", "mqtt" or
+    "loopback" (MQTT code path against an in-process broker stand-in)
+    """
+    name = name or settings.MQTT_TRANSPORT
+    if name == "memory":
+        return InMemoryTransport()
+    if name not in ("mqtt", "loopback"):
+        raise ValueError(f"Unknown IoT transport: {name}")
+    
+    transport = MQTTTransport(
+        client=LoopbackMQTTClient() if name == "loopback" else None,
+        payload_format=settings.MQTT_PAYLOAD_FORMAT,
+        qos=settings.MQTT_QOS,
+        batch_size=settings.MQTT_BATCH_SIZE,
+        batch_interval_ms=settings.MQTT_BATCH_INTERVAL_MS,
+        batch_topic=settings.MQTT_BATCH_TOPIC,
+        buffer_size=settings.MQTT_OUTBOUND_BUFFER_SIZE
+    )
+    if name == "loopback":
+        transport.name = "loopback"
+    return transport
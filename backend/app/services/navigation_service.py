@@ -4,12 +4,240 @@ Handles store map navigation and aisle routing
 """
 import json
 import math
-from typing import List, Tuple, Optional
-from sqlalchemy.orm import Session
+import time
+from typing import Dict, List, Tuple, Optional, Union
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 from app.models.aisle import Aisle
-from app.models.product import Product
 from app.models.cart import Cart
-from app.schemas.navigation import NavigationResponse, NavigationStep, AisleResponse
+from app.config import settings
+from app.schemas.navigation import (
+    NavigationResponse, NavigationStep, AisleResponse, ShoppingRouteResponse, ShoppingStop
+)
+from app.services.catalog_cache_service import catalog_cache
+
+# Graph node keys: "entrance", "checkout" or an aisle id
+NodeKey = Union[str, int]
+
+
+class StoreGraph:
+    """
+    Walkable store graph. Nodes are the entrance, checkout, aisle access points
+    and the corners of shelving obstacles; corridors join every pair of nodes
+    with an unobstructed straight line. All-pairs shortest distances and next
+    hops are precomputed once per layout, so routing is a table lookup.
+    """
+    CLEARANCE = 1.0  # Distance kept from obstacle corners
+    
+    def __init__(self, store_map: dict, aisles: List[AisleResponse]):
+        self.obstacles = [tuple(map(float, box)) for box in store_map.get("obstacles", [])]
+        self.points: List[Tuple[float, float]] = []
+        self.labels: List[Optional[AisleResponse]] = []
+        self.index: Dict[NodeKey, int] = {}
+        self.aisles: Dict[int, AisleResponse] = {aisle.id: aisle for aisle in aisles}
+        
+        self._add_node("entrance", tuple(store_map["entrance"]))
+        self._add_node("checkout", tuple(store_map["checkout"]))
+        for aisle in aisles:
+            self._add_node(aisle.id, (aisle.x_coordinate, aisle.y_coordinate), aisle)
+        for x1, y1, x2, y2 in self.obstacles:
+            c = self.CLEARANCE
+            for corner in ((x1 - c, y1 - c), (x2 + c, y1 - c), (x1 - c, y2 + c), (x2 + c, y2 + c)):
+                if not any(self._inside(corner, box) for box in self.obstacles):
+                    self._add_node(None, corner)
+        
+        self.distances, self.next_hop = self._all_pairs()
+        self.distance_rows = self.distances.tolist()  # Plain lists for fast scalar lookups
+    
+    def _add_node(self, key: Optional[NodeKey], point: Tuple[float, float], aisle: Optional[AisleResponse] = None):
+        if key is not None:
+            self.index[key] = len(self.points)
+        self.points.append((float(point[0]), float(point[1])))
+        self.labels.append(aisle)
+    
+    @staticmethod
+    def _inside(point: Tuple[float, float], box: Tuple[float, float, float, float]) -> bool:
+        x1, y1, x2, y2 = box
+        return x1 < point[0] < x2 and y1 < point[1] < y2
+    
+    @staticmethod
+    def _crosses(p: Tuple[float, float], q: Tuple[float, float], box: Tuple[float, float, float, float]) -> bool:
+        """
+        Liang-Barsky clip: does segment p-q pass through the box interior?
+        """
+        x1, y1, x2, y2 = box
+        dx, dy = q[0] - p[0], q[1] - p[1]
+        t0, t1 = 0.0, 1.0
+        for delta, low, high, origin in ((dx, x1, x2, p[0]), (dy, y1, y2, p[1])):
+            if abs(delta) < 1e-12:
+                if not low < origin < high:
+                    return False
+                continue
+            ta, tb = (low - origin) / delta, (high - origin) / delta
+            t0, t1 = max(t0, min(ta, tb)), min(t1, max(ta, tb))
+        return t1 - t0 > 1e-9
+    
+    def _visible(self, i: int, j: int) -> bool:
+        p, q = self.points[i], self.points[j]
+        for box in self.obstacles:
+            # Access points placed inside a shelf can still be reached
+            if self._inside(p, box) or self._inside(q, box):
+                continue
+            if self._crosses(p, q, box):
+                return False
+        return True
+    
+    def _all_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Corridor edges plus vectorized Floyd-Warshall with next-hop tracking
+        """
+        count = len(self.points)
+        coords = np.array(self.points)
+        euclidean = np.sqrt(((coords[:, None, :] - coords[None, :, :]) ** 2).sum(axis=2))
+        
+        distances = np.full((count, count), np.inf)
+        for i in range(count):
+            distances[i, i] = 0.0
+            for j in range(i + 1, count):
+                if self._visible(i, j):
+                    distances[i, j] = distances[j, i] = euclidean[i, j]
+        
+        next_hop = np.where(np.isfinite(distances), np.arange(count)[None, :], -1)
+        for k in range(count):
+            via = distances[:, k:k + 1] + distances[k:k + 1, :]
+            better = via < distances
+            distances = np.where(better, via, distances)
+            next_hop = np.where(better, next_hop[:, k:k + 1], next_hop)
+        
+        return distances, next_hop
+    
+    def distance(self, start: NodeKey, end: NodeKey) -> float:
+        return float(self.distances[self.index[start], self.index[end]])
+    
+    def path(self, start: NodeKey, end: NodeKey) -> List[int]:
+        """
+        Node indexes from start to end (inclusive); empty if unreachable
+        """
+        u, v = self.index[start], self.index[end]
+        if self.next_hop[u, v] < 0:
+            return []
+        nodes = [u]
+        while u != v:
+            u = int(self.next_hop[u, v])
+            nodes.append(u)
+        return nodes
+
+
+def tour_length(dist: List[List[float]], order: List[int]) -> float:
+    return sum(dist[order[i]][order[i + 1]] for i in range(len(order) - 1))
+
+
+def _held_karp(dist: List[List[float]], start: int, end: int, stops: List[int]) -> List[int]:
+    """
+    Exact open-path DP from start through every stop to end; O(2^n * n^2)
+    """
+    n = len(stops)
+    full = (1 << n) - 1
+    # best[(mask, j)] = (cost, previous stop index) for paths ending at stop j
+    best = {(1 << j, j): (dist[start][stops[j]], -1) for j in range(n)}
+    for mask in range(1, full + 1):
+        for j in range(n):
+            if not mask & (1 << j) or (mask, j) not in best:
+                continue
+            cost = best[(mask, j)][0]
+            for k in range(n):
+                if mask & (1 << k):
+                    continue
+                key = (mask | (1 << k), k)
+                candidate = cost + dist[stops[j]][stops[k]]
+                if key not in best or candidate < best[key][0]:
+                    best[key] = (candidate, j)
+    
+    last = min(range(n), key=lambda j: best[(full, j)][0] + dist[stops[j]][end])
+    order, mask = [], full
+    while last != -1:
+        order.append(stops[last])
+        mask, last = mask ^ (1 << last), best[(mask, last)][1]
+    return [start] + order[::-1] + [end]
+
+
+def _nearest_neighbour(dist: List[List[float]], start: int, end: int, stops: List[int]) -> List[int]:
+    order, remaining, current = [start], set(stops), start
+    while remaining:
+        current = min(remaining, key=lambda stop: dist[current][stop])
+        remaining.remove(current)
+        order.append(current)
+    return order + [end]
+
+
+def _improve(dist: List[List[float]], order: List[int], deadline: float) -> List[int]:
+    """
+    2-opt segment reversals and Or-opt moves (segments of 1-3 stops) with
+    fixed endpoints, until no move improves the tour or the deadline passes
+    """
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        n = len(order)
+        
+        # 2-opt: reverse order[i..j]
+        for i in range(1, n - 2):
+            a, b = order[i - 1], order[i]
+            for j in range(i + 1, n - 1):
+                c, d = order[j], order[j + 1]
+                if dist[a][c] + dist[b][d] < dist[a][b] + dist[c][d] - 1e-9:
+                    order[i:j + 1] = order[i:j + 1][::-1]
+                    improved = True
+                    b = order[i]
+            if time.perf_counter() >= deadline:
+                return order
+        
+        # Or-opt: move order[i..i+length-1] between two other neighbours
+        for length in (1, 2, 3):
+            i = 1
+            while i + length < n:
+                segment = order[i:i + length]
+                prev, nxt = order[i - 1], order[i + length]
+                removal_gain = dist[prev][segment[0]] + dist[segment[-1]][nxt] - dist[prev][nxt]
+                rest = order[:i] + order[i + length:]
+                best_delta, best_at = -1e-9, None
+                for k in range(len(rest) - 1):
+                    p, q = rest[k], rest[k + 1]
+                    delta = dist[p][segment[0]] + dist[segment[-1]][q] - dist[p][q] - removal_gain
+                    if delta < best_delta:
+                        best_delta, best_at = delta, k
+                if best_at is not None:
+                    order = rest[:best_at + 1] + segment + rest[best_at + 1:]
+                    improved = True
+                i += 1
+            if time.perf_counter() >= deadline:
+                return order
+    
+    return order
+
+
+def solve_shopping_tour(
+    dist: List[List[float]],
+    start: int,
+    end: int,
+    stops: List[int],
+    time_budget_ms: float = 3.0,
+    exact_limit: int = 8
+) -> Tuple[List[int], str]:
+    """
+    Order stops on an open path from start to end. Small lists are solved
+    exactly; larger ones use nearest neighbour plus 2-opt/Or-opt within the
+    time budget.
+    """
+    if len(stops) <= 1:
+        return [start] + stops + [end], "trivial"
+    if len(stops) <= exact_limit:
+        return _held_karp(dist, start, end, stops), "exact"
+    
+    deadline = time.perf_counter() + time_budget_ms / 1000.0
+    order = _nearest_neighbour(dist, start, end, stops)
+    return _improve(dist, order, deadline), "heuristic"
 
 
 class NavigationService:
@@ -22,8 +250,16 @@ class NavigationService:
             "width": 100,  # Store width in units
             "height": 100,  # Store height in units
             "entrance": (0, 0),  # Entrance coordinates
-            "checkout": (90, 90)  # Checkout coordinates
+            "checkout": (90, 90),  # Checkout coordinates
+            "obstacles": [  # Shelving units as (x1, y1, x2, y2)
+                (5, 13, 28, 17),
+                (32, 13, 55, 17),
+                (5, 23, 55, 27)
+            ]
         }
+        self._graph: Optional[StoreGraph] = None
+        self._checked_at = 0.0
+        self.layout_ttl_seconds = settings.NAVIGATION_LAYOUT_TTL_SECONDS
     
     def calculate_distance(self, point1: Tuple[float, float], point2: Tuple[float, float]) -> float:
         """
@@ -31,57 +267,71 @@ class NavigationService:
         """
         return math.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
     
+    def load_layout(self, db: Session) -> StoreGraph:
+        """
+        Load aisles and precompute the routing tables for the current layout.
+        The tables are kept if the aisles are unchanged since the last load.
+        """
+        aisles = [AisleResponse.model_validate(aisle) for aisle in db.query(Aisle).all()]
+        graph = self._graph
+        if graph is None or list(graph.aisles.values()) != aisles:
+            graph = StoreGraph(self.store_map, aisles)
+            self._graph = graph
+        self._checked_at = time.monotonic()
+        return graph
+    
+    def invalidate_layout(self):
+        """Drop the routing tables; they are rebuilt on the next request"""
+        self._graph = None
+    
+    def get_graph(self, db: Session) -> StoreGraph:
+        """
+        Routing tables for the current layout. Aisle changes committed by
+        other workers are picked up by re-reading the (small) aisles table
+        every layout_ttl_seconds.
+        """
+        graph = self._graph
+        if graph is None or (
+            self.layout_ttl_seconds and time.monotonic() - self._checked_at > self.layout_ttl_seconds
+        ):
+            graph = self.load_layout(db)
+        return graph
+    
     def find_shortest_path(
         self,
-        start: Tuple[float, float],
-        end: Tuple[float, float],
-        aisles: List[Aisle]
+        graph: StoreGraph,
+        start: NodeKey,
+        end: NodeKey
     ) -> List[NavigationStep]:
         """
-        Find shortest path through aisles (simplified A* or Dijkstra)
-        For demo, using simple direct path with waypoints
+        Step-by-step route along the precomputed shortest path
         """
-        steps = []
-        
-        # Simple path: direct line with intermediate waypoints at aisles
-        # In production, use proper pathfinding algorithm
-        
-        # Find nearest aisle to start
-        nearest_start_aisle = min(
-            aisles,
-            key=lambda a: self.calculate_distance(start, (a.x_coordinate, a.y_coordinate))
-        )
-        
-        # Find nearest aisle to end
-        nearest_end_aisle = min(
-            aisles,
-            key=lambda a: self.calculate_distance(end, (a.x_coordinate, a.y_coordinate))
-        )
+        nodes = graph.path(start, end)
+        if not nodes:
+            raise ValueError("No walkable route to target")
         
-        step_num = 1
-        
-        # Step 1: Go to nearest aisle from start
-        if nearest_start_aisle.id != nearest_end_aisle.id:
+        steps = []
+        for step_num, node in enumerate(nodes[1:], start=1):
+            point = graph.points[node]
+            aisle = graph.labels[node]
+            is_last = step_num == len(nodes) - 1
+            
+            if aisle and is_last:
+                instruction = f"Arrive at {aisle.name} in {aisle.section} section"
+            elif aisle:
+                instruction = f"Pass {aisle.name} in {aisle.section} section"
+            elif is_last and end == "checkout":
+                instruction = "Arrive at checkout"
+            else:
+                instruction = f"Continue along the corridor to ({point[0]:.0f}, {point[1]:.0f})"
+            
             steps.append(NavigationStep(
                 step_number=step_num,
-                instruction=f"Navigate to {nearest_start_aisle.section} section",
-                aisle_id=nearest_start_aisle.id,
-                aisle_name=nearest_start_aisle.name,
-                coordinates=(nearest_start_aisle.x_coordinate, nearest_start_aisle.y_coordinate)
+                instruction=instruction,
+                aisle_id=aisle.id if aisle else None,
+                aisle_name=aisle.name if aisle else ("Checkout" if is_last and end == "checkout" else "Corridor"),
+                coordinates=point
             ))
-            step_num += 1
-        
-        # Step 2: Navigate through intermediate aisles if needed
-        # (Simplified - in production, calculate optimal path)
-        
-        # Step 3: Go to target aisle
-        steps.append(NavigationStep(
-            step_number=step_num,
-            instruction=f"Arrive at {nearest_end_aisle.name} in {nearest_end_aisle.section} section",
-            aisle_id=nearest_end_aisle.id,
-            aisle_name=nearest_end_aisle.name,
-            coordinates=(nearest_end_aisle.x_coordinate, nearest_end_aisle.y_coordinate)
-        ))
         
         return steps
     
@@ -99,39 +349,32 @@ class NavigationService:
         if not cart:
             raise ValueError(f"Cart {cart_id} not found")
         
+        graph = self.get_graph(db)
+        
         # Determine target
         if target_product_id:
-            product = db.query(Product).filter(Product.id == target_product_id).first()
+            product = catalog_cache.get_by_id(db, target_product_id)
             if not product:
                 raise ValueError(f"Product {target_product_id} not found")
             
             if not product.aisle_id:
                 raise ValueError(f"Product {target_product_id} has no aisle assigned")
             
-            target_aisle = db.query(Aisle).filter(Aisle.id == product.aisle_id).first()
-        elif target_aisle_id:
-            target_aisle = db.query(Aisle).filter(Aisle.id == target_aisle_id).first()
-            if not target_aisle:
-                raise ValueError(f"Aisle {target_aisle_id} not found")
-        else:
+            target_aisle_id = product.aisle_id
+        elif not target_aisle_id:
             raise ValueError("Either target_product_id or target_aisle_id must be provided")
         
-        # Get all aisles for pathfinding
-        all_aisles = db.query(Aisle).all()
+        target_aisle = graph.aisles.get(target_aisle_id)
+        if not target_aisle:
+            raise ValueError(f"Aisle {target_aisle_id} not found")
         
         # Current location (simulated - in production, get from cart GPS/RFID)
         current_location = self.store_map["entrance"]
         
         # Calculate route
         target_coords = (target_aisle.x_coordinate, target_aisle.y_coordinate)
-        route_steps = self.find_shortest_path(current_location, target_coords, all_aisles)
-        
-        # Calculate total distance
-        total_distance = 0.0
-        prev_point = current_location
-        for step in route_steps:
-            total_distance += self.calculate_distance(prev_point, step.coordinates)
-            prev_point = step.coordinates
+        route_steps = self.find_shortest_path(graph, "entrance", target_aisle.id)
+        total_distance = graph.distance("entrance", target_aisle.id)
         
         # Estimate time (assuming 1 unit = 1 meter, walking speed = 1 m/s)
         estimated_time = total_distance / 1.0  # seconds
@@ -141,19 +384,90 @@ class NavigationService:
             cart_id=cart_id,
             current_location=current_location,
             target_location=target_coords,
-            target_aisle=AisleResponse(
-                id=target_aisle.id,
-                name=target_aisle.name,
-                section=target_aisle.section,
-                x_coordinate=target_aisle.x_coordinate,
-                y_coordinate=target_aisle.y_coordinate,
-                description=target_aisle.description
-            ),
+            target_aisle=target_aisle,
             route=route_steps,
             total_distance=round(total_distance, 2),
             estimated_time_minutes=round(estimated_time_minutes, 2)
         )
     
+    def get_shopping_route(
+        self,
+        db: Session,
+        cart_id: int,
+        product_ids: List[int]
+    ) -> ShoppingRouteResponse:
+        """
+        Visit the aisles of every listed product in the shortest order,
+        starting at the entrance and finishing at checkout
+        """
+        cart = db.query(Cart).filter(Cart.id == cart_id).first()
+        if not cart:
+            raise ValueError(f"Cart {cart_id} not found")
+        
+        graph = self.get_graph(db)
+        
+        # Group products by aisle; products without a known aisle are reported back
+        aisle_products: Dict[int, List[int]] = {}
+        unrouted = []
+        for product_id in dict.fromkeys(product_ids):
+            product = catalog_cache.get_by_id(db, product_id)
+            if not product:
+                raise ValueError(f"Product {product_id} not found")
+            if product.aisle_id in graph.aisles:
+                aisle_products.setdefault(product.aisle_id, []).append(product_id)
+            else:
+                unrouted.append(product_id)
+        
+        start, end = graph.index["entrance"], graph.index["checkout"]
+        stops = [graph.index[aisle_id] for aisle_id in aisle_products]
+        order, solver = solve_shopping_tour(
+            graph.distance_rows,
+            start,
+            end,
+            stops,
+            time_budget_ms=settings.NAVIGATION_TOUR_TIME_BUDGET_MS,
+            exact_limit=settings.NAVIGATION_EXACT_TOUR_LIMIT
+        )
+        
+        total_distance = tour_length(graph.distance_rows, order)
+        if math.isinf(total_distance):
+            raise ValueError("No walkable route through all listed aisles")
+        
+        # Expand each leg into corridor-level steps
+        route_steps: List[NavigationStep] = []
+        shopping_stops = []
+        node_keys = {start: "entrance", end: "checkout"}
+        for leg, (u, v) in enumerate(zip(order, order[1:])):
+            leg_steps = self.find_shortest_path(
+                graph,
+                node_keys.get(u) or graph.labels[u].id,
+                node_keys.get(v) or graph.labels[v].id
+            )
+            for step in leg_steps:
+                step.step_number = len(route_steps) + 1
+                route_steps.append(step)
+            if v != end:
+                aisle = graph.labels[v]
+                shopping_stops.append(ShoppingStop(
+                    stop_number=leg + 1,
+                    aisle=aisle,
+                    product_ids=aisle_products[aisle.id],
+                    distance_from_previous=round(graph.distance_rows[u][v], 2)
+                ))
+        
+        # Estimate time (assuming 1 unit = 1 meter, walking speed = 1 m/s)
+        estimated_time_minutes = total_distance / 1.0 / 60.0
+        
+        return ShoppingRouteResponse(
+            cart_id=cart_id,
+            stops=shopping_stops,
+            route=route_steps,
+            total_distance=round(total_distance, 2),
+            estimated_time_minutes=round(estimated_time_minutes, 2),
+            solver=solver,
+            unrouted_product_ids=unrouted
+        )
+    
     def get_store_map(self) -> dict:
         """
         Get store map configuration
@@ -163,3 +477,29 @@ class NavigationService:
 
 # Global navigation service instance
 navigation_service = NavigationService()
+
+
+@event.listens_for(Aisle, "after_insert")
+@event.listens_for(Aisle, "after_update")
+@event.listens_for(Aisle, "after_delete")
+def _collect_layout_change(mapper, connection, target):
+    """
+    Note layout writes; the routing tables are dropped once the transaction
+    commits, so a request in between cannot rebuild them from the old rows
+    """
+    session = object_session(target)
+    if session is not None:
+        session.info["layout_changed"] = True
+    else:
+        navigation_service.invalidate_layout()
+
+
+@event.listens_for(Session, "after_commit")
+def _reload_layout_after_commit(session):
+    if session.info.pop("layout_changed", False):
+        navigation_service.invalidate_layout()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_layout_change(session):
+    session.info.pop("layout_changed", None)
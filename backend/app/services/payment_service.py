@@ -2,18 +2,31 @@
 Payment Simulation Service
 Handles payment processing, QR code generation, and receipts
 """
-import qrcode
-import io
-import base64
 import uuid
 import json
-from typing import Optional
-from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from datetime import datetime
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.models.cart import Cart, CartStatus
+from app.models.loading import CART_WITH_ITEMS, CART_WITH_PRODUCTS
 from app.models.transaction import Transaction, TransactionItem, TransactionStatus, PaymentMethod
 from app.models.product import Product
+from app.schemas.billing import BillCalculation
 from app.schemas.payment import QRCodeResponse, PaymentResponse
+from app.services.analytics_service import analytics_rollups
+from app.services.billing_service import BillingService
+from app.services.catalog_cache_service import catalog_cache
+from app.services.cooccurrence_service import cooccurrence_index
+from app.cpu_tasks import build_receipt
+from app.services.executor_service import executor_service
+from app.services.qr_service import PaymentClaims, payment_qr_service
+
+
+class CheckoutConflictError(ValueError):
+    """The cart was already paid, or changed while being checked out"""
 
 
 class PaymentService:
@@ -22,56 +35,32 @@ class PaymentService:
     def generate_payment_qr(
         self,
         db: Session,
-        cart_id: int
+        cart_id: int,
+        fmt: str = "png"
     ) -> QRCodeResponse:
         """
-        Generate payment QR code for cart
+        Generate payment QR code for cart (PNG, SVG or module matrix),
+        reusing the cached code while the cart total is unchanged. The amount
+        is recomputed from the lines, as checkout does, so the token's amount
+        claim matches the total it will be checked against.
         """
-        cart = db.query(Cart).filter(Cart.id == cart_id).first()
+        cart = db.query(Cart).options(*CART_WITH_ITEMS).filter(Cart.id == cart_id).first()
         if not cart:
             raise ValueError(f"Cart {cart_id} not found")
         
         if cart.status != CartStatus.ACTIVE:
             raise ValueError(f"Cart {cart_id} is not active")
         
-        # Generate payment reference
-        payment_reference = f"PAY-{uuid.uuid4().hex[:8].upper()}"
-        
-        # Create payment data
-        payment_data = {
-            "cart_id": cart_id,
-            "session_id": cart.session_id,
-            "amount": cart.final_amount,
-            "reference": payment_reference,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        
-        # Generate QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(json.dumps(payment_data))
-        qr.make(fit=True)
-        
-        # Create QR code image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert to base64
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-        
-        # QR code expires in 10 minutes
-        expires_at = datetime.utcnow() + timedelta(minutes=10)
+        amount = BillingService.calculate_cart_total(cart).final_amount
+        payment_reference, rendered = payment_qr_service.issue(cart_id, amount, fmt)
         
         return QRCodeResponse(
-            qr_code_data=img_str,
+            qr_code_data=rendered.data,
             payment_reference=payment_reference,
-            amount=cart.final_amount,
-            expires_at=expires_at
+            amount=amount,
+            expires_at=rendered.expires_at,
+            format=fmt,
+            payment_token=rendered.token
         )
     
     def process_payment(
@@ -79,64 +68,160 @@ class PaymentService:
         db: Session,
         cart_id: int,
         payment_method: str,
-        payment_reference: Optional[str] = None
+        payment_reference: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        payment_claims: Optional[PaymentClaims] = None
     ) -> PaymentResponse:
         """
-        Process payment for cart (simulated)
+        Check out a cart (simulated payment) in one database transaction.
+        The cart is claimed with a compare-and-set on (status, version), so of
+        several concurrent requests exactly one pays; a retry carrying the
+        same idempotency key gets the original transaction back. A payment
+        made with a QR token (payment_claims, already verified) is refused
+        unless the token's amount is the cart total.
         """
-        cart = db.query(Cart).filter(Cart.id == cart_id).first()
+        if idempotency_key:
+            replay = self._replay(db, cart_id, idempotency_key)
+            if replay:
+                return replay
+        
+        cart = db.query(Cart).options(*CART_WITH_PRODUCTS).filter(Cart.id == cart_id).first()
         if not cart:
             raise ValueError(f"Cart {cart_id} not found")
         
         if cart.status != CartStatus.ACTIVE:
-            raise ValueError(f"Cart {cart_id} is not active")
+            raise CheckoutConflictError(f"Cart {cart_id} is not active")
         
-        if cart.final_amount <= 0:
+        # Reconcile incremental totals from the lines just loaded
+        calculation = BillingService.calculate_cart_total(cart)
+        if calculation.final_amount <= 0:
             raise ValueError("Cart total is zero")
         
-        # Generate transaction ID
-        transaction_id = f"TXN-{uuid.uuid4().hex[:12].upper()}"
+        if payment_claims:
+            if round(payment_claims.amount * 100) != round(calculation.final_amount * 100):
+                raise CheckoutConflictError(
+                    f"Payment token is for {payment_claims.amount:.2f} but the cart total is "
+                    f"{calculation.final_amount:.2f}; generate a new payment QR"
+                )
+            payment_reference = payment_reference or payment_claims.reference
+        
+        completed_at = datetime.utcnow()
+        claimed = db.execute(
+            update(Cart).where(
+                Cart.id == cart_id,
+                Cart.status == CartStatus.ACTIVE,
+                Cart.version == cart.version
+            ).values(
+                status=CartStatus.PAID,
+                paid_at=completed_at,
+                total_amount=calculation.subtotal,
+                tax_amount=calculation.tax_amount,
+                discount_amount=calculation.discount_amount,
+                final_amount=calculation.final_amount,
+                item_count=calculation.item_count,
+                version=Cart.version + 1
+            ).execution_options(synchronize_session=False)
+        )
+        if claimed.rowcount != 1:
+            # Paid by a concurrent request, or changed since it was priced
+            db.rollback()
+            return self._conflict(db, cart_id, idempotency_key)
         
         # Create transaction
         transaction = Transaction(
             cart_id=cart_id,
-            transaction_id=transaction_id,
+            transaction_id=f"TXN-{uuid.uuid4().hex[:12].upper()}",
             payment_method=PaymentMethod(payment_method),
-            amount=cart.final_amount,
+            amount=calculation.final_amount,
             status=TransactionStatus.COMPLETED,  # Simulated - always succeeds
             payment_reference=payment_reference or f"REF-{uuid.uuid4().hex[:8].upper()}",
-            completed_at=datetime.utcnow()
+            completed_at=completed_at,
+            idempotency_key=idempotency_key
         )
         
-        # Create transaction items
+        quantities: Dict[int, int] = {}
         for cart_item in cart.items:
-            transaction_item = TransactionItem(
-                transaction_id=transaction.id,
+            transaction.items.append(TransactionItem(
                 product_id=cart_item.product_id,
                 quantity=cart_item.quantity,
                 unit_price=cart_item.unit_price,
                 tax_rate=cart_item.tax_rate,
                 subtotal=cart_item.subtotal
-            )
-            transaction.items.append(transaction_item)
-        
-        # Generate receipt
-        receipt_data = self._generate_receipt(cart, transaction)
-        transaction.receipt_data = json.dumps(receipt_data)
+            ))
+            quantities[cart_item.product_id] = quantities.get(cart_item.product_id, 0) + cart_item.quantity
         
+        # Receipt from the cart lines (and products) already loaded
+        receipt_data, transaction.receipt_data = self._generate_receipt(cart, transaction, calculation)
         db.add(transaction)
         
-        # Update cart status
-        cart.status = CartStatus.PAID
-        cart.paid_at = datetime.utcnow()
+        self._decrement_stock(db, quantities)
+        
+        # Roll the sale into the dashboard aggregates in the same commit
+        analytics_rollups.record_transaction(db, transaction)
+        
+        try:
+            db.commit()
+        except IntegrityError:
+            # The idempotency key was taken by a concurrent request
+            db.rollback()
+            return self._conflict(db, cart_id, idempotency_key)
         
-        db.commit()
-        db.refresh(transaction)
+        analytics_rollups.invalidate()
+        payment_qr_service.invalidate(cart_id)
+        for product_id in quantities:
+            catalog_cache.invalidate(product_id)
         
+        # Feed the basket into the frequently-bought-together index
+        cooccurrence_index.record_transaction(transaction.id, quantities.keys())
+        
+        return self._payment_response(transaction, receipt_data)
+    
+    def _replay(self, db: Session, cart_id: int, idempotency_key: str) -> Optional[PaymentResponse]:
+        """
+        The response of an earlier checkout made with this idempotency key
+        """
+        transaction = db.query(Transaction).filter(
+            Transaction.idempotency_key == idempotency_key
+        ).first()
+        if not transaction:
+            return None
+        
+        if transaction.cart_id != cart_id:
+            raise CheckoutConflictError("Idempotency key was used for another cart")
+        receipt_data = json.loads(transaction.receipt_data) if transaction.receipt_data else None
+        return self._payment_response(transaction, receipt_data)
+    
+    def _conflict(self, db: Session, cart_id: int, idempotency_key: Optional[str]) -> PaymentResponse:
+        """
+        Resolve a lost checkout race: replay the winner if it carried the same
+        idempotency key, otherwise report the conflict
+        """
+        if idempotency_key:
+            replay = self._replay(db, cart_id, idempotency_key)
+            if replay:
+                return replay
+        raise CheckoutConflictError(f"Cart {cart_id} was paid or changed by another request")
+    
+    @staticmethod
+    def _decrement_stock(db: Session, quantities: Dict[int, int]):
+        """
+        Take the sold quantities off stock in a single UPDATE ... CASE
+        """
+        if not quantities:
+            return
+        
+        db.execute(
+            update(Product).where(Product.id.in_(quantities.keys())).values(
+                stock_quantity=Product.stock_quantity - case(quantities, value=Product.id, else_=0)
+            ).execution_options(synchronize_session=False)
+        )
+    
+    @staticmethod
+    def _payment_response(transaction: Transaction, receipt_data: dict) -> PaymentResponse:
         return PaymentResponse(
             transaction_id=transaction.transaction_id,
-            cart_id=cart_id,
-            payment_method=payment_method,
+            cart_id=transaction.cart_id,
+            payment_method=transaction.payment_method.value,
             amount=transaction.amount,
             status=transaction.status.value,
             payment_reference=transaction.payment_reference,
@@ -144,33 +229,36 @@ class PaymentService:
             completed_at=transaction.completed_at
         )
     
-    def _generate_receipt(self, cart: Cart, transaction: Transaction) -> dict:
+    def _generate_receipt(
+        self,
+        cart: Cart,
+        transaction: Transaction,
+        calculation: BillCalculation
+    ) -> Tuple[dict, str]:
         """
-        Generate receipt data
+        Generate receipt data and its JSON; large baskets are encoded in the
+        CPU executor
         """
-        receipt = {
+        header = {
             "transaction_id": transaction.transaction_id,
             "session_id": cart.session_id,
             "date": transaction.completed_at.isoformat() if transaction.completed_at else datetime.utcnow().isoformat(),
             "items": [],
-            "subtotal": cart.total_amount,
-            "tax": cart.tax_amount,
-            "discount": cart.discount_amount,
-            "total": cart.final_amount,
+            "subtotal": calculation.subtotal,
+            "tax": calculation.tax_amount,
+            "discount": calculation.discount_amount,
+            "total": calculation.final_amount,
             "payment_method": transaction.payment_method.value,
             "payment_reference": transaction.payment_reference
         }
+        lines = [
+            (item.product.name, item.quantity, item.unit_price, item.tax_rate, item.subtotal)
+            for item in cart.items
+        ]
         
-        for item in transaction.items:
-            receipt["items"].append({
-                "product_name": item.product.name,
-                "quantity": item.quantity,
-                "unit_price": item.unit_price,
-                "tax_rate": item.tax_rate,
-                "subtotal": item.subtotal
-            })
-        
-        return receipt
+        if len(lines) >= settings.RECEIPT_OFFLOAD_MIN_LINES:
+            return executor_service.run_cpu(build_receipt, header, lines, name="receipt")
+        return build_receipt(header, lines)
 
 
 # Global payment service instance
@@ -0,0 +1,199 @@
+"""
+Payment QR Service
+Encodes payments as short signed tokens and renders them as PNG, SVG or a raw
+module matrix. Tokens use only QR alphanumeric characters, so they fit a much
+lower QR version than the old JSON payload. A cart keeps its payment reference
+while its total is unchanged, and renders are cached until the QR expires, so
+refreshing the pay screen does no encoding work.
+"""
+import base64
+import hashlib
+import hmac
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+from app.config import settings
+from app.cpu_tasks import render_qr
+from app.services.executor_service import executor_service
+
+TOKEN_PREFIX = "P1:"
+SIGNATURE_BYTES = 10  # 80-bit HMAC-SHA256 prefix, 16 base32 characters
+QR_FORMATS = ("png", "svg", "matrix")
+
+_BASE36 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+class PaymentClaims(NamedTuple):
+    """What a verified payment token says"""
+    cart_id: int
+    amount: float
+    reference: str
+    expires_at: datetime
+
+
+class RenderedQR(NamedTuple):
+    token: str
+    data: str
+    expires_at: datetime
+
+
+def _base36(value: int) -> str:
+    digits = ""
+    while True:
+        value, digit = divmod(value, 36)
+        digits = _BASE36[digit] + digits
+        if not value:
+            return digits
+
+
+def _sign(body: str) -> str:
+    digest = hmac.new(settings.SECRET_KEY.encode(), body.encode(), hashlib.sha256).digest()
+    return base64.b32encode(digest[:SIGNATURE_BYTES]).decode()
+
+
+def encode_token(cart_id: int, amount: float, reference: str, expires_at: datetime) -> str:
+    """
+    P1:<cart>.<cents>.<expiry epoch>.<reference>.<signature>, numbers in
+    base 36; e.g. P1:3F.2N9.SJ0Q7C.PAY-1A2B3C4D.MZXW6YTBOI3DEMRR
+    """
+    expires = int((expires_at - datetime(1970, 1, 1)).total_seconds())
+    body = f"{_base36(cart_id)}.{_base36(round(amount * 100))}.{_base36(expires)}.{reference}"
+    return f"{TOKEN_PREFIX}{body}.{_sign(body)}"
+
+
+def decode_token(token: str, now: Optional[datetime] = None) -> PaymentClaims:
+    """
+    Verify a token's signature and expiry and return its claims
+    """
+    if not token.startswith(TOKEN_PREFIX):
+        raise ValueError("Not a payment token")
+    body, _, signature = token[len(TOKEN_PREFIX):].rpartition(".")
+    if not hmac.compare_digest(signature, _sign(body)):
+        raise ValueError("Invalid payment token signature")
+    
+    try:
+        cart_id, cents, expires, reference = body.split(".", 3)
+        claims = PaymentClaims(
+            cart_id=int(cart_id, 36),
+            amount=int(cents, 36) / 100.0,
+            reference=reference,
+            expires_at=datetime(1970, 1, 1) + timedelta(seconds=int(expires, 36))
+        )
+    except ValueError:
+        raise ValueError("Malformed payment token")
+    
+    if claims.expires_at <= (now or datetime.utcnow()):
+        raise ValueError("Payment token has expired")
+    return claims
+
+
+class ExpiringLRU:
+    """LRU map whose entries also lapse at their own expiry time"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[datetime, Any]]" = OrderedDict()
+    
+    def get(self, key: Hashable, now: datetime) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+    
+    def put(self, key: Hashable, value: Any, expires_at: datetime):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def pop(self, key: Hashable):
+        self._entries.pop(key, None)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PaymentQRService:
+    """Issues, caches and verifies payment QR codes"""
+    
+    def __init__(self, max_entries: Optional[int] = None):
+        max_entries = max_entries or settings.PAYMENT_QR_CACHE_SIZE
+        self._lock = threading.Lock()
+        # cart_id -> (amount, reference, expires_at) of the outstanding QR
+        self._references = ExpiringLRU(max_entries)
+        # (cart_id, amount, reference, format) -> RenderedQR
+        self._renders = ExpiringLRU(max_entries)
+        self.hits = 0
+        self.misses = 0
+    
+    def issue(self, cart_id: int, amount: float, fmt: str = "png") -> Tuple[str, RenderedQR]:
+        """
+        (payment reference, rendered QR) for a cart's current total. The
+        reference and render are reused until the QR is close to expiry or
+        the total changes.
+        """
+        if fmt not in QR_FORMATS:
+            raise ValueError(f"Unknown QR format: {fmt}")
+        
+        now = datetime.utcnow()
+        # Only reuse a QR with enough life left to be scanned
+        fresh_until = now + timedelta(seconds=settings.PAYMENT_QR_REFRESH_MARGIN_SECONDS)
+        with self._lock:
+            outstanding = self._references.get(cart_id, fresh_until)
+            if outstanding and outstanding[0] == amount:
+                reference, expires_at = outstanding[1], outstanding[2]
+            else:
+                reference = f"PAY-{uuid.uuid4().hex[:8].upper()}"
+                expires_at = now + timedelta(seconds=settings.PAYMENT_QR_TTL_SECONDS)
+                self._references.put(cart_id, (amount, reference, expires_at), expires_at)
+            
+            key = (cart_id, amount, reference, fmt)
+            rendered = self._renders.get(key, fresh_until)
+            if rendered:
+                self.hits += 1
+                return reference, rendered
+            self.misses += 1
+        
+        # Render in the CPU executor, outside the lock; a concurrent miss on
+        # the same key just renders the same image twice
+        token = encode_token(cart_id, amount, reference, expires_at)
+        data = executor_service.run_cpu(
+            render_qr, token, fmt, settings.PAYMENT_QR_BOX_SIZE, name=f"qr_render_{fmt}"
+        )
+        rendered = RenderedQR(token=token, data=data, expires_at=expires_at)
+        with self._lock:
+            self._renders.put(key, rendered, expires_at)
+        return reference, rendered
+    
+    def verify(self, token: str, cart_id: int) -> PaymentClaims:
+        """
+        Check a scanned token is genuine, unexpired and for this cart
+        """
+        claims = decode_token(token)
+        if claims.cart_id != cart_id:
+            raise ValueError("Payment token is for another cart")
+        return claims
+    
+    def invalidate(self, cart_id: int):
+        """Forget a cart's outstanding QR (it was paid or abandoned)"""
+        with self._lock:
+            self._references.pop(cart_id)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._renders),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Global payment QR service instance
+payment_qr_service = PaymentQRService()
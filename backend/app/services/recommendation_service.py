@@ -4,12 +4,13 @@ Handles product recommendations based on market basket analysis
 """
 from typing import List
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import and_
 from app.models.cart import Cart, CartItem
 from app.models.product import Product
 from app.models.recommendation import ProductRecommendation
-from app.models.transaction import Transaction, TransactionItem
 from app.schemas.recommendation import RecommendationResponse, RecommendationItem
+from app.services.catalog_cache_service import catalog_cache
+from app.services.cooccurrence_service import cooccurrence_index
 
 
 class RecommendationService:
@@ -83,48 +84,24 @@ class RecommendationService:
     ) -> List[RecommendationItem]:
         """
         Market basket analysis: Find products frequently bought with cart items
+        using the precomputed co-occurrence index (support/confidence/lift)
         """
+        cooccurrence_index.ensure_built(db)
+        
         recommendations = []
+        for candidate in cooccurrence_index.recommend(product_ids, limit * 2):
+            product = catalog_cache.get_by_id(db, candidate["product_id"])
+            if product and product.is_active:
+                recommendations.append(RecommendationItem(
+                    product=product,
+                    confidence_score=round(min(candidate["confidence"], 1.0), 4),
+                    recommendation_type="frequently_bought_together",
+                    reason=f"Frequently purchased with items in your cart (lift {candidate['lift']:.1f})"
+                ))
+                if len(recommendations) >= limit:
+                    break
         
-        # Query: Find products that appear in transactions with our cart products
-        # This is a simplified version - in production, use proper association rules
-        
-        for product_id in product_ids[:3]:  # Limit to first 3 products for performance
-            # Find transactions containing this product
-            transactions_with_product = db.query(TransactionItem.transaction_id).filter(
-                TransactionItem.product_id == product_id
-            ).subquery()
-            
-            # Find other products in those transactions
-            co_occurring = db.query(
-                TransactionItem.product_id,
-                func.count(TransactionItem.product_id).label('frequency')
-            ).filter(
-                and_(
-                    TransactionItem.transaction_id.in_(transactions_with_product),
-                    TransactionItem.product_id.notin_(product_ids)
-                )
-            ).group_by(TransactionItem.product_id).order_by(
-                func.count(TransactionItem.product_id).desc()
-            ).limit(limit).all()
-            
-            for product_id_result, frequency in co_occurring:
-                product = db.query(Product).filter(Product.id == product_id_result).first()
-                if product and product.is_active:
-                    # Calculate confidence based on frequency
-                    confidence = min(frequency / 10.0, 1.0)  # Normalize
-                    
-                    recommendations.append(RecommendationItem(
-                        product=product,
-                        confidence_score=confidence,
-                        recommendation_type="frequently_bought_together",
-                        reason=f"Frequently purchased with {product.name}"
-                    ))
-        
-        # Sort by confidence
-        recommendations.sort(key=lambda x: x.confidence_score, reverse=True)
-        
-        return recommendations[:limit]
+        return recommendations
     
     def _get_similar_category_products(
         self,
@@ -169,19 +146,15 @@ class RecommendationService:
         limit: int
     ) -> RecommendationResponse:
         """
-        Get most popular products (by transaction frequency)
+        Get most popular products (by transaction frequency), counted by the
+        co-occurrence index instead of grouping transaction_items
         """
-        # Find most purchased products
-        popular = db.query(
-            TransactionItem.product_id,
-            func.count(TransactionItem.product_id).label('purchase_count')
-        ).group_by(TransactionItem.product_id).order_by(
-            func.count(TransactionItem.product_id).desc()
-        ).limit(limit).all()
+        cooccurrence_index.ensure_built(db)
+        popular = cooccurrence_index.popular(limit)
         
         recommendations = []
         for product_id, count in popular:
-            product = db.query(Product).filter(Product.id == product_id).first()
+            product = catalog_cache.get_by_id(db, product_id)
             if product and product.is_active:
                 confidence = min(count / 50.0, 1.0)  # Normalize
                 recommendations.append(RecommendationItem(
@@ -0,0 +1,210 @@
+"""
+Product Search Index Service
+In-memory trigram inverted index over product names, categories, SKUs and
+barcodes with prefix and typo-tolerant matching and relevance ranking
+"""
+import re
+import threading
+from typing import Dict, List, Optional, Set
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models.product import Product
+from app.services.catalog_cache_service import catalog_cache, ProductRecord
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def word_trigrams(word: str, prefix: bool = False) -> List[str]:
+    """
+    Trigrams of a word padded with two leading blanks. Indexed words also get
+    a trailing blank; query words do not, so a partial word matches as a prefix.
+    """
+    padded = f"  {word}" if prefix else f"  {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class ProductSearchIndex:
+    """
+    Trigram -> posting list of document slots. Postings are compacted into
+    NumPy arrays so scoring a query term is a single bincount over the catalog.
+    Whole words get their own postings, so a product containing a query term
+    as a complete word ranks above one that merely shares its trigrams.
+    """
+    MIN_TERM_SCORE = 0.5  # Fraction of a term's trigrams a product must contain
+    EXACT_WORD_BONUS = 0.25
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+    
+    def _reset(self):
+        self._frozen: Dict[str, np.ndarray] = {}  # compacted postings
+        self._delta: Dict[str, List[int]] = {}  # postings added since last compaction
+        self._words: Dict[str, List[int]] = {}  # whole word -> slots containing it
+        self._slot_product: List[int] = []  # slot -> product id
+        self._product_slot: Dict[int, int] = {}  # product id -> live slot
+        self._deleted: Set[int] = set()  # slots of removed or re-indexed products
+        self._pending: Set[int] = set()  # product ids changed since last sync
+        self.built = False
+    
+    def _add(self, product_id: int, *fields: Optional[str]):
+        slot = len(self._slot_product)
+        self._slot_product.append(product_id)
+        self._product_slot[product_id] = slot
+        
+        words = set()
+        for field in fields:
+            words.update(WORD_PATTERN.findall((field or "").lower()))
+        grams = set()
+        for word in words:
+            grams.update(word_trigrams(word))
+            self._words.setdefault(word, []).append(slot)
+        for gram in grams:
+            self._delta.setdefault(gram, []).append(slot)
+    
+    def _remove(self, product_id: int):
+        slot = self._product_slot.pop(product_id, None)
+        if slot is not None:
+            self._deleted.add(slot)
+    
+    def _postings(self, gram: str) -> Optional[np.ndarray]:
+        delta = self._delta.pop(gram, None)
+        if delta:
+            frozen = self._frozen.get(gram)
+            added = np.array(delta, dtype=np.int32)
+            self._frozen[gram] = added if frozen is None else np.concatenate([frozen, added])
+        return self._frozen.get(gram)
+    
+    def build(self, db: Session):
+        """
+        Index every active product
+        """
+        rows = db.query(
+            Product.id, Product.name, Product.category, Product.sku, Product.barcode
+        ).filter(Product.is_active == True).all()
+        self.load_rows(rows)
+    
+    def load_rows(self, rows):
+        """
+        Replace the index with (id, name, category, sku, barcode) rows
+        """
+        with self._lock:
+            self._reset()
+            for product_id, name, category, sku, barcode in rows:
+                self._add(product_id, name, category, sku, barcode)
+            for gram in list(self._delta):
+                self._postings(gram)
+            self.built = True
+    
+    def mark_changed(self, product_id: int):
+        """Queue a product to be re-indexed before the next search"""
+        self._pending.add(product_id)
+    
+    def _sync(self, db: Session):
+        """
+        Apply queued product changes, rebuilding once too many slots are dead
+        """
+        if not self.built:
+            self.build(db)
+            return
+        if not self._pending:
+            return
+        
+        with self._lock:
+            product_ids, self._pending = self._pending, set()
+            rows = db.query(
+                Product.id, Product.name, Product.category, Product.sku, Product.barcode
+            ).filter(Product.id.in_(product_ids), Product.is_active == True).all()
+            
+            for product_id in product_ids:
+                self._remove(product_id)
+            for product_id, name, category, sku, barcode in rows:
+                self._add(product_id, name, category, sku, barcode)
+        
+        if len(self._deleted) > max(1000, len(self._slot_product) // 5):
+            self.build(db)
+    
+    def _exact_code_match(self, db: Session, query: str) -> Optional[ProductRecord]:
+        """
+        Barcodes and SKUs are single tokens containing a digit; resolve them
+        through the unique indexes instead of the trigram index
+        """
+        if " " in query or not any(ch.isdigit() for ch in query):
+            return None
+        product = (
+            catalog_cache.get_by_barcode(db, query) or
+            catalog_cache.get_by_sku(db, query) or
+            (catalog_cache.get_by_sku(db, query.upper()) if query != query.upper() else None)
+        )
+        if product and product.is_active:
+            return product
+        return None
+    
+    def search_ids(self, terms: List[str], limit: int) -> List[int]:
+        """
+        Rank products for already-normalized query terms
+        """
+        with self._lock:
+            size = len(self._slot_product)
+            if not terms or not size:
+                return []
+            
+            total = np.zeros(size)
+            matched = np.ones(size, dtype=bool)
+            for term in terms:
+                grams = word_trigrams(term, prefix=True)
+                postings = [p for p in (self._postings(gram) for gram in grams) if p is not None]
+                if not postings:
+                    return []
+                hits = np.bincount(np.concatenate(postings), minlength=size) / len(grams)
+                # Short terms must match as an exact prefix
+                matched &= hits >= (1.0 if len(term) <= 2 else self.MIN_TERM_SCORE)
+                total += hits
+                
+                exact = self._words.get(term)
+                if exact:
+                    total[exact] += self.EXACT_WORD_BONUS
+            
+            if self._deleted:
+                matched[np.fromiter(self._deleted, dtype=np.int64)] = False
+            
+            candidates = np.flatnonzero(matched)
+            if len(candidates) > limit:
+                top = np.argpartition(-total[candidates], limit - 1)[:limit]
+                candidates = candidates[top]
+            ranked = candidates[np.argsort(-total[candidates], kind="stable")]
+            
+            return [self._slot_product[slot] for slot in ranked]
+    
+    def search(self, db: Session, query: str, limit: int = 10) -> List[ProductRecord]:
+        """
+        Search products by name, category, SKU or barcode
+        """
+        query = query.strip()
+        if not query:
+            return []
+        
+        exact = self._exact_code_match(db, query)
+        if exact:
+            return [exact]
+        
+        self._sync(db)
+        results = []
+        for product_id in self.search_ids(WORD_PATTERN.findall(query.lower()), limit):
+            product = catalog_cache.get_by_id(db, product_id)
+            if product:
+                results.append(product)
+        return results
+
+
+# Global product search index instance
+product_search_index = ProductSearchIndex()
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+@event.listens_for(Product, "after_delete")
+def _reindex_product(mapper, connection, target):
+    """Keep the search index in sync with product writes made through the ORM"""
+    product_search_index.mark_changed(target.id)
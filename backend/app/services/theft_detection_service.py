@@ -2,147 +2,60 @@
 Theft Detection Service
 Monitors cart for suspicious activities and triggers alerts
 """
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
 from app.models.cart import Cart, CartItem
-from app.models.alert import Alert, AlertType, AlertSeverity, AlertStatus
-from app.models.product import Product
+from app.models.alert import Alert, AlertStatus
+from app.schemas.ai import AIVerificationResponse
 from app.services.ai_service import ai_service
-from typing import List, Optional
+from app.services.alert_sink import alert_sink
+from app.services.iot_service import iot_service
+from app.services.theft_rules import CartSnapshot, TheftRulesEngine
+from typing import Optional, Tuple
 
 
 class TheftDetectionService:
-    """Service for detecting theft and suspicious activities"""
+    """
+    Service for detecting theft and suspicious activities. Once started,
+    rules are evaluated incrementally as cart events arrive over IoT rather
+    than by rescanning carts, and raised alerts go to the write-behind sink.
+    """
     
-    def check_cart_for_theft(
-        self,
-        db: Session,
-        cart: Cart,
-        detected_objects: Optional[List[dict]] = None
-    ) -> List[Alert]:
-        """
-        Comprehensive theft detection check
-        Returns list of alerts if any suspicious activity detected
-        """
-        alerts = []
-        
-        # 1. Check for unscanned items (camera detected but no scan)
-        unscanned_alerts = self._check_unscanned_items(db, cart, detected_objects)
-        alerts.extend(unscanned_alerts)
-        
-        # 2. Check for scan-remove mismatch
-        mismatch_alerts = self._check_scan_remove_mismatch(db, cart)
-        alerts.extend(mismatch_alerts)
-        
-        # 3. Check for AI verification failures
-        ai_alerts = self._check_ai_verification_failures(db, cart)
-        alerts.extend(ai_alerts)
-        
-        # Update cart alert status
-        if alerts:
-            cart.has_alert = True
-            cart.alert_reason = "; ".join([alert.message for alert in alerts[:3]])
-            db.commit()
-        
-        return alerts
+    EVENT_TOPIC = "cart/#"
     
-    def _check_unscanned_items(
-        self,
-        db: Session,
-        cart: Cart,
-        detected_objects: Optional[List[dict]]
-    ) -> List[Alert]:
-        """
-        Check if camera detected items that weren't scanned
-        """
-        alerts = []
-        
-        if not detected_objects:
-            return alerts
-        
-        # Get scanned product IDs
-        scanned_product_ids = {item.product_id for item in cart.items if item.scan_verified}
-        
-        # Check if detected objects match scanned items
-        # This is simplified - in production, use proper object matching
-        detected_count = len(detected_objects)
-        scanned_count = len(scanned_product_ids)
-        
-        if detected_count > scanned_count:
-            # More items detected than scanned
-            alert = Alert(
-                cart_id=cart.id,
-                alert_type=AlertType.UNSCANNED_ITEM,
-                severity=AlertSeverity.HIGH,
-                status=AlertStatus.PENDING,
-                message=f"Detected {detected_count} items but only {scanned_count} scanned",
-                details={"detected_count": detected_count, "scanned_count": scanned_count}
-            )
-            db.add(alert)
-            alerts.append(alert)
-        
-        return alerts
+    def __init__(self):
+        self.rules = TheftRulesEngine(
+            alert_sink.submit, max_carts=settings.THEFT_RULES_MAX_CARTS, load_cart=self.load_cart_snapshot
+        )
     
-    def _check_scan_remove_mismatch(
-        self,
-        db: Session,
-        cart: Cart
-    ) -> List[Alert]:
-        """
-        Check if items were removed without proper scan removal
-        """
-        alerts = []
-        
-        # Check for items marked as removed but still in cart
-        # This would require a removal log - simplified for demo
-        
-        # Check for items with scan_verified=False but in cart
-        unverified_items = [item for item in cart.items if not item.scan_verified]
-        
-        if unverified_items:
-            alert = Alert(
-                cart_id=cart.id,
-                alert_type=AlertType.MISMATCH_DETECTED,
-                severity=AlertSeverity.MEDIUM,
-                status=AlertStatus.PENDING,
-                message=f"{len(unverified_items)} items in cart without scan verification",
-                details={"unverified_count": len(unverified_items)}
-            )
-            db.add(alert)
-            alerts.append(alert)
-        
-        return alerts
+    def start(self):
+        """Subscribe the rules engine to cart events (application startup)"""
+        iot_service.subscribe(self.EVENT_TOPIC, self.rules.handle)
     
-    def _check_ai_verification_failures(
-        self,
-        db: Session,
-        cart: Cart
-    ) -> List[Alert]:
+    def stop(self):
+        iot_service.unsubscribe(self.EVENT_TOPIC, self.rules.handle)
+    
+    def load_cart_snapshot(self, cart_id: int) -> Optional[CartSnapshot]:
         """
-        Check for AI verification failures
+        Scanned quantity and failed AI verifications of a cart as stored,
+        for a cart the rules engine has no state for (restart, eviction)
         """
-        alerts = []
-        
-        # Check items that failed AI verification
-        failed_items = [
-            item for item in cart.items
-            if item.verified_by_ai == False and item.scan_verified == True
-        ]
-        
-        if failed_items:
-            for item in failed_items:
-                alert = Alert(
-                    cart_id=cart.id,
-                    product_id=item.product_id,
-                    alert_type=AlertType.AI_VERIFICATION_FAILED,
-                    severity=AlertSeverity.MEDIUM,
-                    status=AlertStatus.PENDING,
-                    message=f"AI verification failed for {item.product.name}",
-                    details={"cart_item_id": item.id, "product_id": item.product_id}
-                )
-                db.add(alert)
-                alerts.append(alert)
-        
-        return alerts
+        try:
+            with SessionLocal() as db:
+                item_count = db.scalar(select(Cart.item_count).where(Cart.id == cart_id))
+                failed_products = db.scalars(
+                    select(CartItem.product_id).where(
+                        CartItem.cart_id == cart_id,
+                        CartItem.verified_by_ai == False,
+                        CartItem.scan_verified == True
+                    )
+                ).all()
+        except Exception as e:
+            print(f"⚠️  Could not load cart {cart_id} for theft rules: {e}")
+            return None
+        return CartSnapshot(item_count, failed_products)
     
     def verify_item_with_ai(
         self,
@@ -150,9 +63,10 @@ class TheftDetectionService:
         cart: Cart,
         cart_item_id: int,
         image_data: Optional[str] = None
-    ) -> tuple[bool, Optional[Alert]]:
+    ) -> Tuple[bool, Optional[AIVerificationResponse]]:
         """
-        Verify a cart item using AI and create alert if mismatch
+        Verify a cart item using AI. A failure reaches the rules engine as a
+        verification event, which raises the alert.
         """
         cart_item = next((item for item in cart.items if item.id == cart_item_id), None)
         if not cart_item:
@@ -168,25 +82,12 @@ class TheftDetectionService:
         cart_item.verified_by_ai = verification.verified
         db.commit()
         
-        # Create alert if verification failed
-        alert = None
-        if not verification.verified:
-            alert = Alert(
-                cart_id=cart.id,
-                product_id=cart_item.product_id,
-                alert_type=AlertType.AI_VERIFICATION_FAILED,
-                severity=AlertSeverity.HIGH,
-                status=AlertStatus.PENDING,
-                message=verification.message,
-                details={
-                    "confidence": verification.confidence,
-                    "match_score": verification.match_score
-                }
-            )
-            db.add(alert)
-            db.commit()
+        iot_service.publish_verification_event(
+            cart.id, cart_item.product_id, verification.verified,
+            verification.message, verification.confidence, verification.match_score
+        )
         
-        return verification.verified, alert
+        return verification.verified, verification
     
     def resolve_alert(
         self,
@@ -216,6 +117,10 @@ class TheftDetectionService:
         db.refresh(alert)
         
         return alert
+    
+    def get_stats(self):
+        """Rules engine state and counters"""
+        return self.rules.get_stats()
 
 
 # Global theft detection service instance
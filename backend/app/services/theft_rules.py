@@ -0,0 +1,249 @@
+"""
+Theft Detection Rules Engine
+Keeps per-cart state from IoT cart events (scanned quantity, camera object
+counts, AI verification results, removals) and evaluates only the rules an event can
+affect, so each event costs O(1) however many carts or lines there are.
+An alert is raised once per (cart, type, product) key while its condition
+holds, and the key is released when the condition clears. A cart the engine
+has not seen (after a restart or an eviction) is seeded from its database
+row, and count rules stay quiet until its scanned quantity is known.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from app.models.alert import AlertType, AlertSeverity
+
+AlertKey = Tuple[int, AlertType, Optional[int]]
+
+
+class AlertSpec(NamedTuple):
+    """An alert the engine decided to raise, not yet persisted"""
+    cart_id: int
+    alert_type: AlertType
+    severity: AlertSeverity
+    message: str
+    product_id: Optional[int] = None
+    details: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None  # Set by the alert sink when submitted
+
+
+class CartSnapshot(NamedTuple):
+    """A cart as stored, to seed state for a cart the engine has not seen"""
+    item_count: Optional[int]
+    failed_products: Iterable[int]
+
+
+class CartRuleState:
+    """What the engine knows about one cart"""
+    __slots__ = ("cart_id", "item_count", "detected_count", "failed_products", "active")
+    
+    def __init__(self, cart_id: int, snapshot: Optional[CartSnapshot] = None):
+        self.cart_id = cart_id
+        # Scanned quantity, from the cart row and then cart updates; None until known
+        self.item_count: Optional[int] = snapshot.item_count if snapshot else None
+        self.detected_count: Optional[int] = None  # Objects in the latest camera frame
+        # Products whose last AI verification failed -> its message, confidence and match score
+        self.failed_products: Dict[int, Dict[str, Any]] = (
+            {product_id: {} for product_id in snapshot.failed_products} if snapshot else {}
+        )
+        self.active: Set[AlertKey] = set()  # Raised alerts whose condition still holds
+
+
+# A rule looks at a cart (and the triggering event's product, if any) and
+# returns the alert to hold, or None when its condition is clear
+RuleCheck = Callable[[CartRuleState, Optional[int]], Optional[AlertSpec]]
+
+
+class Rule(NamedTuple):
+    name: str
+    alert_type: AlertType
+    events: Tuple[str, ...]  # Event types that can change the outcome
+    check: RuleCheck
+    per_product: bool = False
+
+
+def _unscanned_items(state: CartRuleState, product_id: Optional[int]) -> Optional[AlertSpec]:
+    """The camera sees more items than were scanned"""
+    if state.detected_count is None or state.item_count is None or state.detected_count <= state.item_count:
+        return None
+    return AlertSpec(
+        state.cart_id,
+        AlertType.UNSCANNED_ITEM,
+        AlertSeverity.HIGH,
+        f"Detected {state.detected_count} items but only {state.item_count} scanned",
+        details={"detected_count": state.detected_count, "scanned_count": state.item_count}
+    )
+
+
+def _removal_without_scan(state: CartRuleState, product_id: Optional[int]) -> Optional[AlertSpec]:
+    """The camera sees fewer items than were scanned, and none were scanned out"""
+    if state.detected_count is None or state.item_count is None or state.detected_count >= state.item_count:
+        return None
+    return AlertSpec(
+        state.cart_id,
+        AlertType.REMOVAL_WITHOUT_SCAN,
+        AlertSeverity.MEDIUM,
+        f"{state.item_count - state.detected_count} scanned items no longer seen in cart",
+        details={"detected_count": state.detected_count, "scanned_count": state.item_count}
+    )
+
+
+def _ai_verification_failed(state: CartRuleState, product_id: Optional[int]) -> Optional[AlertSpec]:
+    """The last AI verification of a product in the cart failed"""
+    verification = state.failed_products.get(product_id)
+    if verification is None:
+        return None
+    return AlertSpec(
+        state.cart_id,
+        AlertType.AI_VERIFICATION_FAILED,
+        AlertSeverity.HIGH,
+        verification.get("message") or f"AI verification failed for product {product_id}",
+        product_id=product_id,
+        details={"confidence": verification.get("confidence"), "match_score": verification.get("match_score")}
+    )
+
+
+RULES = (
+    Rule("unscanned_items", AlertType.UNSCANNED_ITEM, ("camera_detection", "cart_updated"), _unscanned_items),
+    # Scans outpace the camera, so only a new frame can raise this
+    Rule("removal_without_scan", AlertType.REMOVAL_WITHOUT_SCAN, ("camera_detection",), _removal_without_scan),
+    Rule(
+        "ai_verification_failed", AlertType.AI_VERIFICATION_FAILED, ("item_verified", "item_removed"),
+        _ai_verification_failed, per_product=True
+    ),
+)
+
+# Events that change cart state; scans only matter through the cart update
+# that follows them
+EVENT_TYPES = ("item_removed", "camera_detection", "cart_updated", "item_verified")
+
+
+class TheftRulesEngine:
+    """
+    Applies cart events to per-cart state and raises deduplicated alerts.
+    raise_alerts(specs) is called with each event's new alerts, outside the
+    engine lock. load_cart(cart_id), if given, returns the stored snapshot
+    that seeds a cart's state on its first event; it is also called outside
+    the lock.
+    """
+    
+    def __init__(
+        self,
+        raise_alerts: Callable[[List[AlertSpec]], None],
+        rules: Iterable[Rule] = RULES,
+        max_carts: int = 10000,
+        load_cart: Optional[Callable[[int], Optional[CartSnapshot]]] = None
+    ):
+        self.raise_alerts = raise_alerts
+        self.load_cart = load_cart
+        self.rules = tuple(rules)
+        self.max_carts = max_carts
+        self._rules_by_event: Dict[str, List[Rule]] = {}
+        for rule in self.rules:
+            for event_type in rule.events:
+                self._rules_by_event.setdefault(event_type, []).append(rule)
+        self._carts: "OrderedDict[int, CartRuleState]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Metrics
+        self.events = 0
+        self.carts_seeded = 0
+        self.rule_evaluations = 0
+        self.alerts_raised = 0
+        self.alerts_suppressed = 0
+    
+    def _state(self, cart_id: int, snapshot: Optional[CartSnapshot] = None) -> CartRuleState:
+        state = self._carts.get(cart_id)
+        if state is None:
+            state = self._carts[cart_id] = CartRuleState(cart_id, snapshot)
+            if snapshot is not None:
+                self.carts_seeded += 1
+            if len(self._carts) > self.max_carts:
+                # Carts that went quiet without paying (abandoned)
+                self._carts.popitem(last=False)
+        else:
+            self._carts.move_to_end(cart_id)
+        return state
+    
+    def _apply(self, state: CartRuleState, event_type: str, payload: Dict[str, Any]) -> Optional[int]:
+        """Update state from one event; returns the product it concerns"""
+        product_id = payload.get("product_id")
+        if event_type == "item_removed":
+            state.failed_products.pop(product_id, None)
+        elif event_type == "camera_detection":
+            state.detected_count = payload.get("object_count", len(payload.get("detected_objects", [])))
+        elif event_type == "cart_updated":
+            state.item_count = payload.get("item_count") or 0
+        elif event_type == "item_verified":
+            if payload.get("verified"):
+                state.failed_products.pop(product_id, None)
+            else:
+                state.failed_products[product_id] = {
+                    "message": payload.get("message"),
+                    "confidence": payload.get("confidence"),
+                    "match_score": payload.get("match_score")
+                }
+        return product_id
+    
+    def _evaluate(self, state: CartRuleState, rules: Iterable[Rule], product_id: Optional[int]) -> List[AlertSpec]:
+        raised = []
+        for rule in rules:
+            if rule.per_product and product_id is None:
+                continue
+            self.rule_evaluations += 1
+            spec = rule.check(state, product_id)
+            key = (state.cart_id, rule.alert_type, product_id if rule.per_product else None)
+            if spec is None:
+                state.active.discard(key)
+            elif key in state.active:
+                self.alerts_suppressed += 1
+            else:
+                state.active.add(key)
+                raised.append(spec)
+        return raised
+    
+    def handle(self, topic: str, payload: Dict[str, Any]):
+        """IoT subscriber callback for cart/# topics"""
+        event_type = payload.get("event_type")
+        cart_id = payload.get("cart_id")
+        if cart_id is None:
+            return
+        
+        if event_type == "payment":
+            # Checked out: nothing left to watch
+            with self._lock:
+                self._carts.pop(cart_id, None)
+            return
+        if event_type not in EVENT_TYPES:
+            return
+        
+        snapshot = None
+        if self.load_cart is not None and cart_id not in self._carts:
+            snapshot = self.load_cart(cart_id)
+        
+        with self._lock:
+            self.events += 1
+            state = self._state(cart_id, snapshot)
+            product_id = self._apply(state, event_type, payload)
+            raised = self._evaluate(state, self._rules_by_event.get(event_type, ()), product_id)
+            self.alerts_raised += len(raised)
+        
+        if raised:
+            self.raise_alerts(raised)
+    
+    def replay(self, events: Iterable[Tuple[str, Dict[str, Any]]]):
+        """Feed recorded (topic, payload) events through the engine in order"""
+        for topic, payload in events:
+            self.handle(topic, payload)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "carts": len(self._carts),
+            "events": self.events,
+            "carts_seeded": self.carts_seeded,
+            "rule_evaluations": self.rule_evaluations,
+            "alerts_raised": self.alerts_raised,
+            "alerts_suppressed": self.alerts_suppressed,
+            "rules": {rule.name: list(rule.events) for rule in self.rules}
+        }
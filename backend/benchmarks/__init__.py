@@ -0,0 +1,3 @@
+"""
+Benchmark scripts, run from the backend directory with python -m benchmarks.<name>
+"""
@@ -0,0 +1,123 @@
+"""
+Admin listing benchmark
+Writes a day of synthetic transactions to SQLite and reports:
+  - walking every page of /admin/transactions/recent by keyset cursor versus
+    the LIMIT/OFFSET paging it replaces
+  - time to first row and peak Python memory of the streaming export
+    (yield_per) versus materializing the whole list first
+
+Usage: python -m benchmarks.bench_admin_listings [transactions]
+"""
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from app.api.admin import _transaction_row
+from app.api.pagination import EXPORT_BATCH_SIZE, paginate, stream_rows
+from app.models.transaction import Transaction, PaymentMethod, TransactionStatus
+from benchmarks.common import make_session
+
+TRANSACTIONS = 200_000
+PAGE = 500
+BATCH = 50000
+
+
+def seed_transactions(db, count: int, seed: int = 5):
+    rng = random.Random(seed)
+    day_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    methods, statuses = list(PaymentMethod), list(TransactionStatus)
+    conn = db.connection()
+    for offset in range(0, count, BATCH):
+        conn.execute(insert(Transaction), [
+            {
+                "cart_id": 1 + i % 1000,
+                "transaction_id": f"TXN-{i:09d}",
+                "payment_method": rng.choice(methods),
+                "amount": round(rng.uniform(1.0, 250.0), 2),
+                "status": rng.choice(statuses),
+                "created_at": day_start + timedelta(seconds=rng.randrange(86400))
+            }
+            for i in range(offset, min(offset + BATCH, count))
+        ])
+    db.commit()
+    return day_start
+
+
+def walk_keyset(db):
+    pages, cursor = 0, None
+    while True:
+        rows, cursor = paginate(
+            db.query(Transaction), Transaction.created_at, Transaction.id, PAGE, cursor,
+            db.get_bind().dialect.name
+        )
+        db.expunge_all()
+        pages += 1
+        if cursor is None:
+            return pages
+
+
+def walk_offset(db):
+    """The paging the listings allowed before: ORDER BY created_at LIMIT/OFFSET"""
+    pages, offset = 0, 0
+    while True:
+        rows = db.query(Transaction).order_by(
+            Transaction.created_at.desc(), Transaction.id.desc()
+        ).offset(offset).limit(PAGE).all()
+        db.expunge_all()
+        pages += 1
+        offset += PAGE
+        if len(rows) < PAGE:
+            return pages
+
+
+def export_streaming(db, since, until):
+    rows = db.query(Transaction).filter(
+        Transaction.created_at >= since, Transaction.created_at < until
+    ).order_by(Transaction.created_at.desc(), Transaction.id.desc()).yield_per(EXPORT_BATCH_SIZE)
+    return stream_rows(rows, _transaction_row, "ndjson")
+
+
+def export_materialized(db, since, until):
+    """Load every ORM object and dict, then encode (the old list endpoints)"""
+    transactions = db.query(Transaction).filter(
+        Transaction.created_at >= since, Transaction.created_at < until
+    ).order_by(Transaction.created_at.desc(), Transaction.id.desc()).all()
+    records = [_transaction_row(t) for t in transactions]
+    return stream_rows(records, lambda record: record, "ndjson")
+
+
+def measure_export(db, build, *args):
+    """(ms to first line, total ms, peak traced MB, bytes)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = build(db, *args)
+    size = len(next(chunks))
+    first = (time.perf_counter() - start) * 1000.0
+    for chunk in chunks:
+        size += len(chunk)
+    total = (time.perf_counter() - start) * 1000.0
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    db.expunge_all()
+    return first, total, peak, size
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else TRANSACTIONS
+    db = make_session()
+    day_start = seed_transactions(db, count)
+    print(f"{count} transactions over one day, {PAGE} per page")
+    
+    print(f"{'paging':<12} {'pages':>7} {'ms':>10}")
+    for name, walk in (("keyset", walk_keyset), ("offset", walk_offset)):
+        start = time.perf_counter()
+        pages = walk(db)
+        print(f"{name:<12} {pages:>7} {(time.perf_counter() - start) * 1000.0:>10.1f}")
+    
+    print(f"{'export':<14} {'first ms':>9} {'total ms':>10} {'peak MB':>9} {'MB out':>8}")
+    window = (day_start, day_start + timedelta(days=1))
+    for name, build in (("streaming", export_streaming), ("materialized", export_materialized)):
+        first, total, peak, size = measure_export(db, build, *window)
+        print(f"{name:<14} {first:>9.1f} {total:>10.1f} {peak:>9.2f} {size / 1e6:>8.1f}")
@@ -0,0 +1,109 @@
+"""
+Alert write microbenchmark
+Writes bursts of theft alerts (a busy evening: many carts, several alerts
+each) three ways: the old add-and-commit per alert, the write-behind sink
+in sync mode (one batched INSERT per burst) and in buffered mode, where the
+request thread only queues. Reports alerts per second, the time a request
+spends per burst, and the sink's batch sizes and flush latency.
+
+Usage: python -m benchmarks.bench_alert_sink [bursts] [alerts_per_burst]
+"""
+import sys
+import time
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from app.models.alert import Alert, AlertSeverity, AlertStatus, AlertType
+from app.models.cart import Cart, CartStatus
+from app.services.alert_sink import AlertSink
+from app.services.theft_rules import AlertSpec
+from benchmarks.common import make_session, percentile
+
+CARTS = 200
+
+
+def make_bursts(bursts: int, size: int):
+    return [
+        [
+            AlertSpec(
+                n % CARTS + 1,
+                AlertType.AI_VERIFICATION_FAILED,
+                AlertSeverity.HIGH,
+                f"AI verification failed for product {i}",
+                product_id=i,
+                details={"product_id": i}
+            )
+            for i in range(size)
+        ]
+        for n in range(bursts)
+    ]
+
+
+def commit_per_alert(Session, burst):
+    """What TheftDetectionService used to do"""
+    db = Session()
+    for spec in burst:
+        db.add(Alert(
+            cart_id=spec.cart_id,
+            product_id=spec.product_id,
+            alert_type=spec.alert_type,
+            severity=spec.severity,
+            status=AlertStatus.PENDING,
+            message=spec.message,
+            details=spec.details
+        ))
+        db.commit()
+    cart = db.get(Cart, burst[0].cart_id)
+    cart.has_alert = True
+    cart.alert_reason = "; ".join(spec.message for spec in burst[:3])
+    db.commit()
+    db.close()
+
+
+def run(Session, name: str, write, finish, bursts):
+    before = count_alerts(Session)
+    request_ms = []
+    start = time.perf_counter()
+    for burst in bursts:
+        started = time.perf_counter()
+        write(burst)
+        request_ms.append((time.perf_counter() - started) * 1000.0)
+    finish()
+    elapsed = time.perf_counter() - start
+    written = count_alerts(Session) - before
+    total = sum(len(burst) for burst in bursts)
+    assert written == total, (name, written, total)
+    print(f"{name:<20} {total / elapsed:>9.0f} {percentile(request_ms, 50):>9.2f} {percentile(request_ms, 99):>9.2f}")
+
+
+def count_alerts(Session) -> int:
+    with Session() as db:
+        return db.query(func.count(Alert.id)).scalar()
+
+
+if __name__ == "__main__":
+    burst_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    burst_size = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    
+    db = make_session()
+    url = db.get_bind().url
+    db.add_all(Cart(session_id=f"ALERT-{n}", status=CartStatus.ACTIVE) for n in range(CARTS))
+    db.commit()
+    db.close()
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    bursts = make_bursts(burst_count, burst_size)
+    
+    print(f"{burst_count} bursts of {burst_size} alerts over {CARTS} carts")
+    print(f"{'case':<20} {'alerts/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    run(Session, "commit per alert", lambda burst: commit_per_alert(Session, burst), lambda: None, bursts)
+    
+    for mode in ("sync", "buffered"):
+        published = []
+        sink = AlertSink(mode=mode, batch_size=500, flush_interval_ms=50, session_factory=Session, publish=published.extend)
+        run(Session, f"sink, {mode}", sink.submit, sink.close, bursts)
+        stats = sink.get_stats()
+        # Alert events go out only for committed rows
+        assert len(published) == stats["written"], (len(published), stats)
+        latency = stats["flush_latency_ms"]
+        print(f"{'':<20} {stats['flushes']} flushes, mean batch {stats['mean_batch_size']}, "
+              f"flush p50 {latency['p50']} ms, p99 {latency['p99']} ms, peak buffer {stats['buffered_peak']}")
@@ -0,0 +1,90 @@
+"""
+Alerts summary benchmark
+Writes 1M synthetic alerts spread over a year to SQLite and reports time
+and peak Python memory of the admin alerts summary (SQL GROUP BY) against
+the row-by-row loop it replaced. The old loop is only run on the shorter
+windows unless --legacy-full is given.
+
+Usage: python -m benchmarks.bench_alerts_summary [--legacy-full]
+"""
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from app.api.admin import get_alerts_summary
+from app.models.alert import Alert, AlertType, AlertSeverity, AlertStatus
+from benchmarks.common import make_session
+
+ALERTS = 1_000_000
+DAYS = 365
+BATCH = 50000
+
+
+def seed_alerts(db, count: int, seed: int = 3):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    types, severities, statuses = list(AlertType), list(AlertSeverity), list(AlertStatus)
+    conn = db.connection()
+    for offset in range(0, count, BATCH):
+        conn.execute(insert(Alert), [
+            {
+                "alert_type": rng.choice(types),
+                "severity": rng.choice(severities),
+                "status": rng.choice(statuses),
+                "message": "synthetic",
+                "is_active": rng.random() < 0.1,
+                "created_at": now - timedelta(seconds=rng.randrange(DAYS * 86400))
+            }
+            for _ in range(min(BATCH, count - offset))
+        ])
+    db.commit()
+
+
+def legacy_summary(db, days):
+    """The ORM loop get_alerts_summary used to run"""
+    start_date = datetime.utcnow() - timedelta(days=days)
+    alerts = db.query(Alert).filter(Alert.created_at >= start_date).all()
+    summary = {}
+    for alert in alerts:
+        stats = summary.setdefault(alert.alert_type.value, {"count": 0, "high_severity": 0, "resolved": 0})
+        stats["count"] += 1
+        if alert.severity.value == "high" or alert.severity.value == "critical":
+            stats["high_severity"] += 1
+        if alert.status.value == "resolved":
+            stats["resolved"] += 1
+    return summary
+
+
+def measure(fn, *args):
+    """(result, elapsed ms, peak traced MB); memory is traced in a second run"""
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = (time.perf_counter() - start) * 1000.0
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+if __name__ == "__main__":
+    db = make_session()
+    start = time.perf_counter()
+    seed_alerts(db, ALERTS)
+    print(f"{ALERTS} alerts over {DAYS} days (seeded in {time.perf_counter() - start:.1f} s)")
+    
+    print(f"{'query':<28} {'days':>5} {'ms':>10} {'peak MB':>9}")
+    for days in (7, 30, 365):
+        summary, elapsed, peak = measure(get_alerts_summary, days, None, db)
+        print(f"{'GROUP BY':<28} {days:>5} {elapsed:>10.1f} {peak:>9.2f}")
+        
+        _, elapsed, peak = measure(get_alerts_summary, days, "day", db)
+        print(f"{'GROUP BY + daily buckets':<28} {days:>5} {elapsed:>10.1f} {peak:>9.2f}")
+        
+        if days < DAYS or "--legacy-full" in sys.argv:
+            legacy, elapsed, peak = measure(legacy_summary, db, days)
+            db.expunge_all()
+            assert legacy == summary, (legacy, summary)
+            print(f"{'ORM rows + Python loop':<28} {days:>5} {elapsed:>10.1f} {peak:>9.2f}")
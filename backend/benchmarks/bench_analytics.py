@@ -0,0 +1,178 @@
+"""
+Admin analytics benchmark
+Writes a year of synthetic sales (carts, transactions, lines and alerts) to
+SQLite and times the dashboard overview and popular-products reads against
+the live-table queries they replaced, plus the rollup rebuild and the
+per-checkout rollup update.
+
+Usage: python -m benchmarks.bench_analytics [transactions_per_day]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, desc, insert
+from app.models.alert import Alert, AlertType
+from app.models.cart import Cart, CartItem, CartStatus
+from app.models.product import Product
+from app.models.transaction import Transaction, TransactionItem, PaymentMethod, TransactionStatus
+from app.services.analytics_service import AnalyticsRollupService
+from benchmarks.common import make_session, percentile, seed_products, timed
+
+PRODUCTS = 2000
+DAYS = 365
+ALERTS_PER_DAY = 20
+BATCH = 20000
+
+
+def seed_history(db, per_day: int, seed: int = 5):
+    """Carts paid at random times over the last DAYS days, 1-8 lines each"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    carts, cart_items, transactions, lines, alerts = [], [], [], [], []
+    for day in range(DAYS):
+        for _ in range(per_day):
+            moment = now - timedelta(days=day, seconds=rng.randrange(86400))
+            cart_id = len(carts) + 1
+            basket = rng.sample(range(1, PRODUCTS + 1), rng.randint(1, 8))
+            amount = 0.0
+            for product_id in basket:
+                quantity = rng.randint(1, 3)
+                subtotal = quantity * 2.5
+                amount += subtotal
+                cart_items.append({
+                    "cart_id": cart_id, "product_id": product_id, "quantity": quantity,
+                    "unit_price": 2.5, "subtotal": subtotal
+                })
+                lines.append({
+                    "transaction_id": cart_id, "product_id": product_id, "quantity": quantity,
+                    "unit_price": 2.5, "subtotal": subtotal
+                })
+            carts.append({
+                "id": cart_id, "session_id": f"S{cart_id}", "status": CartStatus.PAID,
+                "created_at": moment, "paid_at": moment, "final_amount": amount
+            })
+            transactions.append({
+                "id": cart_id, "cart_id": cart_id, "transaction_id": f"TXN-{cart_id}",
+                "payment_method": PaymentMethod.CARD, "amount": amount,
+                "status": TransactionStatus.COMPLETED, "created_at": moment, "completed_at": moment
+            })
+        for _ in range(ALERTS_PER_DAY):
+            alerts.append({
+                "alert_type": AlertType.MISMATCH_DETECTED, "message": "synthetic",
+                "created_at": now - timedelta(days=day, seconds=rng.randrange(86400)), "is_active": False
+            })
+    
+    conn = db.connection()
+    for model, rows in ((Cart, carts), (CartItem, cart_items), (Transaction, transactions),
+                        (TransactionItem, lines), (Alert, alerts)):
+        for offset in range(0, len(rows), BATCH):
+            conn.execute(insert(model), rows[offset:offset + BATCH])
+    db.commit()
+    return len(transactions), len(lines)
+
+
+def live_overview(db):
+    """The queries get_analytics_overview used to run"""
+    db.query(Cart).filter(Cart.status == CartStatus.ACTIVE).count()
+    today = datetime.utcnow().date()
+    db.query(Transaction).filter(func.date(Transaction.created_at) == today).count()
+    db.query(func.sum(Transaction.amount)).filter(
+        func.date(Transaction.created_at) == today,
+        Transaction.status == "completed"
+    ).scalar()
+    db.query(Alert).filter(Alert.is_active == True).count()
+    live_popular(db, 7, 10)
+
+
+def live_popular(db, days, limit):
+    """The cart_items join get_popular_products used to run"""
+    start_date = datetime.utcnow() - timedelta(days=days)
+    return db.query(
+        Product.id, Product.name, func.count(CartItem.id).label('purchase_count')
+    ).join(
+        CartItem, CartItem.product_id == Product.id
+    ).join(
+        Cart, Cart.id == CartItem.cart_id
+    ).filter(
+        Cart.created_at >= start_date
+    ).group_by(
+        Product.id, Product.name
+    ).order_by(
+        desc('purchase_count')
+    ).limit(limit).all()
+
+
+def sold_since(db, since):
+    """Units sold per product straight from transaction_items"""
+    return dict(db.query(
+        TransactionItem.product_id, func.sum(TransactionItem.quantity)
+    ).join(
+        Transaction, Transaction.id == TransactionItem.transaction_id
+    ).filter(
+        Transaction.completed_at >= since
+    ).group_by(TransactionItem.product_id).all())
+
+
+def rollup_overview(db, rollups):
+    db.query(Cart).filter(Cart.status == CartStatus.ACTIVE).count()
+    rollups.get_totals(db, "day")
+    db.query(Alert).filter(Alert.is_active == True).count()
+    rollups.get_popular_products(db, days=7, limit=10)
+
+
+def report(label, samples):
+    print(f"{label:<34} p50 {percentile(samples, 50):>9.3f} ms  p99 {percentile(samples, 99):>9.3f} ms")
+
+
+if __name__ == "__main__":
+    per_day = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    db = make_session()
+    seed_products(db, PRODUCTS)
+    start = time.perf_counter()
+    transaction_count, line_count = seed_history(db, per_day)
+    print(f"{transaction_count} transactions, {line_count} lines over {DAYS} days "
+          f"(seeded in {time.perf_counter() - start:.1f} s)")
+    
+    rollups = AnalyticsRollupService(ttl_seconds=30.0)
+    start = time.perf_counter()
+    counts = rollups.rebuild(db)
+    print(f"rebuild: {time.perf_counter() - start:.1f} s -> {counts}")
+    
+    # Day and month rollups must add up to the raw lines
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    for days in (7, 45, 365):
+        rolled = {p["product_id"]: p["total_quantity"] for p in rollups.get_popular_products(db, days, PRODUCTS)}
+        assert rolled == sold_since(db, today - timedelta(days=days - 1)), days
+    
+    report("overview, live tables", [timed(live_overview, db) for _ in range(5)])
+    
+    def cold_overview():
+        rollups.invalidate()
+        rollup_overview(db, rollups)
+    report("overview, rollups (cold cache)", [timed(cold_overview) for _ in range(50)])
+    report("overview, rollups (warm cache)", [timed(rollup_overview, db, rollups) for _ in range(500)])
+    
+    for days in (7, 30, 365):
+        report(f"popular {days:>3} days, live tables", [timed(live_popular, db, days, 20) for _ in range(3)])
+        
+        def cold_popular():
+            rollups.invalidate()
+            rollups.get_popular_products(db, days=days, limit=20)
+        report(f"popular {days:>3} days, rollups (cold)", [timed(cold_popular) for _ in range(10)])
+    
+    # Incremental update cost on the checkout path
+    rng = random.Random(9)
+    transactions = []
+    for _ in range(500):
+        transaction = Transaction(amount=10.0, completed_at=datetime.utcnow())
+        transaction.items = [
+            TransactionItem(product_id=product_id, quantity=1, unit_price=2.5, subtotal=2.5)
+            for product_id in rng.sample(range(1, PRODUCTS + 1), 4)
+        ]
+        transactions.append(transaction)
+    
+    def record(transaction):
+        rollups.record_transaction(db, transaction)
+        db.commit()
+    report("record_transaction + commit", [timed(record, t) for t in transactions])
@@ -0,0 +1,163 @@
+"""
+Async vs threadpool load test for the hot cart endpoints
+Simulates concurrent carts, each scanning products (barcode lookup, add
+item, billing refresh), against the app's routes (async reads; the add
+item route is sync but closes its session before returning) and against
+the same handlers written as plain sync routes that FastAPI runs in its
+threadpool.
+Requests go through the ASGI app in process (no network), on a SQLite
+database in WAL mode.
+
+Past ~40 concurrent requests the threadpool model can stall: every worker
+thread waits on a pool checkout while the requests holding connections wait
+for a worker to serialize their responses, until pool_timeout fails them.
+Set DB_POOL_TIMEOUT low to see the failures quickly.
+
+Usage: [DB_POOL_TIMEOUT=5] python -m benchmarks.bench_async_load [carts] [scans_per_cart]
+"""
+import asyncio
+import random
+import sys
+import time
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.config import settings
+from app.database import ASYNC_DRIVERS, get_async_db, get_db
+from app.main import app as async_app
+from app.models.cart import Cart, CartItem, CartStatus
+from app.models.loading import CART_WITH_PRODUCTS
+from app.schemas.billing import BillingResponse
+from app.schemas.cart import CartItemCreate, CartItemResponse
+from app.schemas.product import ProductResponse
+from app.services.billing_service import BillingService
+from app.services.catalog_cache_service import catalog_cache
+from benchmarks.common import make_session, percentile, seed_products
+
+PRODUCTS = 500
+P = settings.API_V1_PREFIX
+
+
+def threadpool_app() -> FastAPI:
+    """The same three endpoints as sync routes (the previous request model)"""
+    router = APIRouter(prefix=P)
+    
+    @router.get("/products/barcode/{barcode}", response_model=ProductResponse)
+    def get_product_by_barcode(barcode: str, db: Session = Depends(get_db)):
+        product = catalog_cache.get_by_barcode(db, barcode)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return product
+    
+    @router.post("/cart/{cart_id}/items", response_model=CartItemResponse)
+    def add_item_to_cart(cart_id: int, item: CartItemCreate, db: Session = Depends(get_db)):
+        cart = db.query(Cart).filter(Cart.id == cart_id).first()
+        if not cart:
+            raise HTTPException(status_code=404, detail="Cart not found")
+        return BillingService.add_item_to_cart(db, cart, item.product_id, item.quantity)
+    
+    @router.get("/cart/{cart_id}/billing", response_model=BillingResponse)
+    def get_cart_billing(cart_id: int, db: Session = Depends(get_db)):
+        cart = db.query(Cart).options(*CART_WITH_PRODUCTS).filter(Cart.id == cart_id).first()
+        if not cart:
+            raise HTTPException(status_code=404, detail="Cart not found")
+        return BillingService.get_billing_response(cart)
+    
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+async def shopper(client, cart_id, scans, rng, latencies, errors):
+    for _ in range(scans):
+        product_id = rng.randint(1, PRODUCTS)
+        for method, url, kwargs in (
+            ("GET", f"{P}/products/barcode/{4000000000000 + product_id - 1}", {}),
+            ("POST", f"{P}/cart/{cart_id}/items", {"json": {"product_id": product_id, "quantity": 1}}),
+            ("GET", f"{P}/cart/{cart_id}/billing", {}),
+        ):
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+
+
+async def load_test(app, cart_ids, scans):
+    latencies, errors = [], []
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            shopper(client, cart_id, scans, random.Random(cart_id), latencies, errors)
+            for cart_id in cart_ids
+        ))
+        elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, latencies, errors
+
+
+if __name__ == "__main__":
+    carts = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    scans = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    
+    db = make_session()
+    url = db.get_bind().url
+    db.execute(text("PRAGMA journal_mode=WAL"))
+    seed_products(db, PRODUCTS)
+    catalog_cache.load(db)
+    db.close()
+    
+    # Both models get the configured pool
+    engine = create_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT
+    )
+    SyncSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async_engine = create_async_engine(
+        url.set(drivername=f"sqlite+{ASYNC_DRIVERS['sqlite']}"),
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT
+    )
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    
+    def get_bench_db():
+        session = SyncSession()
+        try:
+            yield session
+        finally:
+            session.close()
+    
+    async def get_bench_async_db():
+        async with AsyncSession() as session:
+            yield session
+    
+    sync_app = threadpool_app()
+    for app in (sync_app, async_app):
+        app.dependency_overrides[get_db] = get_bench_db
+        app.dependency_overrides[get_async_db] = get_bench_async_db
+    
+    print(f"{carts} concurrent carts x {scans} scans (3 requests each), "
+          f"pool {settings.DB_POOL_SIZE}+{settings.DB_MAX_OVERFLOW}, timeout {settings.DB_POOL_TIMEOUT:g} s")
+    print(f"{'model':<12} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, app in (("threadpool", sync_app), ("async", async_app)):
+        with SyncSession() as session:
+            session.execute(insert(Cart), [
+                {"session_id": f"{name}-{i}", "status": CartStatus.ACTIVE} for i in range(carts)
+            ])
+            session.commit()
+            cart_ids = [cart.id for cart in session.query(Cart.id).filter(Cart.session_id.like(f"{name}-%"))]
+        
+        rps, latencies, errors = asyncio.run(load_test(app, cart_ids, scans))
+        print(f"{name:<12} {rps:>8.0f} {percentile(latencies, 50):>9.1f} {percentile(latencies, 99):>9.1f} {len(errors):>7}")
+        
+        with SyncSession() as session:
+            lines = session.query(CartItem).filter(CartItem.cart_id.in_(cart_ids)).count()
+            assert lines > 0, name
+        app.dependency_overrides.clear()
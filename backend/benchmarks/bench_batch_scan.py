@@ -0,0 +1,40 @@
+"""
+Batch scan throughput benchmark
+Compares N sequential BillingService.add_item_to_cart calls with a single
+BillingService.add_items_to_cart call for the same basket.
+
+Usage: python -m benchmarks.bench_batch_scan
+"""
+from app.models.cart import Cart, CartStatus
+from app.services.billing_service import BillingService
+from benchmarks.common import make_session, seed_products, timed
+
+BASKET_SIZES = [10, 50, 200]
+
+
+def new_cart(db, session_id: str) -> Cart:
+    cart = Cart(session_id=session_id, status=CartStatus.ACTIVE)
+    db.add(cart)
+    db.commit()
+    return cart
+
+
+def sequential(db, cart: Cart, products) -> None:
+    for product in products:
+        BillingService.add_item_to_cart(db, cart, product.id, 1)
+
+
+def batched(db, cart: Cart, products) -> None:
+    BillingService.add_items_to_cart(db, cart, [(None, product.barcode, 1) for product in products])
+
+
+if __name__ == "__main__":
+    db = make_session()
+    products = seed_products(db, max(BASKET_SIZES))
+    
+    print(f"{'items':>6} {'sequential ms':>14} {'batch ms':>9} {'items/s seq':>12} {'items/s batch':>14}")
+    for size in BASKET_SIZES:
+        basket = products[:size]
+        seq_ms = timed(sequential, db, new_cart(db, f"SEQ-{size}"), basket)
+        batch_ms = timed(batched, db, new_cart(db, f"BATCH-{size}"), basket)
+        print(f"{size:>6} {seq_ms:>14.1f} {batch_ms:>9.1f} {size / seq_ms * 1000:>12.0f} {size / batch_ms * 1000:>14.0f}")
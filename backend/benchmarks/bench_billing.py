@@ -0,0 +1,45 @@
+"""
+Scan latency benchmark for BillingService
+Adds 1..500 distinct lines to one cart and reports per-scan latency in
+incremental and full-recompute billing modes.
+
+Usage: python -m benchmarks.bench_billing
+"""
+from app.config import settings
+from app.models.cart import Cart, CartStatus
+from app.services.billing_service import BillingService
+from benchmarks.common import make_session, seed_products, timed
+
+CHECKPOINTS = [1, 50, 100, 200, 300, 400, 500]
+
+
+def run(mode: str, lines: int = 500) -> dict:
+    settings.BILLING_MODE = mode
+    db = make_session()
+    products = seed_products(db, lines)
+    cart = Cart(session_id=f"BENCH-{mode}", status=CartStatus.ACTIVE)
+    db.add(cart)
+    db.commit()
+    
+    elapsed = [
+        timed(BillingService.add_item_to_cart, db, cart, product.id, 1)
+        for product in products
+    ]
+    # Mean of the ten scans leading up to each checkpoint
+    samples = {n: sum(elapsed[max(0, n - 10):n]) / len(elapsed[max(0, n - 10):n]) for n in CHECKPOINTS}
+    
+    # Incremental totals must agree with a full recompute
+    expected = BillingService.calculate_cart_total(cart)
+    assert abs(expected.final_amount - cart.final_amount) < 0.05, (expected, cart.final_amount)
+    db.close()
+    return samples
+
+
+if __name__ == "__main__":
+    original_mode = settings.BILLING_MODE
+    results = {mode: run(mode) for mode in ("incremental", "full")}
+    settings.BILLING_MODE = original_mode
+    
+    print(f"{'lines':>6} {'incremental ms':>15} {'full ms':>10}")
+    for n in CHECKPOINTS:
+        print(f"{n:>6} {results['incremental'][n]:>15.2f} {results['full'][n]:>10.2f}")
@@ -0,0 +1,45 @@
+"""
+Catalog cache benchmark
+Times barcode lookups through the catalog cache against direct queries and
+counts SQL statements issued once the cache is warm.
+
+Usage: python -m benchmarks.bench_catalog_cache
+"""
+import random
+from sqlalchemy import event
+from app.models.product import Product
+from app.services.catalog_cache_service import CatalogCacheService, LocalCatalogStore
+from benchmarks.common import make_session, seed_products, timed
+
+CATALOG_SIZE = 20000
+LOOKUPS = 20000
+
+
+if __name__ == "__main__":
+    db = make_session()
+    barcodes = [product.barcode for product in seed_products(db, CATALOG_SIZE)]
+    sample = [random.choice(barcodes) for _ in range(LOOKUPS)]
+    
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(1))
+    
+    def direct():
+        for barcode in sample:
+            db.query(Product).filter(Product.barcode == barcode).first()
+    
+    cache = CatalogCacheService(store=LocalCatalogStore(), ttl_seconds=0)
+    warm_ms = timed(cache.load, db)
+    
+    def cached():
+        for barcode in sample:
+            cache.get_by_barcode(db, barcode)
+    
+    db_ms = timed(direct)
+    statements.clear()
+    cache_ms = timed(cached)
+    
+    print(f"catalog size: {CATALOG_SIZE}, lookups: {LOOKUPS}, warm-up: {warm_ms:.1f} ms")
+    print(f"direct query: {db_ms / LOOKUPS * 1000:.1f} us/lookup")
+    print(f"cache:        {cache_ms / LOOKUPS * 1000:.2f} us/lookup")
+    print(f"SQL statements during cached lookups: {len(statements)}")
+    print(f"stats: {cache.get_stats()}")
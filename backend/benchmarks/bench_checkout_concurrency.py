@@ -0,0 +1,114 @@
+"""
+Checkout concurrency stress test
+Hammers one cart at a time with simultaneous checkouts from many threads
+(a double-tapped pay button, a retrying client) and checks that each cart is
+charged exactly once and its stock taken off exactly once:
+  - no idempotency key: one request pays, the rest get a conflict
+  - shared idempotency key: every request that completes returns the same
+    transaction
+SQLite may also refuse a racing writer outright ("database is locked");
+those are counted as errors, never as a second payment.
+
+Usage: python -m benchmarks.bench_checkout_concurrency [threads] [carts]
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from sqlalchemy import create_engine, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.models.cart import Cart, CartStatus
+from app.models.product import Product
+from app.models.transaction import Transaction
+from app.services.billing_service import BillingService
+from app.services.payment_service import CheckoutConflictError, payment_service
+from benchmarks.common import make_session, seed_products
+
+LINES = 20
+STOCK = 1000
+
+
+def checkout_storm(Session, cart_id, threads, idempotency_key):
+    barrier = threading.Barrier(threads)
+    outcomes, transaction_ids = Counter(), set()
+    lock = threading.Lock()
+    
+    def pay():
+        db = Session()
+        barrier.wait()
+        try:
+            response = payment_service.process_payment(
+                db, cart_id, "card", idempotency_key=idempotency_key
+            )
+            outcome = "paid"
+            with lock:
+                transaction_ids.add(response.transaction_id)
+        except CheckoutConflictError:
+            outcome = "conflict"
+        except OperationalError:
+            outcome = "error"
+        finally:
+            db.close()
+        with lock:
+            outcomes[outcome] += 1
+    
+    workers = [threading.Thread(target=pay) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return outcomes, transaction_ids
+
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    carts = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    
+    db = make_session()
+    url = db.get_bind().url
+    # Ids only: the products expire on commit and detach on close
+    product_ids = [product.id for product in seed_products(db, LINES)]
+    db.query(Product).update({Product.stock_quantity: STOCK})
+    db.commit()
+    db.close()
+    
+    engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 30}, pool_size=threads)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    print(f"{threads} threads checking out each of {carts} carts at once")
+    print(f"{'mode':<14} {'paid':>6} {'replayed':>9} {'conflict':>9} {'errors':>7} {'ms/cart':>8}")
+    for mode in ("no key", "shared key"):
+        totals, elapsed = Counter(), 0.0
+        for n in range(carts):
+            with Session() as session:
+                cart = Cart(session_id=f"STRESS-{mode}-{n}", status=CartStatus.ACTIVE)
+                session.add(cart)
+                session.commit()
+                for product_id in product_ids:
+                    BillingService.add_item_to_cart(session, cart, product_id, 1)
+                cart_id = cart.id
+            
+            key = f"PAY-{cart_id}" if mode == "shared key" else None
+            start = time.perf_counter()
+            outcomes, transaction_ids = checkout_storm(Session, cart_id, threads, key)
+            elapsed += (time.perf_counter() - start) * 1000.0
+            
+            with Session() as session:
+                charged = session.query(func.count(Transaction.id)).filter(Transaction.cart_id == cart_id).scalar()
+                assert charged <= 1 and len(transaction_ids) == charged, (cart_id, charged, transaction_ids)
+                assert session.get(Cart, cart_id).status == (CartStatus.PAID if charged else CartStatus.ACTIVE)
+            totals["charged"] += charged
+            totals["replayed"] += outcomes["paid"] - charged
+            totals["conflict"] += outcomes["conflict"]
+            totals["error"] += outcomes["error"]
+        
+        print(f"{mode:<14} {totals['charged']:>6} {totals['replayed']:>9} {totals['conflict']:>9} "
+              f"{totals['error']:>7} {elapsed / carts:>8.1f}")
+    
+    # Every paid cart took exactly one unit of each product
+    with Session() as session:
+        paid = session.query(func.count(Cart.id)).filter(Cart.status == CartStatus.PAID).scalar()
+        stock = {p.id: p.stock_quantity for p in session.query(Product)}
+        assert all(quantity == STOCK - paid for quantity in stock.values()), (paid, stock)
+    print(f"stock consistent: {paid} carts paid, {STOCK - paid} units left per product")
@@ -0,0 +1,110 @@
+"""
+Embedding verification accuracy and latency benchmark
+Builds stores for synthetic catalogs of 1k, 10k and 50k products, then
+verifies camera-like crops (offset, relit and noisy copies of a product's
+reference image) against the scanned product:
+  - genuine: the crop shows the scanned product; it should verify
+  - swapped: the crop shows a different product; it should not
+Compared with the old name matching, where the detector's class name (at
+best the category) is checked against the product's name and category.
+Also reports top-1/top-k retrieval accuracy, batched match latency and the
+cost of opening the store memory-mapped versus reading it into memory.
+
+Usage: python -m benchmarks.bench_embedding_verification [crops]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from app.services.embedding_service import (
+    EmbeddingStore, ProductMatcher, StubImageEncoder, build_store, synthetic_product_image
+)
+from benchmarks.common import percentile
+
+CATALOG_SIZES = (1000, 10000, 50000)
+CATEGORIES = ["Fruits", "Dairy", "Bakery", "Beverages", "Snacks", "Meat", "Frozen", "Personal Care"]
+TOP_K = 5
+THRESHOLD = 0.7
+BATCH_SIZES = (1, 8, 64)
+
+
+def camera_crop(image: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """A loose crop of the product under different light, with sensor noise"""
+    height, width = image.shape[:2]
+    margin = int(height * 0.08)
+    top, left = rng.integers(0, margin + 1, 2)
+    bottom, right = height - rng.integers(0, margin + 1), width - rng.integers(0, margin + 1)
+    crop = image[top:bottom, left:right].astype(np.float32) * rng.uniform(0.85, 1.15)
+    crop += rng.normal(0, 10, crop.shape)
+    return np.clip(crop, 0, 255).astype(np.uint8)
+
+
+def category(product_id: int) -> str:
+    return CATEGORIES[product_id % len(CATEGORIES)]
+
+
+def name_match(class_name: str, product_id: int) -> bool:
+    """The old AIService check: class name against product name or category"""
+    product_category = category(product_id).lower()
+    product_name = f"product {product_id} {product_category}"
+    class_name = class_name.lower()
+    return class_name in product_category or class_name in product_name or product_category in class_name
+
+
+def timed_open(path: str, mmap: bool) -> float:
+    start = time.perf_counter()
+    store = EmbeddingStore.load(path, mmap=mmap)
+    float(store.vectors[-1, 0])  # Touch the data so a full read is not deferred
+    return (time.perf_counter() - start) * 1000.0
+
+
+if __name__ == "__main__":
+    crops_per_case = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    encoder = StubImageEncoder()
+    rng = np.random.default_rng(3)
+    
+    print(f"{crops_per_case} crops per catalog, top-{TOP_K}, threshold {THRESHOLD}")
+    for size in CATALOG_SIZES:
+        product_ids = list(range(1, size + 1))
+        start = time.perf_counter()
+        references = [synthetic_product_image(product_id) for product_id in product_ids]
+        store = build_store(encoder, product_ids, references)
+        build_s = time.perf_counter() - start
+        
+        path = os.path.join(tempfile.mkdtemp(prefix="cart-embeddings-"), "store")
+        store.save(path)
+        matcher = ProductMatcher(EmbeddingStore.load(path, mmap=True), encoder)
+        
+        shown = rng.choice(product_ids, crops_per_case)
+        swapped = (shown + rng.integers(1, size, crops_per_case) - 1) % size + 1
+        crops = [camera_crop(references[product_id - 1], rng) for product_id in shown]
+        
+        candidates, scores = matcher.match(crops, k=TOP_K)
+        top1 = float(np.mean(candidates[:, 0] == shown))
+        topk = float(np.mean((candidates == shown[:, None]).any(axis=1)))
+        
+        def accepted(claimed: np.ndarray) -> float:
+            return float(np.mean(np.where(candidates == claimed[:, None], scores, -1.0).max(axis=1) >= THRESHOLD))
+        
+        # The detector can at best name the category of what it sees
+        legacy_genuine = np.mean([name_match(category(p), p) for p in shown])
+        legacy_swapped = np.mean([name_match(category(p), q) for p, q in zip(shown, swapped)])
+        
+        print(f"\n{size} products: built in {build_s:.1f} s, {store.vectors.nbytes / 1024 ** 2:.1f} MB, "
+              f"top-1 {top1:.1%}, top-{TOP_K} {topk:.1%}")
+        print(f"  {'method':<10} {'genuine verified':>17} {'swapped verified':>17}")
+        print(f"  {'embedding':<10} {accepted(shown):>17.1%} {accepted(swapped):>17.1%}")
+        print(f"  {'name':<10} {legacy_genuine:>17.1%} {legacy_swapped:>17.1%}")
+        
+        print(f"  {'batch':>7} {'ms/batch p50':>13} {'p99':>8} {'us/crop':>9}")
+        for batch_size in BATCH_SIZES:
+            latencies = []
+            for offset in range(0, crops_per_case - batch_size + 1, batch_size):
+                started = time.perf_counter()
+                matcher.match(crops[offset:offset + batch_size], k=TOP_K)
+                latencies.append((time.perf_counter() - started) * 1000.0)
+            per_crop = 1000.0 * sum(latencies) / (len(latencies) * batch_size)
+            print(f"  {batch_size:>7} {percentile(latencies, 50):>13.2f} {percentile(latencies, 99):>8.2f} {per_crop:>9.1f}")
+        
+        print(f"  open: mmap {timed_open(path, True):.2f} ms, full read {timed_open(path, False):.2f} ms")
@@ -0,0 +1,96 @@
+"""
+Executor scaling load test
+Many request threads drive the CPU-bound parts of checkout (payment QR PNG
+render plus a large receipt) and AI verification (decoding a 1080p JPEG
+upload) through the shared executor. Reports tasks per second with a
+process pool of 1, 2, 4 ... cores against a thread pool of the largest size,
+which the GIL holds to roughly one core.
+
+Usage: python -m benchmarks.bench_executor_scaling [seconds_per_case]
+"""
+import io
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from app.cpu_tasks import build_receipt, decode_image_bytes, render_qr
+from app.services.executor_service import ExecutorService
+from app.services.qr_service import encode_token
+from benchmarks.common import percentile
+
+RECEIPT_LINES = 300
+INPUT_SIZE = 640
+
+
+def make_jpeg(width: int = 1920, height: int = 1080) -> bytes:
+    from PIL import Image
+    
+    rng = np.random.default_rng(7)
+    # Smooth gradient plus noise, so the JPEG is a realistic size
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    pixels = np.clip(gradient + rng.normal(0, 40, (height, width, 3)), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def checkout(executor: ExecutorService, n: int):
+    token = encode_token(n, 100.0 + n % 50, f"PAY-{n:08X}", datetime.utcnow() + timedelta(minutes=10))
+    executor.run_cpu(render_qr, token, "png", name="qr_render_png")
+    header = {"transaction_id": f"TXN-{n:012X}", "items": [], "total": 123.45}
+    lines = [(f"Product {i}", 1 + i % 3, 1.99, 8.0, 1.99 * (1 + i % 3)) for i in range(RECEIPT_LINES)]
+    executor.run_cpu(build_receipt, header, lines, name="receipt")
+
+
+def verification(executor: ExecutorService, jpeg: bytes):
+    frame = executor.run_cpu(decode_image_bytes, jpeg, INPUT_SIZE, name="image_decode")
+    assert frame is not None and max(frame.shape[:2]) <= INPUT_SIZE
+
+
+def load_test(executor: ExecutorService, clients: int, seconds: float, jpeg: bytes):
+    """(requests/s, p99 ms) with half the clients checking out and half verifying"""
+    latencies, lock = [], threading.Lock()
+    deadline = time.perf_counter() + seconds
+    
+    def client(index: int):
+        n = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if index % 2:
+                checkout(executor, index * 100000 + n)
+            else:
+                verification(executor, jpeg)
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000.0)
+            n += 1
+    
+    # Warm the pool (worker start-up and imports) before timing
+    checkout(executor, 0)
+    verification(executor, jpeg)
+    
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / (time.perf_counter() - start), percentile(latencies, 99)
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    cores = os.cpu_count() or 1
+    jpeg = make_jpeg()
+    sizes = sorted({1, *[2 ** i for i in range(1, cores.bit_length()) if 2 ** i <= cores], cores})
+    
+    print(f"{cores} cores, {len(jpeg) / 1024:.0f} KB JPEG, {RECEIPT_LINES}-line receipts, {seconds:g} s per case")
+    print(f"{'pool':<10} {'workers':>8} {'req/s':>8} {'p99 ms':>9} {'speed-up':>9}")
+    baseline = None
+    for mode, workers in [("process", size) for size in sizes] + [("thread", cores)]:
+        executor = ExecutorService(mode=mode, cpu_workers=workers)
+        rps, p99 = load_test(executor, clients=4 * workers, seconds=seconds, jpeg=jpeg)
+        executor.shutdown()
+        baseline = baseline or rps
+        print(f"{mode:<10} {workers:>8} {rps:>8.0f} {p99:>9.1f} {rps / baseline:>8.2f}x")
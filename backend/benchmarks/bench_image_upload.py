@@ -0,0 +1,70 @@
+"""
+Image upload benchmark
+Compares the per-frame cost of the base64-in-JSON verification path with the
+binary upload path: bytes on the wire, Python heap peak, decoded bitmap size
+and decode latency.
+
+Usage: python -m benchmarks.bench_image_upload [--width W] [--height H]
+"""
+import argparse
+import base64
+import io
+import json
+import tracemalloc
+import numpy as np
+from PIL import Image
+from app.services.ai_service import ai_service
+from benchmarks.common import percentile, timed
+
+ITERATIONS = 30
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    """A noisy camera-sized frame, so the JPEG does not compress to nothing"""
+    rng = np.random.default_rng(3)
+    pixels = rng.integers(0, 255, size=(height // 8, width // 8, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels).resize((width, height), Image.BILINEAR)
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def legacy_base64(body: bytes) -> np.ndarray:
+    """The original path: JSON parse, base64 decode, full-resolution RGB decode"""
+    image_data = json.loads(body)["image_data"]
+    image = Image.open(io.BytesIO(base64.b64decode(image_data))).convert("RGB")
+    return np.asarray(image)
+
+
+def base64_json(body: bytes) -> np.ndarray:
+    return ai_service._decode_image(json.loads(body)["image_data"])
+
+
+def binary(body: bytes) -> np.ndarray:
+    return ai_service.decode_frame(body)
+
+
+def measure(name: str, fn, body: bytes):
+    tracemalloc.start()
+    frame = fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    samples = [timed(fn, body) for _ in range(ITERATIONS)]
+    print(f"{name:18s} wire {len(body) / 1024:8.0f} KiB  python peak {peak / 1024:8.0f} KiB  "
+          f"bitmap {frame.nbytes / 1024:8.0f} KiB ({frame.shape[1]}x{frame.shape[0]})  "
+          f"p50 {percentile(samples, 50):6.1f} ms  p99 {percentile(samples, 99):6.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    args = parser.parse_args()
+    
+    jpeg = make_jpeg(args.width, args.height)
+    body = json.dumps({"cart_id": 1, "product_id": 1, "image_data": base64.b64encode(jpeg).decode()}).encode()
+    
+    measure("legacy base64", legacy_base64, body)
+    measure("base64 + draft", base64_json, body)
+    measure("binary + draft", binary, jpeg)
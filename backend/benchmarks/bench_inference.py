@@ -0,0 +1,52 @@
+"""
+Batched inference benchmark
+Many concurrent clients submit frames to the inference scheduler backed by
+the stub model; compares unbatched (batch size 1) and micro-batched runs.
+
+Usage: python -m benchmarks.bench_inference [--clients N] [--latency-ms MS]
+"""
+import argparse
+import threading
+import time
+from PIL import Image
+from app.services.inference_service import BatchInferenceScheduler, StubDetectionModel
+
+FRAMES_PER_CLIENT = 20
+
+
+def run(max_batch_size: int, clients: int, latency_ms: float) -> dict:
+    model = StubDetectionModel(batch_latency_ms=latency_ms, per_image_latency_ms=latency_ms / 10.0)
+    scheduler = BatchInferenceScheduler(model.predict, max_batch_size=max_batch_size, max_wait_ms=5.0)
+    image = Image.new("RGB", (64, 64))
+    
+    def client():
+        for _ in range(FRAMES_PER_CLIENT):
+            scheduler.infer(image, timeout=60)
+    
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    stats = scheduler.get_stats()
+    scheduler.stop()
+    stats["throughput"] = clients * FRAMES_PER_CLIENT / elapsed
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    
+    for max_batch_size in (1, 4, 8, 16):
+        stats = run(max_batch_size, args.clients, args.latency_ms)
+        latency = stats["latency_ms"]
+        print(f"max batch {max_batch_size:2d}: {stats['throughput']:7.1f} frames/s  "
+              f"mean batch {stats['mean_batch_size']:5.2f}  "
+              f"queue wait p50 {latency['queue_wait']['p50']:7.1f} ms  "
+              f"total p50 {latency['total']['p50']:7.1f} ms  p99 {latency['total']['p99']:7.1f} ms")
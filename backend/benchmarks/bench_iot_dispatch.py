@@ -0,0 +1,58 @@
+"""
+IoT dispatch benchmark
+Times add-to-cart requests with a deliberately slow subscriber attached to
+cart updates, with inline (sync) and queued (async) dispatch.
+
+Usage: python -m benchmarks.bench_iot_dispatch [--requests N] [--delay-ms MS]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='cart-bench-'), 'bench.db')}"
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import SessionLocal, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.iot_service import iot_service  # noqa: E402
+from benchmarks.common import percentile, seed_products, timed  # noqa: E402
+
+
+def run(client: TestClient, label: str, mode: str, requests: int, delay_ms: float) -> list:
+    def slow_subscriber(topic, payload):
+        time.sleep(delay_ms / 1000.0)
+    
+    iot_service.subscribe("cart/+/update", slow_subscriber, mode=mode, policy="drop_oldest")
+    cart_id = client.post(f"{settings.API_V1_PREFIX}/cart/", json={"session_id": f"bench-{label}"}).json()["id"]
+    url = f"{settings.API_V1_PREFIX}/cart/{cart_id}/items"
+    
+    samples = [timed(client.post, url, json={"product_id": i % 50 + 1, "quantity": 1}) for i in range(requests)]
+    
+    stats = next(s for s in iot_service.get_dispatch_stats()["subscriptions"] if s["mode"] == mode)
+    iot_service.unsubscribe("cart/+/update", slow_subscriber)
+    print(f"{label:18s}: request p50 {percentile(samples, 50):6.1f} ms  p99 {percentile(samples, 99):6.1f} ms  "
+          f"queue max {stats['max_queue_depth']}  dropped {stats['dropped']}  "
+          f"lag p99 {stats['lag_ms']['p99'] if stats['lag_ms'] else 0:.0f} ms")
+    return samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--delay-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    
+    init_db()
+    db = SessionLocal()
+    seed_products(db, 50)
+    db.close()
+    
+    client = TestClient(app)
+    print(f"slow subscriber: {args.delay_ms:.0f} ms per message")
+    run(client, "fast subscriber", "async", args.requests, 0.0)
+    run(client, "slow, sync", "sync", args.requests, args.delay_ms)
+    run(client, "slow, async", "async", args.requests, args.delay_ms)
@@ -0,0 +1,68 @@
+"""
+IoT message store benchmark
+Publishes scan/update events for many carts through IoTService and times
+publish throughput plus topic, wildcard and cursor reads, against the
+previous list-based history.
+
+Usage: python -m benchmarks.bench_iot_messages [--messages N] [--carts N]
+"""
+import argparse
+import time
+from datetime import datetime
+from app.services.iot_service import IoTService
+from benchmarks.common import percentile, timed
+
+
+class ListHistory:
+    """The previous implementation: list with pop(0) and linear topic scans"""
+    
+    def __init__(self):
+        self.message_history = []
+    
+    def publish(self, topic, payload):
+        self.message_history.append({"topic": topic, "payload": payload, "timestamp": datetime.utcnow().isoformat()})
+        if len(self.message_history) > 1000:
+            self.message_history.pop(0)
+        return True
+    
+    def get_message_history(self, topic=None, limit=100):
+        messages = self.message_history
+        if topic:
+            messages = [m for m in messages if m["topic"] == topic]
+        return messages[-limit:]
+
+
+def publish_rate(service, messages: int, carts: int) -> float:
+    topics = [(f"cart/{i}/scan", f"cart/{i}/update") for i in range(carts)]
+    payload = {"event_type": "item_scanned", "product_id": 1}
+    start = time.perf_counter()
+    for i in range(messages):
+        service.publish(topics[i % carts][i & 1], payload)
+    return messages / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500000)
+    parser.add_argument("--carts", type=int, default=1000)
+    args = parser.parse_args()
+    
+    service = IoTService()
+    service.subscribe("cart/+/alert", lambda topic, payload: None)
+    service.subscribe("cart/#", lambda topic, payload: None)
+    rate = publish_rate(service, args.messages, args.carts)
+    print(f"ring store: {rate:,.0f} msgs/s publish ({args.carts} carts, 2 wildcard subscribers)")
+    
+    legacy = ListHistory()
+    print(f"list history: {publish_rate(legacy, args.messages, args.carts):,.0f} msgs/s publish")
+    
+    last_seq = service.messages.last_seq
+    reads = {
+        "topic latest 100": lambda: service.get_message_history(topic="cart/7/scan", limit=100),
+        "wildcard cart/7/#": lambda: service.get_message_history(topic="cart/7/#", limit=100),
+        "since seq (last 50)": lambda: service.get_message_history(since_seq=last_seq - 50, limit=100),
+        "legacy topic scan": lambda: legacy.get_message_history(topic="cart/7/scan", limit=100)
+    }
+    for name, read in reads.items():
+        samples = [timed(read) for _ in range(500)]
+        print(f"{name:20s} p50 {percentile(samples, 50) * 1000:7.1f} us  p99 {percentile(samples, 99) * 1000:7.1f} us")
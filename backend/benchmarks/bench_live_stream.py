@@ -0,0 +1,69 @@
+"""
+Live stream fan-out benchmark
+Connects thousands of stream clients to the hub on one event loop, publishes
+cart events from a worker thread and measures delivery rate and latency.
+Each message is encoded once however many clients receive it.
+
+Usage: python -m benchmarks.bench_live_stream [--clients N] [--messages N]
+"""
+import argparse
+import asyncio
+import threading
+import time
+from app.services.iot_service import iot_service
+from app.services.live_stream_service import live_stream_hub
+from benchmarks.common import percentile
+
+
+async def main(clients: int, messages: int):
+    latencies = []
+    frame_ids = set()
+    done = asyncio.Event()
+    remaining = [clients]
+    
+    async def consume(client):
+        received = 0
+        async for frame in live_stream_hub.frames_for(client):
+            if frame is None:
+                continue
+            frame.sse  # Serialize as the SSE endpoint would; cached after the first client
+            frame_ids.add(id(frame))
+            received += 1
+            if received == messages:
+                break
+        latencies.append((time.perf_counter() - published_at[0]) * 1000.0)
+        remaining[0] -= 1
+        if not remaining[0]:
+            done.set()
+    
+    stream_clients = [live_stream_hub.connect(["cart/+/update", "cart/+/alert"]) for _ in range(clients)]
+    tasks = [asyncio.create_task(consume(client)) for client in stream_clients]
+    
+    published_at = [0.0]
+    
+    def publish():
+        for i in range(messages):
+            iot_service.publish_cart_update(i % 100, 10.0 + i, i)
+        published_at[0] = time.perf_counter()
+    
+    start = time.perf_counter()
+    threading.Thread(target=publish).start()
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*tasks)
+    for client in stream_clients:
+        live_stream_hub.disconnect(client)
+    
+    deliveries = clients * messages
+    print(f"{clients} clients x {messages} messages: {deliveries / elapsed:,.0f} deliveries/s, "
+          f"all delivered {elapsed * 1000:.0f} ms after first publish")
+    print(f"last-message lag p50 {percentile(latencies, 50):.1f} ms  p99 {percentile(latencies, 99):.1f} ms  "
+          f"distinct frame objects: {len(frame_ids)}  overflows: {live_stream_hub.overflows}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.messages))
@@ -0,0 +1,51 @@
+"""
+Store routing benchmark
+Precomputes the routing tables for a store with many aisles and shelving
+rows, then times single-target route lookups.
+
+Usage: python -m benchmarks.bench_navigation
+"""
+import random
+import time
+from app.schemas.navigation import AisleResponse
+from app.services.navigation_service import NavigationService, StoreGraph
+from benchmarks.common import percentile, timed
+
+ROWS = 10
+AISLES_PER_ROW = 12
+
+
+def synthetic_layout():
+    """Rows of aisle access points separated by shelving with cross-aisle gaps"""
+    aisles, obstacles = [], []
+    for row in range(ROWS):
+        y = 5 + row * 9
+        for col in range(AISLES_PER_ROW):
+            aisle_id = row * AISLES_PER_ROW + col + 1
+            aisles.append(AisleResponse(
+                id=aisle_id, name=f"Aisle {aisle_id}", section=chr(ord("A") + row),
+                x_coordinate=5 + col * 7, y_coordinate=y
+            ))
+        obstacles.append((3, y + 3, 40, y + 6))
+        obstacles.append((46, y + 3, 85, y + 6))
+    store_map = {"width": 100, "height": 100, "entrance": (0, 0), "checkout": (95, 95), "obstacles": obstacles}
+    return store_map, aisles
+
+
+if __name__ == "__main__":
+    store_map, aisles = synthetic_layout()
+    
+    start = time.perf_counter()
+    graph = StoreGraph(store_map, aisles)
+    print(f"{len(aisles)} aisles, {len(store_map['obstacles'])} shelves, {len(graph.points)} nodes: "
+          f"tables built in {(time.perf_counter() - start) * 1000:.0f} ms")
+    
+    service = NavigationService()
+    rng = random.Random(5)
+    targets = [rng.choice(aisles).id for _ in range(2000)]
+    samples = [timed(service.find_shortest_path, graph, "entrance", target) for target in targets]
+    print(f"route lookup: p50 {percentile(samples, 50) * 1000:.1f} us  p99 {percentile(samples, 99) * 1000:.1f} us")
+    
+    far = aisles[-1].id
+    print(f"entrance -> {far}: {graph.distance('entrance', far):.1f} units in "
+          f"{len(graph.path('entrance', far)) - 1} steps")
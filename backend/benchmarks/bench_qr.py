@@ -0,0 +1,69 @@
+"""
+Payment QR microbenchmark
+Reports QR version and codes generated per second for the old verbose JSON
+payload rendered to PNG, the compact signed token in each output format,
+and cached re-issues of an unchanged cart (the pay screen refreshing).
+
+Usage: python -m benchmarks.bench_qr [seconds_per_case]
+"""
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from app.cpu_tasks import qr_modules, render_qr
+from app.services.qr_service import PaymentQRService, encode_token
+
+CART_ID = 1234
+AMOUNT = 187.45
+
+
+def legacy_payload() -> str:
+    """The JSON generate_payment_qr used to encode"""
+    return json.dumps({
+        "cart_id": CART_ID,
+        "session_id": "CART-1A2B3C4D",
+        "amount": AMOUNT,
+        "reference": f"PAY-{uuid.uuid4().hex[:8].upper()}",
+        "timestamp": datetime.utcnow().isoformat()
+    })
+
+
+def compact_payload() -> str:
+    reference = f"PAY-{uuid.uuid4().hex[:8].upper()}"
+    return encode_token(CART_ID, AMOUNT, reference, datetime.utcnow() + timedelta(minutes=10))
+
+
+def rate(fn, seconds: float) -> float:
+    """Calls per second of fn over roughly `seconds`"""
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def version(payload: str) -> int:
+    return (len(qr_modules(payload)) - 17) // 4
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    
+    print(f"{'case':<28} {'chars':>6} {'version':>8} {'QR/s':>10}")
+    for name, payload, fmt in (
+        ("JSON payload, PNG", legacy_payload, "png"),
+        ("token, PNG", compact_payload, "png"),
+        ("token, SVG", compact_payload, "svg"),
+        ("token, matrix", compact_payload, "matrix"),
+    ):
+        sample = payload()
+        qr_per_second = rate(lambda: render_qr(payload(), fmt), seconds)
+        print(f"{name:<28} {len(sample):>6} {version(sample):>8} {qr_per_second:>10.0f}")
+    
+    service = PaymentQRService()
+    for fmt in ("png", "svg"):
+        service.issue(CART_ID, AMOUNT, fmt)
+        qr_per_second = rate(lambda: service.issue(CART_ID, AMOUNT, fmt), seconds)
+        print(f"{'cached re-issue, ' + fmt.upper():<28} {'':>6} {'':>8} {qr_per_second:>10.0f}")
+    assert service.get_stats()["misses"] == 2, service.get_stats()
@@ -0,0 +1,122 @@
+"""
+SQL statement counts per endpoint
+Calls the cart, billing and admin listing endpoints against carts of 1-200
+lines and listings of 10-1000 carts, and fails if any endpoint's statement
+count changes with cart or page size (an N+1 regression) or drifts from
+the pinned count.
+
+Usage: python -m benchmarks.bench_query_counts
+"""
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.database import ASYNC_DRIVERS, count_queries, get_async_db, get_db
+from app.main import app
+from app.models.cart import Cart, CartItem, CartStatus
+from benchmarks.common import make_session, seed_products, timed
+
+CART_SIZES = [1, 20, 200]
+PAGE_SIZES = [10, 100, 1000]
+P = settings.API_V1_PREFIX
+
+# Statements per request
+EXPECTED = {
+    "GET /cart/{id}": 2,
+    "GET /cart/session/{session_id}": 2,
+    "GET /cart/{id}/billing": 2,
+    "PUT /cart/{id}": 3,
+    "GET /admin/carts/active": 1,
+}
+
+
+def seed_carts(db, products):
+    """One cart per CART_SIZES entry plus enough empty carts for the listings"""
+    carts = {}
+    for size in CART_SIZES:
+        cart = Cart(session_id=f"LINES-{size}", status=CartStatus.ACTIVE)
+        db.add(cart)
+        db.flush()
+        db.execute(insert(CartItem), [
+            {
+                "cart_id": cart.id, "product_id": product.id, "quantity": 1,
+                "unit_price": product.price, "tax_rate": product.tax_rate, "subtotal": product.price
+            }
+            for product in products[:size]
+        ])
+        carts[size] = cart.id
+    db.execute(insert(Cart), [
+        {"session_id": f"EMPTY-{i}", "status": CartStatus.ACTIVE}
+        for i in range(max(PAGE_SIZES))
+    ])
+    db.commit()
+    return carts
+
+
+def count(client, engines, method, url, **kwargs):
+    """Statements issued on the sync and async engines by one request"""
+    with count_queries(engines[0]) as sync_counter, count_queries(engines[1]) as async_counter:
+        response = client.request(method, url, **kwargs)
+    assert response.status_code < 400, (url, response.status_code, response.text)
+    return sync_counter.count + async_counter.count
+
+
+if __name__ == "__main__":
+    db = make_session()
+    engine = db.get_bind()
+    products = seed_products(db, max(CART_SIZES))
+    carts = seed_carts(db, products)
+    db.close()
+    
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async_engine = create_async_engine(engine.url.set(drivername=f"sqlite+{ASYNC_DRIVERS['sqlite']}"))
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    engines = (engine, async_engine)
+    
+    def get_bench_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+    
+    async def get_bench_async_db():
+        async with AsyncSession() as session:
+            yield session
+    
+    app.dependency_overrides[get_db] = get_bench_db
+    app.dependency_overrides[get_async_db] = get_bench_async_db
+    client = TestClient(app)
+    
+    requests = {
+        "GET /cart/{id}": lambda size: ("GET", f"{P}/cart/{carts[size]}", {}),
+        "GET /cart/session/{session_id}": lambda size: ("GET", f"{P}/cart/session/LINES-{size}", {}),
+        "GET /cart/{id}/billing": lambda size: ("GET", f"{P}/cart/{carts[size]}/billing", {}),
+        "PUT /cart/{id}": lambda size: ("PUT", f"{P}/cart/{carts[size]}", {"json": {"status": "active"}}),
+    }
+    
+    failures = []
+    print(f"{'endpoint':<34} {'size':>6} {'queries':>8} {'ms':>8}")
+    for name, build in requests.items():
+        for size in CART_SIZES:
+            method, url, kwargs = build(size)
+            queries = count(client, engines, method, url, **kwargs)
+            elapsed = timed(client.request, method, url, **kwargs)
+            print(f"{name:<34} {size:>6} {queries:>8} {elapsed:>8.2f}")
+            if queries != EXPECTED[name]:
+                failures.append((name, size, queries))
+    
+    name = "GET /admin/carts/active"
+    for limit in PAGE_SIZES:
+        url = f"{P}/admin/carts/active?limit={limit}"
+        queries = count(client, engines, "GET", url)
+        elapsed = timed(client.get, url)
+        print(f"{name:<34} {limit:>6} {queries:>8} {elapsed:>8.2f}")
+        if queries != EXPECTED[name]:
+            failures.append((name, limit, queries))
+    
+    app.dependency_overrides.clear()
+    if failures:
+        raise SystemExit(f"Query count changed (endpoint, size, queries): {failures}")
+    print("Query counts are constant")
@@ -0,0 +1,95 @@
+"""
+Frequently-bought-together benchmark
+Builds the co-occurrence index from ~1M synthetic transaction lines and times
+whole-cart recommendations. With --sql the lines are also written to SQLite
+and the per-product GROUP BY query the index replaced is timed for comparison.
+
+Usage: python -m benchmarks.bench_recommendations [--sql]
+"""
+import itertools
+import random
+import sys
+import time
+from sqlalchemy import func, and_, insert
+from app.models.transaction import Transaction, TransactionItem, PaymentMethod, TransactionStatus
+from app.services.cooccurrence_service import CoOccurrenceIndex
+from benchmarks.common import make_session, percentile, timed
+
+PRODUCTS = 5000
+TARGET_LINES = 1_000_000
+CART_SIZES = [1, 5, 20, 50]
+
+
+def synthetic_baskets(seed: int = 7):
+    """Baskets of 1-10 products with a skewed (Zipf-like) popularity"""
+    rng = random.Random(seed)
+    population = range(1, PRODUCTS + 1)
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(PRODUCTS)))
+    lines = 0
+    while lines < TARGET_LINES:
+        basket = set(rng.choices(population, cum_weights=cum_weights, k=rng.randint(1, 10)))
+        lines += len(basket)
+        yield list(basket)
+
+
+def sql_frequently_bought_together(db, product_ids, limit=5):
+    """The per-product GROUP BY that RecommendationService used to run"""
+    for product_id in product_ids[:3]:
+        transactions_with_product = db.query(TransactionItem.transaction_id).filter(
+            TransactionItem.product_id == product_id
+        ).subquery()
+        db.query(
+            TransactionItem.product_id, func.count(TransactionItem.product_id)
+        ).filter(
+            and_(
+                TransactionItem.transaction_id.in_(transactions_with_product.select()),
+                TransactionItem.product_id.notin_(product_ids)
+            )
+        ).group_by(TransactionItem.product_id).order_by(
+            func.count(TransactionItem.product_id).desc()
+        ).limit(limit).all()
+
+
+if __name__ == "__main__":
+    baskets = list(synthetic_baskets())
+    line_count = sum(len(basket) for basket in baskets)
+    
+    index = CoOccurrenceIndex()
+    start = time.perf_counter()
+    for basket in baskets:
+        index.add_basket(basket)
+    index.built = True
+    print(f"{len(baskets)} baskets, {line_count} lines: index built in {time.perf_counter() - start:.1f} s")
+    
+    rng = random.Random(11)
+    for size in CART_SIZES:
+        carts = [rng.sample(range(1, 200), size) for _ in range(200)]
+        samples = [timed(index.recommend, cart, 5) for cart in carts]
+        print(f"cart of {size:>2}: p50 {percentile(samples, 50):.3f} ms  p99 {percentile(samples, 99):.3f} ms")
+    
+    start = time.perf_counter()
+    for transaction_id, basket in enumerate(baskets[:10000], start=len(baskets) + 1):
+        index.record_transaction(transaction_id, basket)
+    print(f"incremental update: {(time.perf_counter() - start) / 10000 * 1e6:.1f} us/transaction")
+    
+    if "--sql" in sys.argv:
+        db = make_session()
+        conn = db.connection()
+        conn.execute(insert(Transaction), [
+            {
+                "id": i + 1, "cart_id": 1, "transaction_id": f"TXN-{i}",
+                "payment_method": PaymentMethod.CARD, "amount": 1.0, "status": TransactionStatus.COMPLETED
+            }
+            for i in range(len(baskets))
+        ])
+        conn.execute(insert(TransactionItem), [
+            {"transaction_id": i + 1, "product_id": product_id, "quantity": 1, "unit_price": 1.0, "subtotal": 1.0}
+            for i, basket in enumerate(baskets)
+            for product_id in basket
+        ])
+        db.commit()
+        samples = [timed(sql_frequently_bought_together, db, rng.sample(range(1, 200), 5)) for _ in range(5)]
+        print(f"SQL GROUP BY (first 3 cart items): p50 {percentile(samples, 50):.1f} ms")
+        start = time.perf_counter()
+        CoOccurrenceIndex().build(db)
+        print(f"index build from database: {time.perf_counter() - start:.1f} s")
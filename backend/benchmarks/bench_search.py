@@ -0,0 +1,47 @@
+"""
+Product search benchmark
+Indexes a synthetic 200k-SKU catalog in the trigram search index and reports
+p50/p99 latency for prefix, multi-word and misspelled queries.
+
+Usage: python -m benchmarks.bench_search
+"""
+import random
+import time
+from app.services.search_service import ProductSearchIndex, WORD_PATTERN
+from benchmarks.common import percentile, timed
+
+CATALOG_SIZE = 200_000
+BRANDS = ["acme", "golden", "farmhouse", "northern", "sunrise", "valley", "urban", "classic", "organic", "premium"]
+NOUNS = ["apples", "bananas", "milk", "cheddar", "yogurt", "bread", "cookies", "cola", "juice", "water",
+         "chips", "chocolate", "chicken", "salmon", "pizza", "icecream", "shampoo", "toothpaste", "coffee", "pasta"]
+SIZES = ["small", "medium", "large", "family", "value", "mini", "xl", "twin", "multipack", "single"]
+CATEGORIES = ["Fruits", "Dairy", "Bakery", "Beverages", "Snacks", "Meat", "Frozen", "Personal Care"]
+QUERIES = ["choc", "chocolate", "chocolat", "organic milk", "famly pizza", "cola", "tooth", "golden bread large",
+           "shampo", "salmon", "ice", "premium coffee", "chedar", "valley juice", "xl chips"]
+
+
+if __name__ == "__main__":
+    rng = random.Random(3)
+    index = ProductSearchIndex()
+    
+    rows = [
+        (
+            product_id,
+            f"{rng.choice(BRANDS)} {rng.choice(NOUNS)} {rng.choice(SIZES)} {product_id}",
+            rng.choice(CATEGORIES),
+            f"SKU{product_id:07d}",
+            f"{4000000000000 + product_id}"
+        )
+        for product_id in range(1, CATALOG_SIZE + 1)
+    ]
+    start = time.perf_counter()
+    index.load_rows(rows)
+    print(f"indexed {CATALOG_SIZE} products in {time.perf_counter() - start:.1f} s")
+    
+    samples = []
+    for _ in range(20):
+        for query in QUERIES:
+            samples.append(timed(index.search_ids, WORD_PATTERN.findall(query), 10))
+    print(f"{len(samples)} queries: p50 {percentile(samples, 50):.2f} ms  p99 {percentile(samples, 99):.2f} ms")
+    for query in QUERIES[:4]:
+        print(f"  {query!r}: {index.search_ids(WORD_PATTERN.findall(query), 3)}")
@@ -0,0 +1,51 @@
+"""
+Shopping-list route benchmark
+Compares tour length and solve time of nearest neighbour alone, the
+2-opt/Or-opt heuristic and the exact DP on random shopping lists.
+
+Usage: python -m benchmarks.bench_shopping_route
+"""
+import random
+import time
+from app.services.navigation_service import (
+    StoreGraph, _held_karp, _improve, _nearest_neighbour, solve_shopping_tour, tour_length
+)
+from benchmarks.bench_navigation import synthetic_layout
+from benchmarks.common import percentile, timed
+
+LIST_SIZES = [5, 8, 10, 20, 50]
+TRIALS = 50
+
+
+if __name__ == "__main__":
+    store_map, aisles = synthetic_layout()
+    graph = StoreGraph(store_map, aisles)
+    dist = graph.distance_rows
+    start, end = graph.index["entrance"], graph.index["checkout"]
+    rng = random.Random(7)
+    
+    for size in LIST_SIZES:
+        lists = [[graph.index[a.id] for a in rng.sample(aisles, size)] for _ in range(TRIALS)]
+        
+        nn_lengths, lengths, gaps, samples = [], [], [], []
+        for stops in lists:
+            nn_order = _nearest_neighbour(dist, start, end, stops)
+            nn_lengths.append(tour_length(dist, nn_order))
+            
+            result = {}
+            samples.append(timed(lambda: result.update(tour=solve_shopping_tour(dist, start, end, stops))))
+            order, solver = result["tour"]
+            lengths.append(tour_length(dist, order))
+            
+            if size <= 10:
+                # Optimality gap against the exact DP
+                optimal = tour_length(dist, _held_karp(dist, start, end, stops))
+                heuristic = tour_length(dist, _improve(dist, list(nn_order), time.perf_counter() + 0.003))
+                gaps.append((heuristic - optimal) / optimal * 100.0)
+        
+        line = (f"{size:3d} stops [{solver}]: nearest neighbour {sum(nn_lengths) / TRIALS:7.1f}  "
+                f"solved {sum(lengths) / TRIALS:7.1f}  "
+                f"p50 {percentile(samples, 50):.2f} ms  p99 {percentile(samples, 99):.2f} ms")
+        if gaps:
+            line += f"  heuristic gap vs exact: mean {sum(gaps) / len(gaps):.2f}%  max {max(gaps):.2f}%"
+        print(line)
@@ -0,0 +1,66 @@
+"""
+Application startup benchmark
+Imports the app in fresh interpreters under `python -X importtime`, reports
+the slowest top-level packages and fails when the import exceeds the budget
+or pulls in a module that should only load on first use.
+
+Usage: python -m benchmarks.bench_startup [--budget-ms MS] [--runs N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Modules that must not be imported just by loading the app
+DEFERRED_MODULES = ["torch", "ultralytics", "PIL", "qrcode", "redis", "paho"]
+
+
+def import_profile() -> dict:
+    """
+    {module: (self_us, cumulative_us)} for one `import app.main`
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=2000.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    
+    profiles = [import_profile() for _ in range(args.runs)]
+    totals = [profile["app.main"][1] / 1000.0 for profile in profiles]
+    best = profiles[totals.index(min(totals))]
+    
+    packages = {}
+    for name, (self_us, _) in best.items():
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    print("slowest packages (self time, best run):")
+    for root, self_us in sorted(packages.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {root:24s} {self_us / 1000.0:8.1f} ms")
+    
+    print(f"import app.main: min {min(totals):.0f} ms  max {max(totals):.0f} ms  budget {args.budget_ms:.0f} ms")
+    
+    failures = []
+    loaded = sorted({name.split(".")[0] for name in best} & set(DEFERRED_MODULES))
+    if loaded:
+        failures.append(f"deferred modules imported at startup: {', '.join(loaded)}")
+    if min(totals) > args.budget_ms:
+        failures.append("import time over budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
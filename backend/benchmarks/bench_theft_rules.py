@@ -0,0 +1,133 @@
+"""
+Theft rules replay benchmark
+Replays a cart event stream (scans, cart updates, camera frames, AI
+verifications, removals) through the incremental rules engine with 1k, 10k
+and 100k carts in the store, against the old approach of rescanning every
+line of every cart on each event. Engine cost per event should stay flat as
+carts grow; the rescan grows with them.
+
+A recorded stream can be replayed instead: NDJSON, one {"topic", "payload"}
+object per line, as returned by GET /iot/messages.
+
+Usage: python -m benchmarks.bench_theft_rules [events.ndjson]
+"""
+import json
+import random
+import sys
+import time
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Tuple
+from app.services.theft_rules import AlertSpec, TheftRulesEngine
+
+CART_COUNTS = (1000, 10000, 100000)
+EVENTS = 50000
+RESCAN_EVENTS = 50  # The rescan is too slow to time over the full stream
+LINES_PER_CART = 12
+
+Event = Tuple[str, Dict[str, Any]]
+
+
+def generate_events(carts: int, seed: int = 11) -> Iterator[Event]:
+    """An endless, shopping-shaped mix of events over randomly chosen carts"""
+    rng = random.Random(seed)
+    item_counts = [0] * carts
+    while True:
+        cart_id = rng.randrange(carts)
+        product_id = rng.randrange(5000)
+        roll = rng.random()
+        if roll < 0.35:
+            yield f"cart/{cart_id}/scan", {"event_type": "item_scanned", "cart_id": cart_id, "product_id": product_id}
+            item_counts[cart_id] += 1
+            payload = {"event_type": "cart_updated", "cart_id": cart_id, "item_count": item_counts[cart_id]}
+            yield f"cart/{cart_id}/update", payload
+        elif roll < 0.75:
+            # The camera occasionally sees one item more or fewer than scanned
+            seen = max(0, item_counts[cart_id] + rng.choice((0, 0, 0, 0, 1, -1)))
+            payload = {"event_type": "camera_detection", "cart_id": cart_id, "object_count": seen}
+            yield f"cart/{cart_id}/camera", payload
+        elif roll < 0.9:
+            payload = {
+                "event_type": "item_verified", "cart_id": cart_id, "product_id": product_id,
+                "verified": rng.random() > 0.05
+            }
+            yield f"cart/{cart_id}/verification", payload
+        else:
+            yield f"cart/{cart_id}/scan", {"event_type": "item_removed", "cart_id": cart_id, "product_id": product_id}
+            item_counts[cart_id] = max(0, item_counts[cart_id] - 1)
+            payload = {"event_type": "cart_updated", "cart_id": cart_id, "item_count": item_counts[cart_id]}
+            yield f"cart/{cart_id}/update", payload
+
+
+def read_events(path: str) -> List[Event]:
+    with open(path) as f:
+        return [(message["topic"], message["payload"]) for message in map(json.loads, f) if message]
+
+
+def engine_with_carts(carts: int) -> Tuple[TheftRulesEngine, List[AlertSpec]]:
+    """An engine holding `carts` carts, with a sink that only collects alerts"""
+    raised: List[AlertSpec] = []
+    engine = TheftRulesEngine(raised.extend, max_carts=carts)
+    for cart_id in range(carts):
+        engine.handle(f"cart/{cart_id}/update", {"event_type": "cart_updated", "cart_id": cart_id, "item_count": 0})
+    return engine, raised
+
+
+def rescan_all(carts: Dict[int, Dict[str, Any]]) -> int:
+    """The old check: walk every line of every cart"""
+    flagged = 0
+    for cart in carts.values():
+        scanned = 0
+        for line in cart["lines"]:
+            scanned += line["quantity"]
+            if line["scan_verified"] and line["verified_by_ai"] is False:
+                flagged += 1
+        if cart["detected"] is not None and cart["detected"] != scanned:
+            flagged += 1
+    return flagged
+
+
+def time_engine(engine: TheftRulesEngine, events: List[Event]) -> float:
+    """Mean microseconds per event"""
+    start = time.perf_counter()
+    engine.replay(events)
+    return (time.perf_counter() - start) * 1e6 / len(events)
+
+
+def time_rescan(carts: int, events: List[Event]) -> float:
+    store = {
+        cart_id: {
+            "detected": None,
+            "lines": [
+                {"quantity": 1, "scan_verified": True, "verified_by_ai": None} for _ in range(LINES_PER_CART)
+            ]
+        }
+        for cart_id in range(carts)
+    }
+    start = time.perf_counter()
+    for _topic, payload in events:
+        if payload["event_type"] == "camera_detection":
+            store[payload["cart_id"] % carts]["detected"] = payload["object_count"]
+        rescan_all(store)
+    return (time.perf_counter() - start) * 1e6 / len(events)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        events = read_events(sys.argv[1])
+        raised = []
+        engine = TheftRulesEngine(raised.extend)
+        per_event = time_engine(engine, events)
+        stats = engine.get_stats()
+        print(f"{len(events)} recorded events, {stats['carts']} carts: {per_event:.2f} us/event")
+        print(f"{stats['events']} evaluated, {len(raised)} alerts raised, {stats['alerts_suppressed']} duplicates suppressed")
+        sys.exit(0)
+    
+    print(f"{EVENTS} events per case, {LINES_PER_CART} lines per cart for the rescan")
+    print(f"{'carts':>8} {'engine us/event':>16} {'alerts':>8} {'suppressed':>11} {'rescan us/event':>16}")
+    for carts in CART_COUNTS:
+        events = list(islice(generate_events(carts), EVENTS))
+        engine, raised = engine_with_carts(carts)
+        per_event = time_engine(engine, events)
+        rescan = time_rescan(carts, events[:RESCAN_EVENTS])
+        suppressed = engine.get_stats()["alerts_suppressed"]
+        print(f"{carts:>8} {per_event:>16.2f} {len(raised):>8} {suppressed:>11} {rescan:>16.0f}")
@@ -0,0 +1,81 @@
+"""
+Shared helpers for the benchmark scripts
+Each benchmark runs against a throwaway SQLite database so it never touches
+the development database.
+"""
+import os
+import tempfile
+import time
+from typing import Callable, List
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, Session
+from app.database import Base
+from app.models.product import Product
+from app.models.aisle import Aisle
+
+
+def make_session(url: str = None) -> Session:
+    """
+    Create a fresh database with all tables and return a session bound to it
+    """
+    if url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="cart-bench-"), "bench.db")
+        url = f"sqlite:///{path}"
+    
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def seed_products(db: Session, count: int, aisle_count: int = 8) -> List[Product]:
+    """
+    Insert `count` synthetic products spread over `aisle_count` aisles
+    """
+    aisles = [
+        Aisle(
+            name=f"Aisle {i + 1}",
+            section=chr(ord("A") + i % 26) + str(i // 26 or ""),
+            x_coordinate=10.0 * (i % 5 + 1),
+            y_coordinate=10.0 * (i // 5 + 1)
+        )
+        for i in range(aisle_count)
+    ]
+    db.add_all(aisles)
+    db.flush()
+    
+    categories = ["Fruits", "Dairy", "Bakery", "Beverages", "Snacks", "Meat", "Frozen", "Personal Care"]
+    products = [
+        Product(
+            sku=f"SKU{i:07d}",
+            barcode=f"{4000000000000 + i}",
+            name=f"Product {i} {categories[i % len(categories)]}",
+            price=round(1.0 + (i % 97) * 0.37, 2),
+            tax_rate=8.0,
+            category=categories[i % len(categories)],
+            aisle_id=aisles[i % aisle_count].id,
+            rfid_tag_id=f"RFID{i:07d}",
+            stock_quantity=1000
+        )
+        for i in range(count)
+    ]
+    db.add_all(products)
+    db.commit()
+    return products
+
+
+def timed(fn: Callable, *args, **kwargs) -> float:
+    """
+    Run fn once and return elapsed wall time in milliseconds
+    """
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of a list of samples
+    """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
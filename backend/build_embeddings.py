@@ -0,0 +1,58 @@
+"""
+Build the product embedding store used for AI verification
+Encodes each active product's catalog image (image_url, a local path or a
+file under UPLOAD_DIR) and writes the store to AI_EMBEDDING_STORE_PATH.
+Workers pick up a rebuilt store on restart.
+
+Usage: python build_embeddings.py [--synthetic]
+  --synthetic  use a generated stand-in image for products without one
+"""
+import os
+import sys
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, init_db
+from app.models.product import Product
+from app.cpu_tasks import decode_image_bytes
+from app.services.embedding_service import StubImageEncoder, build_store, synthetic_product_image
+
+def load_catalog_image(product: Product):
+    """The product's image as an RGB array, or None when it has no local file"""
+    if not product.image_url or "://" in product.image_url:
+        return None
+    for path in (product.image_url, os.path.join(settings.UPLOAD_DIR, product.image_url.lstrip("/"))):
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                return decode_image_bytes(f.read(), settings.AI_MODEL_INPUT_SIZE)
+    return None
+
+def build_embeddings(synthetic: bool = False):
+    """Encode reference images for the catalog and save the store"""
+    if not settings.AI_EMBEDDING_STORE_PATH:
+        raise SystemExit("Set AI_EMBEDDING_STORE_PATH to the directory the store should be written to")
+    init_db()
+    db: Session = SessionLocal()
+    
+    try:
+        product_ids, images, skipped = [], [], 0
+        for product in db.query(Product).filter(Product.is_active == True).order_by(Product.id).yield_per(1000):
+            image = load_catalog_image(product)
+            if image is None and synthetic:
+                image = synthetic_product_image(product.id)
+            if image is None:
+                skipped += 1
+                continue
+            product_ids.append(product.id)
+            images.append(image)
+    finally:
+        db.close()
+    
+    store = build_store(StubImageEncoder(dim=settings.AI_EMBEDDING_DIM), product_ids, images)
+    store.save(settings.AI_EMBEDDING_STORE_PATH)
+    print("Product embeddings built successfully!")
+    print(f"   - {len(store)} products embedded ({store.vectors.nbytes / 1024:.0f} KB)")
+    print(f"   - {skipped} products without an image (verified by name)")
+
+if __name__ == "__main__":
+    print("Building product embeddings...")
+    build_embeddings(synthetic="--synthetic" in sys.argv[1:])
@@ -0,0 +1,28 @@
+"""
+Rebuild the analytics rollup tables from transaction and alert history
+Run after importing historical data or changing how rollups are computed
+"""
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, init_db
+from app.services.analytics_service import analytics_rollups
+
+def rebuild_analytics():
+    """Recompute hourly/daily sales, product sales and alert rollups"""
+    init_db()
+    db: Session = SessionLocal()
+    
+    try:
+        counts = analytics_rollups.rebuild(db)
+        print("Analytics rollups rebuilt successfully!")
+        print(f"   - {counts['sales_rollups']} sales rollups")
+        print(f"   - {counts['product_sales_rollups']} product sales rollups")
+    except Exception as e:
+        db.rollback()
+        print(f"Error rebuilding analytics: {e}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    print("Rebuilding analytics rollups...")
+    rebuild_analytics()